@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 
 from fastapi import APIRouter
-from . import users, categories, products, sales, sessions, settings, inventories, suppliers, invoices
+from . import users, categories, products, sales, sessions, settings, inventories, suppliers, invoices, syncs, catalog, search
 #, , inventory, sales, suppliers, invoices
 
 api_router = APIRouter()
@@ -15,4 +15,7 @@ api_router.include_router(sessions.router, prefix="/api/v1/session")
 api_router.include_router(settings.router, prefix="/api/v1/settings")
 api_router.include_router(inventories.router, prefix="/api/v1/inventory")
 api_router.include_router(suppliers.router, prefix="/api/v1/supplier")
-api_router.include_router(invoices.router, prefix="/api/v1/invoice")
\ No newline at end of file
+api_router.include_router(invoices.router, prefix="/api/v1/invoice")
+api_router.include_router(syncs.router, prefix="/api/v1/sync")
+api_router.include_router(catalog.router, prefix="/api/v1/catalog")
+api_router.include_router(search.router, prefix="/api/v1/search")
\ No newline at end of file
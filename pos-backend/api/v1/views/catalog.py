@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from server.routing import WriteOffLoopRoute
+from typing import Optional
+from uuid import UUID
+from models.schemas.catalog import CatalogResponse
+from services.catalog import CatalogService
+from services.auth import get_current_user
+from services.permission import role_required
+from models.user import User
+
+router = APIRouter(tags=["Catalog"], route_class=WriteOffLoopRoute)
+
+
+@router.get("", response_model=CatalogResponse)
+@role_required(["cashier"], 'products', 'read')
+async def get_catalog(
+    request: Request,
+    since_version: int = Query(0, ge=0, description="Catalog version the terminal already has"),
+    catalog_service: CatalogService = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Categories and products for terminal boot: only the rows changed since
+    `since_version`, or the full (gzip-compressed) catalog when the terminal
+    has none or is too far behind.
+    """
+    version = catalog_service.current_version()
+    delta = catalog_service.get_delta(since_version, version)
+    if delta is not None:
+        return delta
+
+    _, raw, compressed = catalog_service.get_snapshot(version)
+    headers = {"Vary": "Accept-Encoding", "X-Catalog-Version": str(version)}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=compressed, media_type="application/json", headers=headers)
+    return Response(content=raw, media_type="application/json", headers=headers)
+
+
+@router.get("/thumbnails")
+@role_required(["cashier"], 'products', 'read')
+async def get_thumbnail_bundle(
+    request: Request,
+    category_id: Optional[UUID] = Query(None, description="Only this category's products"),
+    catalog_service: CatalogService = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Every product thumbnail of a category, or of the whole enabled catalog,
+    in one response instead of one /uploads request per product. The body is
+    a one-line JSON index ({"version", "items": {product_id: [offset, length,
+    media_type]}}), a newline, then the images back to back; offsets count
+    from the byte after the newline. WebP is used when the client accepts it.
+    """
+    version = catalog_service.current_version()
+    webp = "image/webp" in request.headers.get("accept", "")
+    etag = f'"thumbnails-{version}-{category_id or "all"}-{"webp" if webp else "png"}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept",
+        "X-Catalog-Version": str(version),
+    }
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = catalog_service.get_thumbnail_bundle(version, category_id, webp)
+    return Response(content=body, media_type="application/octet-stream", headers=headers)
@@ -3,16 +3,18 @@ from models.category import Category
 from models.user import User
 from uuid import UUID
 from models.engine.database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from server.routing import WriteOffLoopRoute
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from services.permission import role_required
 from services.auth import get_current_user, delete
-from utils.imageUpload import save_thumbnail
+from utils.imageUpload import save_image
+from services.tableVersions import conditional_response
 from typing import Optional
 
 
-router = APIRouter(tags=['Categories'])
+router = APIRouter(tags=['Categories'], route_class=WriteOffLoopRoute)
 
 
 @router.post("/create", response_model=CategoryResponse)
@@ -32,7 +34,7 @@ async def create_category(
         )
 
     # Save the image if provided
-    image_path = save_thumbnail(image.file, folder="categories") if image else None
+    image_path = await save_image(image, folder="categories") if image else None
 
     # Create new category
     new_category = Category(
@@ -49,9 +51,14 @@ async def create_category(
 @router.get("/all", response_model=list[CategoryResponse])
 @role_required(["supervisor"], 'categories', 'read')
 async def get_all_categories(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
     ):
+    not_modified = conditional_response(request, response, "categories")
+    if not_modified:
+        return not_modified
     categories = db.query(Category).all()
     if not categories:
         raise HTTPException(
@@ -63,9 +70,14 @@ async def get_all_categories(
 @router.get("/enabled", response_model=list[CategoryResponse])
 @role_required(["cashier"], 'categories', 'read')
 async def get_enabled_categories(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
     ):
+    not_modified = conditional_response(request, response, "categories")
+    if not_modified:
+        return not_modified
     categories = db.query(Category).filter(Category.is_enabled == True).all()
     if not categories:
         raise HTTPException(
@@ -120,7 +132,7 @@ async def update_category(
     if description:
         db_category.description = description
     if image:
-        image_path = save_thumbnail(image.file, folder="categories")
+        image_path = await save_image(image, folder="categories")
         db_category.image = image_path
 
     db.commit()
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from server.routing import WriteOffLoopRoute
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from datetime import date
 from uuid import UUID
 
 from models.engine.database import get_db
+from models.engine.replica import read_db_for
 from models.user import User
 from services.auth import get_current_user
 from models.inventory import (
@@ -17,13 +19,18 @@ from models.schemas.inventory import (
     RawMaterial as RawMaterialSchema,
     Equipment as EquipmentSchema, 
     TransactionCreate, Transaction,
+    BulkTransactionCreate, BulkTransactionResponse,
+    StockCountCreate, StockCountUpload, StockCountUploadResult, StockCountResponse,
     TransactionUpdate, InventoryReportResponse,
     Department as DepartmentSchema
 )
 from services.permission import role_required
 from services.inventory import InventoryService
 
-router = APIRouter(tags=["inventories"])
+router = APIRouter(tags=["inventories"], route_class=WriteOffLoopRoute)
+
+get_report_db = read_db_for("reports")
+get_search_db = read_db_for("search")
 
 # Inventory Creation Endpoints
 @router.post("/raw-materials", response_model=RawMaterialSchema, status_code=status.HTTP_201_CREATED)
@@ -116,7 +123,7 @@ async def advanced_inventory_search(
     sort_order: Optional[str] = 'desc',
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_search_db),
     current_user: User = Depends(get_current_user)
 ):
     """Perform advanced search and filtering on inventory items"""
@@ -148,7 +155,7 @@ async def generate_inventory_report(
     report_type: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_db),
     current_user: User = Depends(get_current_user)
 ):
     """Generate different types of inventory reports"""
@@ -171,6 +178,21 @@ async def create_transaction(
     inventory_service = InventoryService(db)
     return inventory_service.process_transaction(transaction, current_user)
 
+@router.post("/transactions/bulk", response_model=BulkTransactionResponse)
+@role_required(["supervisor"], 'inventories', 'create')
+async def create_transactions_bulk(
+    bulk: BulkTransactionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply up to 1000 transactions (a stock-take, a delivery) in order in one
+    database transaction. Lines that fail are reported in `results` and
+    skipped; the rest are applied.
+    """
+    inventory_service = InventoryService(db)
+    return inventory_service.process_bulk_transactions(bulk.transactions, current_user)
+
 @router.get("/transactions", response_model=List[Dict])
 @role_required(["supervisor"], 'inventories', 'read')
 async def get_transactions(
@@ -280,6 +302,82 @@ async def get_inventory_transactions(
     return transactions
 
 
+@router.get("/{inventory_id}/balance", response_model=Dict)
+@role_required(["supervisor"], 'inventories', 'read')
+async def get_inventory_balance(
+    inventory_id: UUID,
+    verify: bool = Query(False, description="Check the balance against the ledger since the latest checkpoint"),
+    full: bool = Query(False, description="Check the balance against the whole ledger"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Current stock of an item from its running ledger balance"""
+    inventory_service = InventoryService(db)
+    return inventory_service.get_balance(inventory_id, verify=verify, full=full)
+
+
+# Cycle count endpoints
+@router.post("/stock-counts", response_model=StockCountResponse, status_code=status.HTTP_201_CREATED)
+@role_required(["supervisor"], 'inventories', 'create')
+async def create_stock_count(
+    stock_count: StockCountCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Open a stock count session"""
+    inventory_service = InventoryService(db)
+    return inventory_service.create_stock_count(stock_count, current_user)
+
+
+@router.put("/stock-counts/{count_id}/lines", response_model=StockCountUploadResult)
+@role_required(["supervisor"], 'inventories', 'create')
+async def record_stock_counts(
+    count_id: UUID,
+    upload: StockCountUpload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload counted quantities; may be called repeatedly while the count is open"""
+    inventory_service = InventoryService(db)
+    return inventory_service.record_stock_counts(count_id, upload.counts)
+
+
+@router.get("/stock-counts/{count_id}", response_model=StockCountResponse)
+@role_required(["supervisor"], 'inventories', 'read')
+async def get_stock_count(
+    count_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """A stock count and the lines whose count differs from the ledger"""
+    inventory_service = InventoryService(db)
+    return inventory_service.get_stock_count(count_id)
+
+
+@router.post("/stock-counts/{count_id}/post", response_model=StockCountResponse)
+@role_required(["manager"], 'inventories', 'update')
+async def post_stock_count(
+    count_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Book every variance of the count as a RESTOCK or WRITE_OFF and close it"""
+    inventory_service = InventoryService(db)
+    return inventory_service.post_stock_count(count_id, current_user)
+
+
+@router.post("/stock-counts/{count_id}/cancel", response_model=StockCountResponse)
+@role_required(["manager"], 'inventories', 'update')
+async def cancel_stock_count(
+    count_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Close the count without booking anything"""
+    inventory_service = InventoryService(db)
+    return inventory_service.cancel_stock_count(count_id)
+
+
 @router.delete("/transactions/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 @role_required(["admin"], 'inventories', 'delete')
 async def delete_transaction(
@@ -300,7 +398,7 @@ async def generate_inventory_report(
     start_date: Optional[date] = Query(None, description="Start date for the report range"),
     end_date: Optional[date] = Query(None, description="End date for the report range"),
     inventory_type: Optional[InventoryType] = Query(None, description="Filter by inventory type (RawMaterial, Equipment)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_report_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from server.routing import WriteOffLoopRoute
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import date
@@ -17,7 +18,7 @@ from models.schemas.invoice import (
     Invoice as InvoiceSchema, 
 )
 
-router = APIRouter(tags=["invoices"])
+router = APIRouter(tags=["invoices"], route_class=WriteOffLoopRoute)
 
 @router.post("/create", response_model=InvoiceDetail, status_code=status.HTTP_201_CREATED)
 @role_required(["supervisor"], 'invoices', 'create')
@@ -1,20 +1,23 @@
-from models.schemas.product import ProductResponse, ToggleResponse
+from models.schemas.product import ProductAvailabilityResponse, ProductResponse, RecipeResponse, RecipeUpdate, ToggleResponse
 from models.product import Product
 from models.category import Category
 from models.user import User
 from models.engine.database import get_db
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from server.routing import WriteOffLoopRoute
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from services.permission import role_required
 from services.auth import get_current_user, delete
 from uuid import UUID
-from utils.imageUpload import save_thumbnail
+from utils.imageUpload import save_image
+from services.tableVersions import conditional_response
+from services.catalog import CatalogService
 from decimal import Decimal
 from typing import Optional
 
 
-router = APIRouter(tags=["Products"])
+router = APIRouter(tags=["Products"], route_class=WriteOffLoopRoute)
 
 
 @router.post("/create", response_model=ProductResponse)
@@ -36,7 +39,7 @@ async def create_product(
         )
 
     # Save image
-    image_path = save_thumbnail(image.file, folder="products")
+    image_path = await save_image(image, folder="products")
 
     # Create new product
     new_product = Product(
@@ -54,10 +57,16 @@ async def create_product(
 @router.get("/all", response_model=list[ProductResponse])
 @role_required(["supervisor"], 'products', 'read')
 async def get_all_products(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    catalog_service: CatalogService = Depends(),
     current_user: User = Depends(get_current_user)
     ):
-    products = db.query(Product).all()
+    # Each product embeds its category, so either table changing changes the list
+    not_modified = conditional_response(request, response, "products", "categories")
+    if not_modified:
+        return not_modified
+    products = catalog_service.list_products()
     if not products:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -66,14 +75,28 @@ async def get_all_products(
     return products
 
 
+@router.get("/availability", response_model=list[ProductAvailabilityResponse])
+@role_required(["cashier"], 'products', 'read')
+async def get_product_availability(
+    catalog_service: CatalogService = Depends(),
+    current_user: User = Depends(get_current_user)
+    ):
+    """
+    Products whose recipe has (or lately lacked) stock for one more unit;
+    products not listed are available. Changes are pushed over /ws as
+    `product_availability` messages, so terminals load this once on connecting.
+    """
+    return catalog_service.list_availability()
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 @role_required(["cashier"], 'products', 'read')
 async def get_product(
     product_id: UUID,
-    db: Session = Depends(get_db),
+    catalog_service: CatalogService = Depends(),
     current_user: User = Depends(get_current_user)
     ):
-    product = db.query(product).get(product_id)
+    product = catalog_service.get_product(product_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -82,6 +105,28 @@ async def get_product(
     return product
 
 
+@router.get("/{product_id}/recipe", response_model=RecipeResponse)
+@role_required(["supervisor"], 'products', 'read')
+async def get_product_recipe(
+    product_id: UUID,
+    catalog_service: CatalogService = Depends(),
+    current_user: User = Depends(get_current_user)
+    ):
+    """Raw materials used per unit sold; sales deplete them in the background."""
+    return catalog_service.get_recipe(product_id)
+
+
+@router.put("/{product_id}/recipe", response_model=RecipeResponse)
+@role_required(["manager"], 'products', 'update')
+async def set_product_recipe(
+    product_id: UUID,
+    recipe: RecipeUpdate,
+    catalog_service: CatalogService = Depends(),
+    current_user: User = Depends(get_current_user)
+    ):
+    return catalog_service.set_recipe(product_id, recipe.items)
+
+
 @router.get("/category/{category_id}", response_model=list[ProductResponse])
 @role_required(["cashier"], 'products', 'read')
 async def get_products_by_category(
@@ -95,7 +140,7 @@ async def get_products_by_category(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
-    products = db.query(Product).filter(Product.category_id == category_id).all()
+    products = CatalogService(db).list_products(category_id=category_id)
     if not products:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -119,10 +164,7 @@ async def get_enabled_products_by_category(
         )
     
     # Fetch enabled products in the specified category
-    products = db.query(Product).filter(
-        Product.category_id == category_id,
-        Product.is_enabled == True
-        ).all()
+    products = CatalogService(db).list_products(category_id=category_id, enabled_only=True)
     if not products:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -170,7 +212,7 @@ async def update_product(
 
     # Handle image upload
     if image:
-        image_path = save_thumbnail(image.file, folder="products")
+        image_path = await save_image(image, folder="products")
         update_data["image"] = image_path
 
     for key, value in update_data.items():
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from server.routing import WriteOffLoopRoute
 from models.schemas.sale import SaleCreate, SaleSummary, SaleItemsSummary, SaleResponse
 from models.validation import PaginationParams, FilterParams, DateRangeParams
 from services.sales import Sales, SalesExport
@@ -9,8 +10,24 @@ from typing import Dict, List, Any, Union
 from uuid import UUID
 from datetime import date
 from services.sessionManager import SessionManager
+from sqlalchemy.orm import Session
+from models.engine.replica import read_db_for
+
+router = APIRouter(tags=["Sales"], route_class=WriteOffLoopRoute)
+
+# Reports and exports may read from the replica; the current-session reports
+# stay on the primary so a cashier always sees the sale just made.
+get_report_db = read_db_for("reports")
+get_export_db = read_db_for("exports")
+
+
+def get_report_sales(db: Session = Depends(get_report_db)) -> Sales:
+    return Sales(db)
+
+
+def get_export_sales(db: Session = Depends(get_export_db)) -> Sales:
+    return Sales(db)
 
-router = APIRouter(tags=["Sales"])
 
 @router.post("/create", response_model=Dict[str, Any])
 @role_required(["cashier"], 'sales', 'create')
@@ -65,7 +82,7 @@ async def get_sales_report(
     date_range: DateRangeParams = Depends(),
     pagination: PaginationParams = Depends(),
     filters: FilterParams = Depends(),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get sales report for a date range with pagination and filters"""
@@ -82,7 +99,7 @@ async def get_sales_items_report(
     date_range: DateRangeParams = Depends(),
     pagination: PaginationParams = Depends(),
     filters: FilterParams = Depends(),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get item-level sales report for a date range"""
@@ -98,7 +115,7 @@ async def get_sales_items_report(
 async def get_daily_sales(
     date: date,
     report_type: str = Query('sales', description="Report type: 'sales' or 'items'"),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get sales report for a specific day"""
@@ -109,7 +126,7 @@ async def get_daily_sales(
 async def get_weekly_sales(
     start_date: date,
     report_type: str = Query('sales', description="Report type: 'sales' or 'items'"),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get sales report for a week"""
@@ -121,7 +138,7 @@ async def get_monthly_sales(
     year: int,
     month: int,
     report_type: str = Query('sales', description="Report type: 'sales' or 'items'"),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get sales report for a month"""
@@ -133,7 +150,7 @@ async def get_hourly_sales(
     date: date,
     hour: int,
     report_type: str = Query('sales', description="Report type: 'sales' or 'items'"),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_report_sales),
     current_user: User = Depends(get_current_user)
 ):
     """Get sales report for an hour"""
@@ -197,7 +214,7 @@ async def export_sales(
     date_range: DateRangeParams = Depends(),
     filters: FilterParams = Depends(),
     pagination: PaginationParams = Depends(),
-    sales_service: Sales = Depends(),
+    sales_service: Sales = Depends(get_export_sales),
     export_service: SalesExport = Depends(),
     columns: List[str] = Query(default=None)
 ):
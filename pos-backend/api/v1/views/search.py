@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from server.routing import WriteOffLoopRoute
+from sqlalchemy.orm import Session
+
+from models.engine.replica import read_db_for
+from models.schemas.search import SearchResponse
+from models.user import User
+from services.auth import get_current_user
+from services.permission import role_required
+from services.search import SearchService
+
+router = APIRouter(tags=["Search"], route_class=WriteOffLoopRoute)
+
+get_search_db = read_db_for("search")
+
+
+@router.get("", response_model=SearchResponse)
+@role_required(["cashier"], 'products', 'read')
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[List[str]] = Query(None, description="products, inventory and/or suppliers; all by default"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_search_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Typeahead search: the best matches of each word of `q` as a prefix, per
+    type the user may read, with the matches highlighted.
+    """
+    return SearchService(db).search(q, current_user, types, limit)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from server.routing import WriteOffLoopRoute
 from sqlalchemy.orm import Session
 from models.engine.database import get_db
 from services.auth import get_current_user
@@ -12,7 +13,7 @@ from utils.time_utils import current_time
 import pytz
 
 
-router = APIRouter(tags=["Sessions"])
+router = APIRouter(tags=["Sessions"], route_class=WriteOffLoopRoute)
 
 
 @router.get("/all", response_model=List[UserSessionStatus])
@@ -1,5 +1,5 @@
-import os
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, status
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request, Response, status
+from server.routing import WriteOffLoopRoute
 from pydantic import EmailStr
 from typing import Dict, Any, Optional
 from services.permission import role_required
@@ -9,16 +9,22 @@ from models.engine.database import get_db
 from sqlalchemy.orm import Session
 from models.schemas.settings import SettingsUpdate
 from models.settings import Settings
-from utils.imageUpload import save_thumbnail
+from utils.imageUpload import save_image
+from services.tableVersions import conditional_response
 
 
-router = APIRouter(tags=["Settings"])
+router = APIRouter(tags=["Settings"], route_class=WriteOffLoopRoute)
 
 @router.get("/info", response_model=SettingsUpdate)
 async def get_product(
+    request: Request,
+    response: Response,
     id: int = 1,
     db: Session = Depends(get_db),
     ):
+    not_modified = conditional_response(request, response, "settings", cache_control="no-cache")
+    if not_modified:
+        return not_modified
     settings = db.query(Settings).get(id)
     if not settings:
         raise HTTPException(
@@ -60,14 +66,9 @@ async def update_settings(
     }
 
     if image:
-        # Delete the existing logo file if it exists
-        if settings.image:
-            existing_logo_path = os.path.join("uploads", settings.image)
-            if os.path.exists(existing_logo_path):
-                os.remove(existing_logo_path)
-        
-        # Save the new logo file
-        image_path = save_thumbnail(image.file, folder="logo")
+        # The previous logo's files are content-addressed and may be shared,
+        # so they are left in place rather than deleted here
+        image_path = await save_image(image, folder="logo")
         update_data["image"] = image_path
 
     for key, value in update_data.items():
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from server.routing import WriteOffLoopRoute
 from sqlalchemy.orm import Session
 from sqlalchemy import String, or_
 from typing import List, Optional
@@ -7,6 +8,7 @@ import uuid
 from models.engine.database import get_db
 from services.auth import get_current_user
 from services.permission import role_required
+from services.tableVersions import conditional_response
 from models.supplier import Supplier
 from models.schemas.supplier import(
     SupplierCreate,
@@ -15,7 +17,7 @@ from models.schemas.supplier import(
     SupplierDetail
     )
 
-router = APIRouter(tags=["suppliers"])
+router = APIRouter(tags=["suppliers"], route_class=WriteOffLoopRoute)
 
 @router.post("/create", response_model=SupplierSchema, status_code=status.HTTP_201_CREATED)
 @role_required(["supervisor"], 'suppliers', 'create')
@@ -41,12 +43,18 @@ async def create_supplier(
 @router.get("/all", response_model=List[SupplierSchema])
 @role_required(["supervisor"], 'suppliers', 'read')
 async def get_all_suppliers(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     items_supplied: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
+    not_modified = conditional_response(request, response, "suppliers")
+    if not_modified:
+        return not_modified
+
     query = db.query(Supplier)
     
     if items_supplied:
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, Query
+from server.routing import WriteOffLoopRoute
+from typing import List, Optional, Dict, Any
+from uuid import UUID
+from models.schemas.sync import SyncPushRequest, SyncPushResult, SyncPullResponse
+from models.offlineSync import EntityType
+from services.sync import SyncService, SYNC_PULL_LIMIT
+from services.auth import get_current_user
+from services.permission import role_required
+from models.user import User
+
+router = APIRouter(tags=["Sync"], route_class=WriteOffLoopRoute)
+
+
+@router.get("/pull", response_model=SyncPullResponse)
+@role_required(["cashier"], 'sales', 'read')
+async def pull_changes(
+    since: int = Query(0, ge=0, description="Watermark returned by the previous pull"),
+    limit: int = Query(SYNC_PULL_LIMIT, ge=1, le=5000),
+    entity_types: Optional[List[EntityType]] = Query(None),
+    sync_service: SyncService = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    """Products, categories, settings and sales changed since a watermark"""
+    return sync_service.pull(since, limit, entity_types)
+
+
+@router.post("/push", response_model=List[SyncPushResult])
+@role_required(["cashier"], 'sales', 'create')
+async def push_changes(
+    batch: SyncPushRequest,
+    sync_service: SyncService = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload sales made while the terminal was offline"""
+    return sync_service.push_sales(
+        current_user.id,
+        UUID(current_user.current_session_id),
+        batch.terminal_id,
+        batch.sales
+    )
+
+
+@router.get("/conflicts", response_model=List[Dict[str, Any]])
+@role_required(["supervisor"], 'sales', 'read')
+async def get_conflicts(
+    skip: int = 0,
+    limit: int = 100,
+    sync_service: SyncService = Depends(),
+    current_user: User = Depends(get_current_user)
+):
+    """Pushed records that could not be applied"""
+    return [
+        {
+            "id": record.id,
+            "client_id": record.client_id,
+            "status": record.status.value,
+            "detail": record.detail,
+            "raw_data": record.raw_data,
+            "originated_from": record.originated_from,
+            "server_received_at": record.server_received_at,
+        }
+        for record in sync_service.get_conflicts(skip, limit)
+    ]
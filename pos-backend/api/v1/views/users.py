@@ -1,5 +1,6 @@
 from models.user import User, TokenBlacklist
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
+from server.routing import WriteOffLoopRoute
 from typing import List, Dict, Any, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
@@ -8,6 +9,8 @@ from models.schemas.user import UserCreate, UserResponse, UserUpdate, LoginReque
 from services.permission import role_required, has_permission, can_assign_role, can_modify_user
 from jose import JWTError
 from services.sessionManager import SessionManager
+from services.authCache import auth_cache
+from services.passwordHashing import hash_password
 from services.auth import(
     get_current_user,
     create_access_token,
@@ -17,9 +20,10 @@ from services.auth import(
     delete,
     credentials_exception,
     oauth2_scheme,
+    revoke_token,
     )
 
-router = APIRouter(tags=['Users'])
+router = APIRouter(tags=['Users'], route_class=WriteOffLoopRoute)
 
 
 def validate_user_existence(db: Session, username: str, email: str):
@@ -163,7 +167,7 @@ async def create_user(
                 detail="Manager can only create supervisor or cashier"
             )
     # hash password
-    password = User.hash_password(user.password)
+    password = await hash_password(user.password)
     # Create the user
     db_user = User(
         first_name=user.first_name,
@@ -195,7 +199,7 @@ async def login(
     response: Response,
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, login_request.username, login_request.password)
+    user = await authenticate_user(db, login_request.username, login_request.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -217,6 +221,7 @@ async def login(
     # Update user active status
     user.is_active = True
     db.commit()
+    auth_cache.invalidate_user(user.id)
     
     # All devices share the same session ID
     access_token = create_access_token(data={
@@ -261,13 +266,10 @@ async def logout(
     try:
         session_manager.terminate_session(current_user.id)
 
-        # Blacklist the access token (if you have a TokenBlacklist model)
+        # Revoke the access token by its jti until it expires
         access_token = request.cookies.get("access_token")
         if access_token:
-            # Assuming you have a TokenBlacklist model and a way to add tokens to it
-            token_blacklist = TokenBlacklist(token=access_token)
-            db.add(token_blacklist)
-            db.commit()
+            revoke_token(db, access_token)
 
         # Clear the cookies by setting them with empty values and expiring them immediately
         response.delete_cookie(key="access_token")
@@ -415,10 +417,12 @@ async def update_user(
     if user_update.role:
         db_user.role = user_update.role
     if user_update.password:
-        db_user.password = User.hash_password(user_update.password)
+        db_user.password = await hash_password(user_update.password)
     
     db.commit()
     db.refresh(db_user)
+    # Role or identity may have changed; cached principals must be re-verified
+    auth_cache.invalidate_user(db_user.id)
     
     return UserResponse(
         id=str(db_user.id),
@@ -448,6 +452,7 @@ async def delete_record_endpoint(
         current_user=current_user,
         resource_name="users"
     )
+    auth_cache.invalidate_user(user_id)
     return {"message": "User deleted successfully"}
 
 
@@ -466,4 +471,5 @@ async def toggle_model_status(
         raise HTTPException(status_code=404, detail="User not found")
 
     new_status = instance.toggle_enabled(db)
+    auth_cache.invalidate_user(user_id)
     return {"message": "Toggled successfully", "is_enabled": new_status}
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Requests per second for a trivial authenticated endpoint, with and without the auth cache."""
+import argparse
+
+from benchmarks.common import ensure_user, logged_in_client, timed, report
+from services.authCache import auth_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    ensure_user()
+    client = logged_in_client()
+
+    def me():
+        client.get("/api/v1/user/me").raise_for_status()
+
+    results = {}
+    auth_cache.enabled = False
+    results["GET /user/me (no cache)"] = timed(me, args.iterations)
+
+    auth_cache.enabled = True
+    auth_cache.clear()
+    me()  # warm the entry for this token
+    results["GET /user/me (cached)"] = timed(me, args.iterations)
+
+    report("Authenticated request throughput", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Product availability pushed over /ws as stock moves.
+
+Many products share a few raw materials through their recipes. A terminal
+is connected on /ws while raw materials are issued down past what the
+recipes need and restocked again. Reports the cost of inventory
+transactions that cross no recipe threshold (with and without recipes on the
+item), the time from a crossing transaction to its push arriving, and checks
+the maintained projection against a full recompute.
+"""
+import argparse
+import logging
+import random
+import time
+import uuid
+
+from benchmarks.common import ensure_user, logged_in_client, report, timed
+from models.category import Category
+from models.engine.database import SessionLocal, engine
+from models.inventory import InventoryType, QuantityUnit, RawMaterial
+from models.product import Product
+from models.schemas.inventory import RawMaterialCreate
+from models.schemas.product import RecipeItemCreate
+from services.availability import refresh_availability
+from services.catalog import CatalogService
+from services.inventory import InventoryService
+
+URL = "/api/v1/inventory/transactions"
+
+
+def create_menu(materials: int, products: int, stock: float, rng: random.Random):
+    """Raw materials, products using 3 of them each, and one raw material no recipe uses."""
+    user = ensure_user()
+    db = SessionLocal()
+    try:
+        inventory = InventoryService(db)
+        material_ids = [
+            inventory.create_raw_material(RawMaterialCreate(
+                name=f"Ingredient {uuid.uuid4().hex[:8]}",
+                inventory_type=InventoryType.RAW_MATERIAL,
+                quantity=stock,
+                quantity_unit=QuantityUnit.KG,
+            ), user).id
+            for _ in range(materials + 1)
+        ]
+        category = Category(name=f"Menu {uuid.uuid4().hex[:8]}", description="Availability benchmark")
+        db.add(category)
+        db.flush()
+        menu = [
+            Product(name=f"Dish {uuid.uuid4().hex[:8]}", description="Availability benchmark", price=10,
+                    category_id=category.id)
+            for _ in range(products)
+        ]
+        db.add_all(menu)
+        db.commit()
+        catalog = CatalogService(db)
+        recipes = {}
+        for product in menu:
+            recipe = {material_id: float(rng.randint(1, 3)) for material_id in rng.sample(material_ids[:-1], 3)}
+            catalog.set_recipe(product.id, [
+                RecipeItemCreate(inventory_id=material_id, quantity=quantity) for material_id, quantity in recipe.items()
+            ])
+            recipes[product.id] = recipe
+        return material_ids[:-1], material_ids[-1], recipes
+    finally:
+        db.close()
+
+
+def expected_unavailable(recipes: dict) -> set:
+    db = SessionLocal()
+    try:
+        stock = dict(db.query(RawMaterial.id, RawMaterial.quantity))
+        return {
+            product_id for product_id, recipe in recipes.items()
+            if any(stock[material_id] < quantity for material_id, quantity in recipe.items())
+        }
+    finally:
+        db.close()
+
+
+def projection_drift() -> int:
+    """Rows a full recompute would change; 0 when the maintained projection is exact."""
+    db = SessionLocal()
+    try:
+        changes = refresh_availability(db)
+        db.rollback()
+        return len(changes)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--materials", type=int, default=12)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--stock", type=float, default=10.0)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--crossings", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    rng = random.Random(11)
+    materials, unused, recipes = create_menu(args.materials, args.products, args.stock, rng)
+    results = {}
+
+    with logged_in_client() as client, client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "authentication"})
+        assert ws.receive_json()["type"] == "auth_success"
+
+        # Restock and issue back the same unit: the balance stays above every recipe
+        for name, material_id in (("no recipe", unused), ("in recipes", materials[0])):
+            restock = {"inventory_id": str(material_id), "transaction_type": "restock", "quantity": 1}
+            issue = {"inventory_id": str(material_id), "transaction_type": "issue", "quantity": 1}
+
+            def write():
+                client.post(URL, json=restock).raise_for_status()
+                client.post(URL, json=issue).raise_for_status()
+
+            results[f"no crossing, {name}"] = timed(write, args.iterations)
+
+        push_ms, flipped, mismatched = [], [], 0
+        for _ in range(args.crossings):
+            material_id = rng.choice(materials)
+            for transaction_type, quantity in (("issue", args.stock - 0.5), ("restock", args.stock - 0.5)):
+                started = time.perf_counter()
+                client.post(URL, json={
+                    "inventory_id": str(material_id), "transaction_type": transaction_type, "quantity": quantity
+                }).raise_for_status()
+                message = ws.receive_json()
+                push_ms.append((time.perf_counter() - started) * 1000)
+                flipped.append(len(message["products"]))
+                unavailable = expected_unavailable(recipes)
+                mismatched += sum(
+                    (change["is_available"]) == (uuid.UUID(change["product_id"]) in unavailable)
+                    for change in message["products"]
+                )
+        push_ms.sort()
+        results["crossing to push"] = {
+            "pushes": len(push_ms),
+            "mean_products": round(sum(flipped) / len(flipped), 1),
+            "p50_ms": round(push_ms[len(push_ms) // 2], 3),
+            "max_ms": round(push_ms[-1], 3),
+            "wrong_in_push": mismatched,
+        }
+
+    results["check"] = {"projection_drift": projection_drift()}
+    report(f"Product availability ({engine.dialect.name}), {args.products} products "
+           f"over {args.materials} raw materials", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+A stock-take sized batch of inventory transactions, posted one request per
+line and then as a single POST /inventory/transactions/bulk. Reports wall
+time and the SQL statements executed for each, and checks that both leave
+every item at the same stock.
+"""
+import argparse
+import logging
+import random
+import time
+import uuid
+
+from sqlalchemy import event
+
+from benchmarks.common import ensure_user, logged_in_client, report
+from models.engine.database import SessionLocal, engine
+from models.inventory import InventoryType, QuantityUnit, RawMaterial, TransactionType
+from models.schemas.inventory import RawMaterialCreate
+from services.inventory import InventoryService
+
+URL = "/api/v1/inventory/transactions"
+
+
+def create_items(count: int, stock: float) -> list:
+    user = ensure_user()
+    db = SessionLocal()
+    try:
+        service = InventoryService(db)
+        return [
+            service.create_raw_material(RawMaterialCreate(
+                name=f"Bulk {uuid.uuid4().hex[:8]}",
+                inventory_type=InventoryType.RAW_MATERIAL,
+                quantity=stock,
+                quantity_unit=QuantityUnit.KG,
+            ), user).id
+            for _ in range(count)
+        ]
+    finally:
+        db.close()
+
+
+def make_lines(item_ids: list, count: int, seed: int) -> list:
+    """Mostly issues and restocks; some issues exceed the stock and are refused."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        transaction_type = rng.choice([TransactionType.ISSUE] * 3 + [TransactionType.RESTOCK])
+        lines.append({
+            "inventory_id": rng.randrange(len(item_ids)),
+            "transaction_type": transaction_type.value,
+            "quantity": rng.choice([1, 2, 5, 40]),
+        })
+    return lines
+
+
+def stock_levels(item_ids: list) -> list:
+    db = SessionLocal()
+    try:
+        return [db.get(RawMaterial, item_id).quantity for item_id in item_ids]
+    finally:
+        db.close()
+
+
+def run(client, lines: list, items: int, stock: float, bulk: bool) -> dict:
+    item_ids = create_items(items, stock)
+    payload = [
+        {**line, "inventory_id": str(item_ids[line["inventory_id"]])}
+        for line in lines
+    ]
+    counter = {"statements": 0}
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    try:
+        if bulk:
+            response = client.post(f"{URL}/bulk", json={"transactions": payload})
+            response.raise_for_status()
+            applied = response.json()["applied"]
+        else:
+            applied = sum(client.post(URL, json=line).status_code == 201 for line in payload)
+    finally:
+        elapsed = time.perf_counter() - started
+        event.remove(engine, "before_cursor_execute", listener)
+    return {
+        "lines": len(lines),
+        "applied": applied,
+        "seconds": round(elapsed, 3),
+        "statements": counter["statements"],
+        "stock": stock_levels(item_ids),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--stock", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    ensure_user()
+    lines = make_lines(list(range(args.items)), args.lines, args.seed)
+    with logged_in_client() as client:
+        single = run(client, lines, args.items, args.stock, bulk=False)
+        bulk = run(client, lines, args.items, args.stock, bulk=True)
+    same_stock = single.pop("stock") == bulk.pop("stock")
+    report(f"Inventory transactions ({engine.dialect.name}), same resulting stock: {same_stock}", {
+        "one request per line": single,
+        "bulk request": bulk,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Shared setup for the benchmark scripts.
+
+Run them from the pos-backend directory, e.g. `python -m benchmarks.ws_rpc`.
+DATABASE_URL defaults to a throwaway SQLite file so a benchmark never touches
+the real database unless it is pointed there explicitly.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'pos_benchmark.db')}"
+)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "8")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_MINUTES", "7")
+os.environ.setdefault("AUTO_MIGRATE", "true")
+# The benchmark database references none of the files in uploads/, so the
+# orphan collector started by the app lifespan must not consider any of them
+os.environ.setdefault("UPLOAD_GC_GRACE_SECONDS", str(10 * 365 * 24 * 3600))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from models.engine.database import SessionLocal  # noqa: E402
+from models.user import User  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.product import Product  # noqa: E402
+
+
+BENCH_PASSWORD = "benchmark"
+
+
+def ensure_user(username: str = "bench_admin", role: str = "admin") -> User:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+        if not user:
+            user = User(
+                first_name="Bench",
+                last_name=username,
+                username=username,
+                email=f"{username}@example.com",
+                password=User.hash_password(BENCH_PASSWORD),
+                role=role,
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        return user
+    finally:
+        db.close()
+
+
+def ensure_catalog(products: int = 20) -> list:
+    """Create a benchmark category with `products` products and return their ids."""
+    db = SessionLocal()
+    try:
+        category = db.query(Category).filter(Category.name == "Benchmark").first()
+        if not category:
+            category = Category(name="Benchmark", description="Benchmark category")
+            db.add(category)
+            db.flush()
+        existing = db.query(Product).filter(Product.category_id == category.id).count()
+        for i in range(existing, products):
+            db.add(Product(
+                name=f"Benchmark product {i}",
+                description="Benchmark product",
+                price=100 + i,
+                category_id=category.id,
+            ))
+        db.commit()
+        return [
+            p.id for p in
+            db.query(Product).filter(Product.category_id == category.id).limit(products).all()
+        ]
+    finally:
+        db.close()
+
+
+def logged_in_client(username: str = "bench_admin") -> TestClient:
+    client = TestClient(main.app)
+    response = client.post(
+        "/api/v1/user/login", json={"username": username, "password": BENCH_PASSWORD}
+    )
+    response.raise_for_status()
+    return client
+
+
+def timed(func, iterations: int) -> dict:
+    """Call func `iterations` times and summarise the latencies in milliseconds."""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "rps": round(iterations / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def report(title: str, results: dict):
+    print(title)
+    for name, stats in results.items():
+        print(f"  {name:<28} " + "  ".join(f"{k}={v}" for k, v in stats.items()))
@@ -0,0 +1,59 @@
+"""
+Concurrent read-then-write transactions from several threads, the pattern of
+checkout requests arriving at once. Reports throughput and failed commits
+(on SQLite these are "database is locked" errors).
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import ensure_user, report
+from models.engine.database import SessionLocal, engine
+from models.user import User, UserSession
+
+
+def run(threads: int, iterations: int) -> dict:
+    user = ensure_user()
+    errors = []
+
+    def worker():
+        for _ in range(iterations):
+            db = SessionLocal()
+            try:
+                db.query(User).filter(User.id == user.id).first()
+                db.query(UserSession).filter(UserSession.user_id == user.id).count()
+                db.add(UserSession(user_id=user.id, expires=True))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                errors.append(type(e).__name__)
+            finally:
+                db.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    total = threads * iterations
+    return {
+        "transactions": total,
+        "tps": round((total - len(errors)) / elapsed, 1),
+        "failed": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    report(f"Concurrent writes ({engine.dialect.name})", {
+        f"{args.threads} threads": run(args.threads, args.iterations),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Shift-change login storm: many cashiers log in at once while a till keeps
+polling. Reports login throughput and how long the polling requests stall.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import ensure_user, BENCH_PASSWORD
+import main as app_module
+
+
+async def storm(cashiers: int, probe_interval: float):
+    transport = httpx.ASGITransport(app=app_module.app)
+    usernames = [f"bench_cashier_{i}" for i in range(cashiers)]
+    probe_latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append((time.perf_counter() - t0) * 1000)
+                await asyncio.sleep(probe_interval)
+
+    async def login(username):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post(
+                "/api/v1/user/login", json={"username": username, "password": BENCH_PASSWORD}
+            )
+            response.raise_for_status()
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(probe_interval * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(login(u) for u in usernames))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    probe_latencies.sort()
+    return {
+        "logins": cashiers,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(cashiers / elapsed, 1),
+        "probe_p50_ms": round(probe_latencies[len(probe_latencies) // 2], 3),
+        "probe_max_ms": round(probe_latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cashiers", type=int, default=30)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    for i in range(args.cashiers):
+        ensure_user(f"bench_cashier_{i}", role="cashier")
+
+    result = asyncio.run(storm(args.cashiers, args.probe_interval))
+    print("Login storm")
+    print("  " + "  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
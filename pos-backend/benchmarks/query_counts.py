@@ -0,0 +1,115 @@
+"""
+Query-count regression check for the product listings.
+
+Requests each listing with a small catalog and again after the catalog has
+grown, counting the SQL statements per request. Exits non-zero if any count
+grows with the catalog (an N+1 lazy load) or exceeds the budget.
+"""
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+
+# Keep the per-worker caches from refreshing in the middle of a measurement
+os.environ.setdefault("ETAG_REFRESH_SECONDS", "3600")
+os.environ.setdefault("REVOCATION_REFRESH_SECONDS", "3600")
+
+from sqlalchemy import event  # noqa: E402
+
+from benchmarks.common import ensure_user, logged_in_client  # noqa: E402
+from models.engine.database import SessionLocal, engine  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.product import Product  # noqa: E402
+
+
+# Listing queries allowed per request on top of authentication
+QUERY_BUDGET = 2
+
+
+def grow_catalog(categories: int, products_per_category: int) -> list:
+    """Make sure at least this many benchmark categories and products exist; return category ids."""
+    db = SessionLocal()
+    try:
+        ids = []
+        for c in range(categories):
+            name = f"Query count category {c}"
+            category = db.query(Category).filter(Category.name == name).first()
+            if not category:
+                category = Category(name=name, description="Query count category")
+                db.add(category)
+                db.flush()
+            existing = db.query(Product).filter(Product.category_id == category.id).count()
+            for p in range(existing, products_per_category):
+                db.add(Product(name=f"{name} product {p}", description="Query count product",
+                               price=10 + p, category_id=category.id))
+            ids.append(category.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+@contextmanager
+def count_statements():
+    counter = {"statements": 0}
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def measure(client, paths: dict) -> dict:
+    counts = {}
+    for name, path in paths.items():
+        client.get(path)  # warm the auth and ETag caches
+        with count_statements() as counter:
+            response = client.get(path)
+        response.raise_for_status()
+        counts[name] = counter["statements"]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--small", type=int, default=5, help="products per category, first pass")
+    parser.add_argument("--large", type=int, default=50, help="products per category, second pass")
+    args = parser.parse_args()
+
+    ensure_user()
+    with logged_in_client() as client:
+        with count_statements() as counter:
+            client.get("/health")
+            client.get("/api/v1/user/me")
+        auth_overhead = counter["statements"]
+
+        results = []
+        for categories, per_category in ((2, args.small), (10, args.large)):
+            category_ids = grow_catalog(categories, per_category)
+            paths = {
+                "product/all": "/api/v1/product/all",
+                "product/category": f"/api/v1/product/category/{category_ids[0]}",
+                "product/enabled/category": f"/api/v1/product/enabled/category/{category_ids[0]}",
+            }
+            results.append((categories * per_category, measure(client, paths)))
+
+    failures = []
+    (small_size, small), (large_size, large) = results
+    print(f"Statements per request (auth overhead {auth_overhead}):")
+    for name in small:
+        print(f"  {name:<26} {small_size} products: {small[name]}  {large_size} products: {large[name]}")
+        if large[name] != small[name]:
+            failures.append(f"{name} grows with the catalog")
+        if large[name] - auth_overhead > QUERY_BUDGET:
+            failures.append(f"{name} uses more than {QUERY_BUDGET} listing queries")
+    for failure in failures:
+        print(f"  FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
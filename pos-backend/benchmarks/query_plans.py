@@ -0,0 +1,172 @@
+"""
+Query-plan regression check for the hot tables.
+
+Seeds a dataset, runs the report and auth queries through the real services
+while capturing the SQL they emit, then EXPLAINs every captured statement.
+Exits non-zero if any of them reads a hot table with a sequential scan.
+
+On PostgreSQL sequential scans are disabled for the EXPLAIN, so a Seq Scan in
+the plan means no usable index exists rather than a cost-based choice.
+"""
+import argparse
+import json
+import random
+import sys
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, text
+
+from benchmarks.common import ensure_user, ensure_catalog
+from models.engine.database import SessionLocal, engine
+from models.inventory import RawMaterial, InventoryTransaction, TransactionType, QuantityUnit
+from models.sale import Sale, SaleItem
+from models.user import User, UserSession
+from services.inventory import InventoryService
+from services.sales import Sales
+from services.sessionManager import SessionManager
+from utils.time_utils import current_time
+
+
+HOT_TABLES = {"sales", "sale_items", "user_sessions", "inventory_transactions"}
+
+
+def seed(db, sales: int, transactions: int):
+    """Create sessions, sales and inventory transactions unless already present."""
+    if db.query(Sale).count() >= sales:
+        return
+    users = [ensure_user(f"plan_cashier_{i}", role="cashier") for i in range(5)]
+    product_ids = ensure_catalog(products=50)
+    now = current_time()
+
+    sessions = []
+    for user in users:
+        for day in range(30):
+            sessions.append(UserSession(
+                user_id=user.id,
+                login_time=now - timedelta(days=day, hours=8),
+                logout_time=now - timedelta(days=day),
+                expires=True,
+            ))
+        sessions.append(UserSession(user_id=user.id, login_time=now, expires=False))
+    db.add_all(sessions)
+    db.flush()
+
+    for i in range(sales):
+        session = random.choice(sessions)
+        sale = Sale(
+            user_id=session.user_id,
+            session_id=session.id,
+            total_amount=Decimal(0),
+            receipt_number=f"PLAN-{i}",
+            timestamp=session.login_time + timedelta(minutes=random.randint(0, 480)),
+        )
+        db.add(sale)
+        db.flush()
+        for product_id in random.sample(product_ids, 3):
+            db.add(SaleItem(sale_id=sale.id, product_id=product_id, quantity=1,
+                            unit_price=Decimal(100), total_price=Decimal(100)))
+
+    material = RawMaterial(name="Plan flour", quantity=0, quantity_unit=QuantityUnit.KG,
+                           inventory_type="raw_material")
+    db.add(material)
+    db.flush()
+    for i in range(transactions):
+        db.add(InventoryTransaction(
+            inventory_id=material.id,
+            transaction_type=TransactionType.RESTOCK,
+            quantity=1,
+            transaction_date=now - timedelta(minutes=i),
+            created_by_id=users[0].id,
+        ))
+    db.commit()
+
+
+@contextmanager
+def capture_statements():
+    captured = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def run_workload(db):
+    """The queries whose plans are checked: reports, auth and inventory history."""
+    now = current_time()
+    cashier = db.query(User).filter(User.username == "plan_cashier_0").first()
+    active = SessionManager(db).get_active_session(cashier.id)
+    sales = Sales(db)
+    sales.get_sales_report(now - timedelta(days=1), now)
+    sales.get_sales_report(active.login_time, now, session_id=active.id)
+    sales.get_sales_items_report(now - timedelta(days=1), now)
+    material = db.query(RawMaterial).filter(RawMaterial.name == "Plan flour").first()
+    InventoryService(db).get_transactions_by_inventory(material.id, from_date=(now - timedelta(days=1)).date())
+
+
+def sequential_scans(conn, statement, parameters):
+    """Return the hot tables read with a sequential scan in the plan of `statement`."""
+    if engine.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        found, stack = set(), [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                found.add(node["Relation Name"])
+            stack.extend(node.get("Plans", []))
+        return found
+
+    found = set()
+    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+        detail = row[-1]
+        words = detail.split()
+        if words[:1] == ["SCAN"] and len(words) > 1 and words[1] in HOT_TABLES and "INDEX" not in detail:
+            found.add(words[1])
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sales", type=int, default=3000)
+    parser.add_argument("--transactions", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        seed(db, args.sales, args.transactions)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        with capture_statements() as captured:
+            run_workload(db)
+    finally:
+        db.close()
+
+    failures = []
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            tables = {t for t in HOT_TABLES if t in statement}
+            if not tables:
+                continue
+            with conn.begin():
+                scans = sequential_scans(conn, statement, parameters)
+            if scans:
+                failures.append((sorted(scans), " ".join(statement.split())[:160]))
+
+    checked = sum(1 for s, _ in captured if any(t in s for t in HOT_TABLES))
+    print(f"Checked {checked} statements on {engine.dialect.name}")
+    for tables, statement in failures:
+        print(f"  SEQ SCAN on {', '.join(tables)}: {statement}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
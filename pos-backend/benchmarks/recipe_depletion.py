@@ -0,0 +1,176 @@
+"""
+Checkout latency for products with no recipe and with small and large
+recipes, then the background depletion of everything sold.
+
+`queued` is what checkout does now: the sale only writes its depletion queue
+rows, and services.depletion drains the queue in batches afterwards.
+`inline` drains the queue right after each sale, the cost checkout would
+carry if it depleted the recipes itself. The check compares every raw
+material with the stock its recipes say should be left and verifies its
+ledger. Queued sales are rung up by --sellers users in turn, so one drain
+posts several sellers' entries to the same items.
+"""
+import os
+
+# Drained explicitly below, not by the app's background loop
+os.environ.setdefault("DEPLETION_INTERVAL_SECONDS", str(24 * 3600))
+
+import argparse  # noqa: E402
+import itertools  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+
+from benchmarks.common import ensure_user, logged_in_client, report, timed  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.engine.database import SessionLocal, engine  # noqa: E402
+from models.inventory import InventoryType, QuantityUnit, RawMaterial  # noqa: E402
+from models.product import Product  # noqa: E402
+from models.sale import StockDepletion  # noqa: E402
+from models.schemas.inventory import RawMaterialCreate  # noqa: E402
+from services.depletion import deplete_batch, drain_depletion_queue  # noqa: E402
+from services.inventory import InventoryService  # noqa: E402
+from services.inventoryLedger import InventoryLedger  # noqa: E402
+
+
+def create_materials(count: int, stock: float) -> list:
+    user = ensure_user()
+    db = SessionLocal()
+    try:
+        service = InventoryService(db)
+        return [
+            service.create_raw_material(RawMaterialCreate(
+                name=f"Ingredient {uuid.uuid4().hex[:8]}",
+                inventory_type=InventoryType.RAW_MATERIAL,
+                quantity=stock,
+                quantity_unit=QuantityUnit.GRAM,
+            ), user).id
+            for _ in range(count)
+        ]
+    finally:
+        db.close()
+
+
+def create_products(count: int) -> list:
+    db = SessionLocal()
+    try:
+        category = Category(name=f"Recipes {uuid.uuid4().hex[:8]}", description="Recipe benchmark")
+        db.add(category)
+        db.flush()
+        products = [
+            Product(name=f"Dish {uuid.uuid4().hex[:8]}", description="Recipe benchmark", price=10,
+                    category_id=category.id)
+            for _ in range(count)
+        ]
+        db.add_all(products)
+        db.commit()
+        return [product.id for product in products]
+    finally:
+        db.close()
+
+
+def stock(material_ids: list) -> dict:
+    db = SessionLocal()
+    try:
+        return dict(db.query(RawMaterial.id, RawMaterial.quantity).filter(RawMaterial.id.in_(material_ids)))
+    finally:
+        db.close()
+
+
+def queued() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(StockDepletion).count()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sales", type=int, default=200, help="sales per recipe size and mode")
+    parser.add_argument("--materials", type=int, default=60)
+    parser.add_argument("--stock", type=float, default=1_000_000.0)
+    parser.add_argument("--recipe-sizes", type=int, nargs="+", default=[0, 5, 25])
+    parser.add_argument("--sellers", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    ensure_user()
+    seller_names = [f"bench_seller_{n}" for n in range(1, args.sellers)]
+    for name in seller_names:
+        ensure_user(name)
+    rng = random.Random(5)
+    materials = create_materials(args.materials, args.stock)
+    expected_use = {material_id: 0.0 for material_id in materials}
+    results = {}
+
+    with logged_in_client() as client:
+        sales = {}
+        for size in args.recipe_sizes:
+            products = create_products(3)
+            for product_id in products:
+                recipe = {material_id: round(rng.uniform(0.5, 20), 2) for material_id in rng.sample(materials, size)}
+                client.put(f"/api/v1/product/{product_id}/recipe", json={"items": [
+                    {"inventory_id": str(material_id), "quantity": quantity} for material_id, quantity in recipe.items()
+                ]}).raise_for_status()
+                for material_id, quantity in recipe.items():
+                    # 2 units a sale, sold in both modes
+                    expected_use[material_id] += 2 * quantity * args.sales * 2
+            sales[size] = {"items": [{"product_id": str(product_id), "quantity": 2} for product_id in products]}
+
+        sellers = itertools.cycle([client] + [logged_in_client(name) for name in seller_names])
+
+        def checkout(sale, seller=client):
+            seller.post("/api/v1/sales/create", json=sale).raise_for_status()
+
+        def checkout_and_deplete(sale):
+            checkout(sale)
+            db = SessionLocal()
+            try:
+                deplete_batch(db)
+            finally:
+                db.close()
+
+        # Warm up the server before measuring with a product that has no recipe
+        warm_up = {"items": [{"product_id": str(create_products(1)[0]), "quantity": 1}]}
+        for _ in range(20):
+            checkout(warm_up)
+        for size, sale in sales.items():
+            results[f"queued, recipe of {size}"] = timed(lambda: checkout(sale, next(sellers)), args.sales)
+
+        backlog = queued()
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            drained = drain_depletion_queue(db)
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - started
+        results["drain queue"] = {
+            "sellers": args.sellers, "sale_items": drained["sale_items"], "backlog": backlog, "transactions": drained["applied"],
+            "failed": drained["failed"], "ms": round(elapsed * 1000, 1),
+        }
+
+        for size, sale in sales.items():
+            results[f"inline, recipe of {size}"] = timed(lambda: checkout_and_deplete(sale), args.sales)
+
+    levels = stock(materials)
+    db = SessionLocal()
+    try:
+        ledger = InventoryLedger(db)
+        results["check"] = {
+            "wrong_stock": sum(
+                abs(levels[material_id] - (args.stock - used)) > 1e-6 for material_id, used in expected_use.items()
+            ),
+            "inconsistent_ledger": sum(
+                not ledger.verify(material_id, full=True)["consistent"] for material_id in materials
+            ),
+        }
+    finally:
+        db.close()
+    report(f"Recipe depletion ({engine.dialect.name}), 3 products x 2 units per sale", results)
+
+
+if __name__ == "__main__":
+    main()
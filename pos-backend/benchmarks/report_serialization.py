@@ -0,0 +1,137 @@
+"""
+Build and serialize an unpaginated sales report, the shape the session reports
+return. Compares the response paths for the same SaleSummary:
+
+  jsonable_encoder   jsonable_encoder + json.dumps, what JSONResponse does for
+                     routes without a response_model or with a custom
+                     response_class
+  orjson             model_dump(mode="json") + orjson.dumps (if installed)
+  dump_json          TypeAdapter.dump_json, what FastAPI uses for routes with a
+                     response_model and the default response class
+
+and checks that all of them produce the same document.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert
+
+from benchmarks.common import ensure_catalog, ensure_user
+from models.engine.database import SessionLocal
+from models.sale import Sale, SaleItem
+from models.schemas.sale import SaleSummary, SaleItemsSummary
+from models.user import UserSession
+from services.sales import Sales
+from utils.time_utils import current_time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+RECEIPT_PREFIX = "BENCH-JSON-"
+
+
+def seed_sales(rows: int):
+    """Make sure `rows` one-item benchmark sales exist in the last day."""
+    user = ensure_user()
+    product_ids = ensure_catalog(20)
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Sale.id)).filter(
+            Sale.receipt_number.like(f"{RECEIPT_PREFIX}%")
+        ).scalar()
+        if existing >= rows:
+            return
+        session = UserSession(user_id=user.id, expires=True)
+        db.add(session)
+        db.flush()
+        now = current_time()
+        sales, items = [], []
+        for i in range(existing, rows):
+            sale_id = uuid4()
+            price = Decimal(100 + i % 50) / 4
+            sales.append({
+                "id": sale_id, "user_id": user.id, "session_id": session.id,
+                "total_amount": price * 2, "timestamp": now - timedelta(seconds=i),
+                "receipt_number": f"{RECEIPT_PREFIX}{i:06d}",
+            })
+            items.append({
+                "id": uuid4(), "sale_id": sale_id, "product_id": product_ids[i % len(product_ids)],
+                "quantity": 2, "unit_price": price, "total_price": price * 2,
+            })
+        db.execute(insert(Sale), sales)
+        db.execute(insert(SaleItem), items)
+        db.commit()
+    finally:
+        db.close()
+
+
+def best_of(func, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, {"best_ms": round(min(samples), 1), "median_ms": round(statistics.median(samples), 1)}
+
+
+def serializers(model_type):
+    adapter = TypeAdapter(model_type)
+    paths = {
+        "jsonable_encoder": lambda value: json.dumps(jsonable_encoder(value)).encode(),
+        "dump_json": lambda value: adapter.dump_json(value),
+    }
+    if orjson is not None:
+        paths["orjson"] = lambda value: orjson.dumps(value.model_dump(mode="json"))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed_sales(args.rows)
+    end = current_time()
+    start = end - timedelta(days=1)
+
+    db = SessionLocal()
+    try:
+        service = Sales(db)
+        reports = {
+            "sales report": (SaleSummary, lambda: service.get_sales_report(start, end)),
+            "items report": (SaleItemsSummary, lambda: service.get_sales_items_report(start, end)),
+        }
+        mismatches = []
+        for title, (model_type, build) in reports.items():
+            summary, build_stats = best_of(build, args.repeat)
+            print(f"{title}: {len(summary.rows)} rows")
+            print(f"  {'build':<18} " + "  ".join(f"{k}={v}" for k, v in build_stats.items()))
+            documents = {}
+            for name, serialize in serializers(model_type).items():
+                body, stats = best_of(lambda: serialize(summary), args.repeat)
+                documents[name] = json.loads(body)
+                print(f"  {name:<18} " + "  ".join(f"{k}={v}" for k, v in stats.items())
+                      + f"  bytes={len(body)}")
+            reference = documents["dump_json"]
+            mismatches += [f"{title}: {name}" for name, doc in documents.items() if doc != reference]
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        print(f"  MISMATCH: {mismatch} differs from dump_json")
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Typeahead search latency over a large catalogue.
+
+Fills the database up to --inventory inventory items (plus products and
+suppliers) named from a small vocabulary, so short prefixes match many rows,
+then times GET /search for prefixes of 1 to 5 characters and two-word
+queries. `legacy` is the ILIKE '%term%' filter the inventory search used
+before, ordered by creation time as it was; `indexed` is the same filter
+through SearchService.matching_ids(). The check compares the hits of a
+word query with a plain scan of the names.
+"""
+import argparse
+import logging
+import random
+import uuid
+
+from sqlalchemy import insert, or_, select
+
+from benchmarks.common import ensure_user, logged_in_client, report, timed
+from models.category import Category
+from models.engine.database import SessionLocal, engine
+from models.inventory import Inventory, InventoryType, QuantityUnit, RawMaterial
+from models.product import Product
+from models.supplier import Supplier
+from services.search import SearchService
+from utils.time_utils import current_time
+
+ADJECTIVES = ["fresh", "frozen", "organic", "smoked", "dried", "roasted", "sweet", "spicy", "crushed", "whole"]
+FOODS = [
+    "tomato", "chicken", "cheddar", "chocolate", "cinnamon", "basil", "butter", "mango", "onion", "garlic",
+    "pepper", "salmon", "vanilla", "walnut", "coffee", "lemon", "spinach", "potato", "rice", "yoghurt",
+]
+PACKS = ["sack", "crate", "tray", "bottle", "tin", "jar", "bag", "box"]
+
+BATCH = 5000
+
+
+def phrase(rng: random.Random) -> str:
+    return f"{rng.choice(ADJECTIVES).title()} {rng.choice(FOODS)} {rng.choice(PACKS)} {rng.randint(1, 999)}"
+
+
+def fill(model_count, rows, target: int, label: str):
+    """Insert rows from `rows()` in batches until the table holds `target`."""
+    db = SessionLocal()
+    try:
+        missing = target - db.query(model_count).count()
+        while missing > 0:
+            batch = rows(min(BATCH, missing))
+            for table, values in batch:
+                db.execute(insert(table), values)
+            db.commit()
+            missing -= len(batch[0][1])
+        logging.getLogger(__name__).info("%s: %s rows", label, db.query(model_count).count())
+    finally:
+        db.close()
+
+
+def create_data(inventory: int, products: int, suppliers: int, rng: random.Random):
+    def raw_materials(count):
+        now = current_time()
+        ids = [uuid.uuid4() for _ in range(count)]
+        return [
+            (Inventory.__table__, [{
+                "id": item_id, "name": phrase(rng), "description": f"{phrase(rng)} from the {rng.choice(FOODS)} shelf",
+                "inventory_type": InventoryType.RAW_MATERIAL, "created_at": now, "updated_at": now,
+                "is_enabled": True,
+            } for item_id in ids]),
+            (RawMaterial.__table__, [{
+                "id": item_id, "quantity": 0, "quantity_unit": QuantityUnit.KG,
+            } for item_id in ids]),
+        ]
+
+    db = SessionLocal()
+    try:
+        category = Category(name=f"Search {uuid.uuid4().hex[:8]}", description="Search benchmark")
+        db.add(category)
+        db.commit()
+        category_id = category.id
+    finally:
+        db.close()
+
+    def menu(count):
+        return [(Product.__table__, [{
+            "id": uuid.uuid4(), "name": phrase(rng), "description": "Search benchmark", "price": 10,
+            "category_id": category_id,
+        } for _ in range(count)])]
+
+    def vendors(count):
+        return [(Supplier.__table__, [{
+            "id": uuid.uuid4(), "company_name": f"{rng.choice(FOODS).title()} {rng.choice(PACKS)} Traders "
+                                                f"{uuid.uuid4().hex[:6]}",
+            "contact_person": f"{rng.choice(ADJECTIVES).title()} Person", "phone_number": "000",
+        } for _ in range(count)])]
+
+    fill(Inventory.id, raw_materials, inventory, "inventory")
+    fill(Product.id, menu, products, "products")
+    fill(Supplier.id, vendors, suppliers, "suppliers")
+
+
+def legacy_ids(db, term: str, limit: int = 10):
+    return db.execute(
+        select(Inventory.id)
+        .where(or_(Inventory.name.ilike(f"%{term}%"), Inventory.description.ilike(f"%{term}%")))
+        .order_by(Inventory.created_at.desc())
+        .limit(limit)
+    ).all()
+
+
+def indexed_ids(db, term: str, limit: int = 10):
+    return db.execute(
+        select(Inventory.id)
+        .where(Inventory.id.in_(SearchService(db).matching_ids("inventory", term)))
+        .order_by(Inventory.created_at.desc())
+        .limit(limit)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inventory", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--suppliers", type=int, default=2_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    rng = random.Random(50)
+    ensure_user()
+    create_data(args.inventory, args.products, args.suppliers, rng)
+    results = {}
+
+    word = "chocolate"
+    queries = {f"prefix {n}": word[:n] for n in range(1, 6)}
+    queries["two words"] = "smok sal"
+    queries["no match"] = "zzzq"
+
+    with logged_in_client() as client:
+        for name, q in queries.items():
+            results[f"/search {name}"] = timed(
+                lambda: client.get("/api/v1/search", params={"q": q}).raise_for_status(), args.iterations
+            )
+
+    db = SessionLocal()
+    try:
+        for name in ("prefix 3", "two words"):
+            term = queries[name]
+            results[f"legacy filter {name}"] = timed(lambda: legacy_ids(db, term), args.iterations)
+            results[f"indexed filter {name}"] = timed(lambda: indexed_ids(db, term), args.iterations)
+
+        hits = {row.id for row in SearchService(db).search(word, ensure_user(), ["inventory"], 50).inventory}
+        expected = {
+            item_id for item_id, item_name, description in
+            db.query(Inventory.id, Inventory.name, Inventory.description)
+            if word in item_name.lower().split() or word in (description or "").lower().split()
+        }
+        results["check"] = {
+            "matching_rows": len(expected),
+            "hits_not_matching": len(hits - expected),
+            "filter_rows": db.query(Inventory.id).filter(
+                Inventory.id.in_(SearchService(db).matching_ids("inventory", word))
+            ).count(),
+        }
+    finally:
+        db.close()
+
+    report(f"Search ({engine.dialect.name}), {args.inventory} inventory items", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Many workers issuing the same raw material at once, the pattern of several
+departments drawing on one ingredient at the same moment.
+
+`service` goes through InventoryService.process_transaction (atomic balance
+moves). `read-modify-write` is the pattern it replaced: read the quantity,
+subtract in Python, write it back. Both start from the same stock and request
+more than it holds in total, so a correct run ends at exactly zero with every
+surplus issue refused and nothing lost.
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from benchmarks.common import ensure_user, report
+from models.engine.database import SessionLocal, engine
+from models.inventory import InventoryType, QuantityUnit, RawMaterial, TransactionType
+from models.schemas.inventory import RawMaterialCreate, TransactionCreate
+from services.inventory import InventoryService
+from services.inventoryLedger import InventoryLedger
+
+
+def create_item(stock: float):
+    user = ensure_user()
+    db = SessionLocal()
+    try:
+        item = InventoryService(db).create_raw_material(RawMaterialCreate(
+            name=f"Contention {uuid.uuid4().hex[:8]}",
+            inventory_type=InventoryType.RAW_MATERIAL,
+            quantity=stock,
+            quantity_unit=QuantityUnit.KG,
+        ), user)
+        return item.id, user
+    finally:
+        db.close()
+
+
+def issue_via_service(db, inventory_id, user, quantity):
+    InventoryService(db).process_transaction(TransactionCreate(
+        inventory_id=inventory_id,
+        transaction_type=TransactionType.ISSUE,
+        quantity=quantity,
+    ), user)
+
+
+def issue_read_modify_write(db, inventory_id, user, quantity):
+    item = db.get(RawMaterial, inventory_id)
+    if item.quantity < quantity:
+        raise HTTPException(status_code=400, detail="Not enough raw material inventory available")
+    item.quantity = item.quantity - quantity
+    db.commit()
+
+
+def run(issue, stock: float, workers: int, iterations: int, quantity: float) -> dict:
+    inventory_id, user = create_item(stock)
+    issued, refused, errors = [], [], []
+
+    def worker():
+        for _ in range(iterations):
+            db = SessionLocal()
+            try:
+                issue(db, inventory_id, user, quantity)
+                issued.append(quantity)
+            except HTTPException as e:
+                db.rollback()
+                (refused if e.status_code == 400 else errors).append(e.detail)
+            except Exception as e:
+                db.rollback()
+                errors.append(type(e).__name__)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        item = db.get(RawMaterial, inventory_id)
+        final_quantity = item.quantity
+        final_balance = item.current_balance()
+        consistent = InventoryLedger(db).verify(inventory_id, full=True)["consistent"]
+    finally:
+        db.close()
+    total = workers * iterations
+    return {
+        "requests": total,
+        "tps": round(total / elapsed, 1),
+        "issued": len(issued),
+        "refused": len(refused),
+        "errors": len(errors),
+        "final_quantity": round(final_quantity, 6),
+        "final_balance": round(final_balance, 6),
+        # Stock that vanished or appeared without a successful issue to show for it
+        "lost_updates": round(stock - sum(issued) - final_quantity, 6),
+        "negative": final_quantity < 0 or final_balance < 0,
+        "ledger_consistent": consistent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--quantity", type=float, default=1.0)
+    parser.add_argument("--stock", type=float, default=None,
+                        help="starting stock (default: 3/4 of what the workers request)")
+    args = parser.parse_args()
+    stock = args.stock if args.stock is not None else args.workers * args.iterations * args.quantity * 0.75
+    report(f"Stock contention ({engine.dialect.name}), starting stock {stock}", {
+        "service": run(issue_via_service, stock, args.workers, args.iterations, args.quantity),
+        "read-modify-write": run(issue_read_modify_write, stock, args.workers, args.iterations, args.quantity),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+A cycle count over thousands of SKUs: open a count, upload every counted
+quantity in one request, list the variances and post them. Reports the time
+and SQL statements of each step and checks the items, balances and ledger
+afterwards.
+"""
+import argparse
+import logging
+import random
+import time
+import uuid
+
+from sqlalchemy import event
+
+from benchmarks.common import ensure_user, logged_in_client, report
+from models.engine.database import SessionLocal, engine
+from models.inventory import (
+    Equipment,
+    Inventory,
+    InventoryBalance,
+    InventoryTransaction,
+    InventoryType,
+    QuantityUnit,
+    RawMaterial,
+    TransactionType,
+)
+from services.inventoryLedger import InventoryLedger
+
+URL = "/api/v1/inventory/stock-counts"
+
+
+def create_skus(count: int, stock: int) -> list:
+    """Items with an opening RESTOCK, written directly: the count is what is measured."""
+    user = ensure_user()
+    db = SessionLocal()
+    try:
+        prefix = uuid.uuid4().hex[:6]
+        items = []
+        for i in range(count):
+            if i % 10 == 0:
+                items.append(Equipment(name=f"Count {prefix} {i}", inventory_type=InventoryType.EQUIPMENT,
+                                       total_units=stock, available_units=stock))
+            else:
+                items.append(RawMaterial(name=f"Count {prefix} {i}", inventory_type=InventoryType.RAW_MATERIAL,
+                                         quantity=stock, quantity_unit=QuantityUnit.PIECE,
+                                         critical_threshold=stock // 4))
+        db.add_all(items)
+        db.flush()
+        db.add_all(InventoryTransaction(inventory_id=item.id, transaction_type=TransactionType.RESTOCK,
+                                        quantity=stock, resulting_quantity=stock, ledger_seq=1,
+                                        created_by_id=user.id, is_system_generated=True)
+                   for item in items)
+        db.add_all(InventoryBalance(inventory_id=item.id, balance=stock, ledger_seq=1, restocked=stock)
+                   for item in items)
+        db.commit()
+        return [item.id for item in items]
+    finally:
+        db.close()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+
+def step(func) -> tuple:
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - started
+        event.remove(engine, "before_cursor_execute", counter)
+    return result, {"ms": round(elapsed * 1000, 1), "statements": counter.statements}
+
+
+def check(counts: dict, sample: int) -> dict:
+    db = SessionLocal()
+    try:
+        ledger = InventoryLedger(db)
+        mismatched = inconsistent = 0
+        for inventory_id in random.sample(list(counts), min(sample, len(counts))):
+            item = db.get(Inventory, inventory_id)
+            if item.stock_level() != counts[inventory_id] or item.current_balance() != counts[inventory_id]:
+                mismatched += 1
+            if not ledger.verify(inventory_id, full=True)["consistent"]:
+                inconsistent += 1
+        return {"sampled": min(sample, len(counts)), "wrong_stock": mismatched, "inconsistent_ledger": inconsistent}
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--stock", type=int, default=40)
+    parser.add_argument("--variance-share", type=float, default=0.3,
+                        help="share of SKUs whose count differs from the ledger")
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    ensure_user()
+    ids = create_skus(args.skus, args.stock)
+    rng = random.Random(3)
+    counts = {
+        inventory_id: max(0, args.stock + rng.randint(-args.stock, 10)) if rng.random() < args.variance_share
+        else args.stock
+        for inventory_id in ids
+    }
+
+    with logged_in_client() as client:
+        count_id = client.post(URL, json={"name": "Benchmark count"}).json()["id"]
+        upload, upload_stats = step(lambda: client.put(f"{URL}/{count_id}/lines", json={
+            "counts": [{"inventory_id": str(i), "counted_quantity": q} for i, q in counts.items()]
+        }).json())
+        variances, variance_stats = step(lambda: client.get(f"{URL}/{count_id}").json())
+        posted, post_stats = step(lambda: client.post(f"{URL}/{count_id}/post").json())
+
+    report(f"Stock count of {args.skus} SKUs ({engine.dialect.name})", {
+        "upload counts": {**upload_stats, "recorded": upload["recorded"]},
+        "list variances": {**variance_stats, "variances": variances["adjustments"]},
+        "post count": {**post_stats, "status": posted["status"], "adjustments": posted["adjustments"]},
+        "check": check(counts, args.sample),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Checkout and catalog lookup latency: HTTP endpoints vs. RPC over /ws."""
+import argparse
+import itertools
+
+from benchmarks.common import ensure_user, ensure_catalog, logged_in_client, timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    ensure_user()
+    product_ids = [str(p) for p in ensure_catalog()]
+    client = logged_in_client()
+    sale = {"items": [{"product_id": product_ids[0], "quantity": 1},
+                      {"product_id": product_ids[1], "quantity": 2}]}
+
+    results = {
+        "http sales/create": timed(
+            lambda: client.post("/api/v1/sales/create", json=sale).raise_for_status(),
+            args.iterations,
+        ),
+        "http category/enabled": timed(
+            lambda: client.get("/api/v1/category/enabled").raise_for_status(),
+            args.iterations,
+        ),
+    }
+
+    ids = itertools.count()
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "authentication"})
+        assert ws.receive_json()["type"] == "auth_success"
+
+        def call(method, params=None):
+            request_id = str(next(ids))
+            ws.send_json({"type": "rpc", "id": request_id, "method": method, "params": params or {}})
+            reply = ws.receive_json()
+            assert reply["id"] == request_id and reply["type"] == "rpc_result", reply
+
+        results["ws sales.create"] = timed(lambda: call("sales.create", sale), args.iterations)
+        results["ws catalog.categories"] = timed(lambda: call("catalog.categories"), args.iterations)
+
+    report("HTTP vs /ws RPC", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,27 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from api.v1.views import api_router
-from models.engine.database import engine, Base, get_db
+from models.engine.database import engine, get_db, get_websocket_db
+from models.engine.pool import pool_liveness_loop, pool_status
+from models.engine.replica import replica_router
+from models.engine.migrate import ensure_schema
 from utils.time_utils import current_time
 from server.websocket import manager
+from server.rpc import rpc
 from server.discovery import ZeroconfPublisher
+from server.staticFiles import UploadStaticFiles
+from services.auth import revocation_purge_loop
+from services.uploads import upload_gc_loop
+from services.depletion import depletion_loop
+from services.availability import availability_feed
+from utils.imageUpload import shutdown_pool as shutdown_image_pool
 from contextlib import asynccontextmanager
 import logging
+import asyncio
+import json
+import time
 
 
 WEBSOCKET_PORT = 8000
@@ -23,7 +36,23 @@ logging.basicConfig(level=logging.INFO,
 async def lifespan(app: FastAPI):
     # Start Zeroconf service on startup
     zeroconf_publisher.start()
+    # Product availability changes are committed on any thread and pushed from this loop
+    availability_feed.bind(asyncio.get_running_loop(), manager.broadcast)
+    # Periodically drop revocations of tokens that have expired
+    purge_task = asyncio.create_task(revocation_purge_loop())
+    # Delete image files left behind when a product, category or logo image is replaced
+    upload_gc_task = asyncio.create_task(upload_gc_loop())
+    # Take sold products' recipes off raw material stock in batches, away from checkout
+    depletion_task = asyncio.create_task(depletion_loop())
+    # Detect dropped database connections in the background instead of pinging on every checkout
+    liveness_task = asyncio.create_task(pool_liveness_loop(engine))
     yield
+    liveness_task.cancel()
+    purge_task.cancel()
+    upload_gc_task.cancel()
+    depletion_task.cancel()
+    # Let queued image renders finish before the workers exit
+    shutdown_image_pool()
     # Stop Zeroconf service on shutdown
     zeroconf_publisher.stop()
 
@@ -55,12 +84,22 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
+
+@app.middleware("http")
+async def add_process_time_header(request: Request, call_next):
+    """Expose server-side handling time so HTTP and /ws RPC latency can be compared."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    response.headers["X-Process-Time"] = f"{(time.perf_counter() - started) * 1000:.3f}"
+    return response
+
+
+ensure_schema()
 
 app.include_router(api_router)
 
-# Serve static files from the "uploads" directory
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Serve static files from the "uploads" directory; uploaded images are cached as immutable
+app.mount("/uploads", UploadStaticFiles(directory="uploads"), name="uploads")
 
 
 @app.get("/")
@@ -77,6 +116,18 @@ async def health_check():
     }
 
 
+@app.get("/health/pool")
+async def pool_health():
+    """Connection pool occupancy, wait times and timeouts for this worker."""
+    return pool_status(engine)
+
+
+@app.get("/health/replica")
+async def replica_health():
+    """Read-replica health, lag and how many reads it served."""
+    return replica_router.status()
+
+
 # @app.websocket("/ws")
 # async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
 #     """Handles WebSocket connections with authentication."""
@@ -101,7 +152,7 @@ async def health_check():
 #         await websocket.close(code=4001, reason=str(e))
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_websocket_db)):
     user = None  # Initialize user to None
     try:
         # Accept the connection first
@@ -121,10 +172,26 @@ async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)
             # Send authentication success
             await websocket.send_json({"type": "auth_success"})
             
-            # Handle messages
+            # Handle messages: RPC requests are dispatched on this connection's
+            # session and user, anything else is echoed back as before
             while True:
                 data = await websocket.receive_text()
-                await manager.send_personal_message(f"Message received: {data}", user.id)
+                try:
+                    message = json.loads(data)
+                except ValueError:
+                    message = None
+
+                if isinstance(message, dict) and message.get("type") == "rpc":
+                    # Off the loop: a write may wait for the writer lock
+                    reply = await run_in_threadpool(rpc.dispatch, message, user, db)
+                    await websocket.send_json(reply)
+                    if rpc.ends_connection(reply):
+                        if manager.active_connections.get(user.id) is websocket:
+                            del manager.active_connections[user.id]
+                        await websocket.close(code=4001, reason=reply["error"]["message"])
+                        return
+                else:
+                    await manager.send_personal_message(f"Message received: {data}", user.id)
         else:
             await websocket.send_json({"type": "auth_failed", "message": "Invalid authentication request"})
             await websocket.close(code=4001)
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from .guid import GUID
 from sqlalchemy.orm import Session
 from .engine.database import Base
 import uuid
@@ -9,7 +9,7 @@ from utils.time_utils import current_time
 class BaseModel(Base):
     __abstract__ = True
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime, default=current_time)
     updated_at = Column(DateTime, default=current_time, onupdate=current_time)
     is_enabled = Column(Boolean, default=True)
@@ -1,89 +1,94 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 import os
 import dotenv
 
+from models.engine.pool import InstrumentedQueuePool
+from models.engine import sqlite as sqlite_profile
+
 # Load environment variables
 dotenv.load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-# Create engine
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Without DATABASE_URL the server runs on the embedded SQLite profile
+# (models.engine.sqlite), which needs no database server.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///pos.db")
 
-# Create session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-ScopedSession = scoped_session(SessionLocal)
+# Pool sizing is per worker process: total connections to the server are
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW). Dead connections are detected by
+# the background liveness check (models.engine.pool) rather than a pre-ping on
+# every checkout; set DB_POOL_PRE_PING=true to get the per-checkout ping back.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
 
-# Base class for models
-Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = ScopedSession()
-    try:
-        # db.execute(text("SET TIME ZONE 'Africa/Lagos'"))
-        yield db
-    finally:
-        db.close()
+def _is_memory_sqlite(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
 
 
-async def get_websocket_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _engine_options(url: str) -> dict:
+    if _is_memory_sqlite(url):
+        # In-memory SQLite uses a single shared connection, not a queue pool
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
 
 
-'''from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.ext.declarative import declarative_base
-import os
-import dotenv
+# Create engine
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
-# Load environment variables
-dotenv.load_dotenv()
+if sqlite_profile.is_sqlite(engine):
+    sqlite_profile.configure_engine(engine, in_memory=_is_memory_sqlite(DATABASE_URL))
+
+# Create session
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ScopedSession = scoped_session(SessionLocal)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+if sqlite_profile.is_sqlite(engine):
+    sqlite_profile.install_single_writer(engine, SessionLocal)
 
-# Create engine with connection pooling configuration
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=20,  # Maximum number of persistent connections
-    max_overflow=10,  # Maximum number of connections that can be created beyond pool_size
-    pool_timeout=30,  # Timeout for getting connection from pool (seconds)
-    pool_pre_ping=True,  # Enable connection health checks
-    pool_recycle=3600,  # Recycle connections after 1 hour
+# Optional read-only replica for reports, search and exports (models.engine.replica)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+replica_engine = (
+    create_engine(REPLICA_DATABASE_URL, **_engine_options(REPLICA_DATABASE_URL))
+    if REPLICA_DATABASE_URL else None
 )
-
-# Create session factory
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine
+if replica_engine is not None and sqlite_profile.is_sqlite(replica_engine):
+    sqlite_profile.configure_engine(replica_engine, in_memory=_is_memory_sqlite(REPLICA_DATABASE_URL))
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else None
 )
 
-# Create scoped session
-ScopedSession = scoped_session(SessionLocal)
-
 # Base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get DB session. Each request gets its own session: async routes
+# all run on the event loop thread, so a thread-scoped session would be shared
+# by every request that awaits (e.g. login waiting on the hashing pool).
 def get_db():
-    db = ScopedSession()
+    db = SessionLocal()
     try:
-        db.execute(text("SET TIME ZONE 'Africa/Lagos'"))
+        # db.execute(text("SET TIME ZONE 'Africa/Lagos'"))
         yield db
     finally:
-        ScopedSession.remove()  # Remove session from registry instead of just closing
+        db.close()
+
 
-# For WebSocket connections
 async def get_websocket_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-'''
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Versioned schema migrations.
+
+The database records the last applied migration in a single `schema_version`
+row. Workers only compare that row with the latest migration at startup; the
+migrations themselves are applied by running
+
+    python -m models.engine.migrate            # apply pending migrations
+    python -m models.engine.migrate --status   # show current/latest version
+
+or automatically at startup when AUTO_MIGRATE=true (single-process setups).
+"""
+import argparse
+import logging
+import os
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CheckConstraint, CreateIndex, CreateTable, Index
+
+from models.engine.database import engine as default_engine
+from utils.time_utils import current_time
+
+logger = logging.getLogger(__name__)
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() == "true"
+# Arbitrary key for pg_advisory_lock so only one process migrates at a time
+MIGRATION_LOCK_KEY = 7_310_452_119
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("id", Integer, primary_key=True, default=1),
+    Column("version", Integer, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, upgrade: Callable, transactional: bool):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, transactional: bool = True):
+    """
+    Register a migration.
+
+    Transactional migrations receive a Connection inside a transaction that also
+    bumps schema_version. Non-transactional ones (concurrent index builds,
+    batched backfills) receive the Engine and manage their own commits; they
+    must be safe to re-run if interrupted.
+    """
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, name, func, transactional))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    _load_migrations()
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(engine: Engine = default_engine) -> int:
+    """The fast-path check: a single-row read (0 if never migrated)."""
+    with engine.connect() as conn:
+        try:
+            version = conn.execute(
+                select(schema_version.c.version).where(schema_version.c.id == 1)
+            ).scalar()
+        except Exception:
+            # Table does not exist yet
+            return 0
+    return version or 0
+
+
+def check_schema_version(engine: Engine = default_engine):
+    """Raise if the database is behind the code."""
+    current, latest = current_version(engine), latest_version()
+    if current < latest:
+        raise RuntimeError(
+            f"Database schema is at version {current}, code expects {latest}. "
+            f"Run `python -m models.engine.migrate` before starting the server."
+        )
+
+
+def ensure_schema(engine: Engine = default_engine):
+    """Called at startup: migrate if AUTO_MIGRATE is set, otherwise only check."""
+    if AUTO_MIGRATE:
+        migrate(engine)
+    else:
+        check_schema_version(engine)
+
+
+def migrate(engine: Engine = default_engine, target: Optional[int] = None) -> int:
+    """Apply pending migrations up to `target` (default: latest). Returns the new version."""
+    _load_migrations()
+    with _migration_lock(engine):
+        version_metadata.create_all(bind=engine)
+        current = current_version(engine)
+        for m in MIGRATIONS:
+            if m.version <= current or (target is not None and m.version > target):
+                continue
+            logger.info("Applying migration %s: %s", m.version, m.name)
+            if m.transactional:
+                with engine.begin() as conn:
+                    m.upgrade(conn)
+                    _set_version(conn, m.version)
+            else:
+                m.upgrade(engine)
+                with engine.begin() as conn:
+                    _set_version(conn, m.version)
+            current = m.version
+    return current
+
+
+def _set_version(conn, version: int):
+    updated = conn.execute(
+        schema_version.update()
+        .where(schema_version.c.id == 1)
+        .values(version=version, applied_at=current_time())
+    ).rowcount
+    if not updated:
+        conn.execute(schema_version.insert().values(id=1, version=version, applied_at=current_time()))
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Serialise migrations across workers (PostgreSQL advisory lock)."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+# Helpers for online-safe migrations on large tables
+
+def create_index_online(engine: Engine, index: Index):
+    """
+    Build an index without blocking writes.
+
+    On PostgreSQL this uses CREATE INDEX CONCURRENTLY outside a transaction, and
+    first drops a half-built (INVALID) index left behind by an interrupted run.
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    create_index_ddl_online(engine, index.name, ddl)
+
+
+def create_index_ddl_online(engine: Engine, name: str, ddl: str):
+    """
+    create_index_online() for index DDL written out by hand, e.g. with an
+    operator class the models cannot declare portably. `ddl` must be a
+    plain CREATE INDEX IF NOT EXISTS statement.
+    """
+    if engine.dialect.name == "postgresql":
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+            conn.execute(text(ddl))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+
+
+def backfill_in_batches(engine: Engine, table: str, set_clause: str, pending_where: str,
+                        batch_size: int = 5000, params: Optional[dict] = None) -> int:
+    """
+    Run `UPDATE table SET set_clause WHERE pending_where` in committed batches.
+
+    `pending_where` must stop matching a row once it has been updated (for
+    example `new_column IS NULL`) so the loop terminates and can be resumed.
+    """
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(text(
+                f"UPDATE {table} SET {set_clause} WHERE id IN "
+                f"(SELECT id FROM {table} WHERE {pending_where} LIMIT :batch_size)"
+            ), {**(params or {}), "batch_size": batch_size}).rowcount
+        total += updated
+        if updated < batch_size:
+            return total
+
+
+def add_column_if_missing(conn, table: str, column: Column):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists (e.g. fresh databases)."""
+    if column.name in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def add_check_constraint_if_missing(conn, table: Table, constraint: CheckConstraint):
+    """
+    Add a CHECK constraint the model already declares, skipped when it exists.
+
+    SQLite cannot add constraints to an existing table, so there the table is
+    rebuilt from the model and its rows copied over. Only use this on small
+    tables: the rebuild rewrites every row while holding the write lock.
+    """
+    if constraint.name in {c["name"] for c in inspect(conn).get_check_constraints(table.name)}:
+        return
+    if conn.dialect.name != "sqlite":
+        ddl = f"ALTER TABLE {table.name} ADD CONSTRAINT {constraint.name} CHECK ({constraint.sqltext})"
+        conn.execute(text(ddl))
+        return
+    old_name = f"_{table.name}_old"
+    # The model may already declare columns a later migration adds
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    conn.execute(CreateTable(table))
+    conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}"))
+    conn.execute(text(f"DROP TABLE {old_name}"))
+    for index in table.indexes:
+        index.create(bind=conn)
+
+
+def _load_migrations():
+    # Registers the @migration functions
+    import models.engine.migrations  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--status", action="store_true", help="show versions and exit")
+    parser.add_argument("--target", type=int, default=None, help="stop at this version")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.status:
+        print(f"current: {current_version()}  latest: {latest_version()}")
+        return
+    print(f"Database schema at version {migrate(target=args.target)}")
+
+
+if __name__ == "__main__":
+    # Run through the imported module so migrations register on the same
+    # MIGRATIONS list that migrate() reads, not on this __main__ copy.
+    from models.engine.migrate import main as _main
+    _main()
@@ -0,0 +1,396 @@
+"""
+Schema migrations, applied in order by models.engine.migrate.
+
+Append new migrations at the bottom with the next version number; never edit
+or renumber one that has shipped. Fresh databases get the current models from
+the baseline, so later migrations must tolerate objects that already exist
+(use the *_if_missing / IF NOT EXISTS helpers).
+"""
+import logging
+import uuid
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Enum, Float, Integer, MetaData, Table, Text, bindparam, func, insert, inspect,
+    select, text
+)
+
+from models.engine.database import Base
+from models.engine.migrate import (
+    migration, add_check_constraint_if_missing, add_column_if_missing, create_index_online, create_index_ddl_online
+)
+from models.guid import GUID
+from utils.time_utils import current_time
+
+# Every model module must be imported so Base.metadata is complete
+from models import user, category, product, inventory, invoice, sale, supplier, settings, offlineSync, tableVersion  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+@migration(1, "baseline schema")
+def baseline(conn):
+    # Creates missing tables only; databases created by the old create_all at
+    # startup are adopted as-is.
+    Base.metadata.create_all(bind=conn)
+
+
+# Built by migration 7, once inventory_transactions.ledger_seq exists
+LATER_INDEXES = {"ix_inventory_transactions_inventory_id_seq"}
+
+
+@migration(2, "report and auth indexes", transactional=False)
+def report_and_auth_indexes(engine):
+    for index in (
+        sale.Sale.__table__.indexes
+        | sale.SaleItem.__table__.indexes
+        | inventory.InventoryTransaction.__table__.indexes
+        | user.UserSession.__table__.indexes
+    ):
+        # Indexes on columns added by later migrations are built by those
+        if index.name in LATER_INDEXES:
+            continue
+        create_index_online(engine, index)
+
+
+@migration(3, "sync change log and offline sync records")
+def sync_tables(conn):
+    Base.metadata.create_all(bind=conn, tables=[
+        offlineSync.ChangeLog.__table__,
+        offlineSync.OfflineSync.__table__,
+    ])
+    # Seed the change log with the current catalog and settings so a terminal
+    # pulling from watermark 0 receives everything. Sales history is not seeded;
+    # terminals only need sales made from here on.
+    if conn.execute(select(offlineSync.ChangeLog.version).limit(1)).first():
+        return
+    now = current_time()
+    for model, entity_type in (
+        (category.Category, offlineSync.EntityType.CATEGORY),
+        (product.Product, offlineSync.EntityType.PRODUCT),
+        (settings.Settings, offlineSync.EntityType.SETTINGS),
+    ):
+        rows = [
+            {"entity_type": entity_type, "entity_id": str(entity_id),
+             "operation": offlineSync.ChangeOperation.UPSERT, "changed_at": now}
+            for entity_id in conn.execute(select(model.id)).scalars()
+        ]
+        if rows:
+            conn.execute(insert(offlineSync.ChangeLog), rows)
+
+
+@migration(4, "change log index for catalog versions", transactional=False)
+def change_log_type_version_index(engine):
+    for index in offlineSync.ChangeLog.__table__.indexes:
+        create_index_online(engine, index)
+
+
+@migration(5, "table version counters for ETags")
+def table_versions(conn):
+    Base.metadata.create_all(bind=conn, tables=[tableVersion.TableVersion.__table__])
+
+
+@migration(6, "inventory ledger balances and checkpoints")
+def inventory_ledger(conn):
+    Base.metadata.create_all(bind=conn, tables=[
+        inventory.InventoryBalance.__table__,
+        inventory.InventoryCheckpoint.__table__,
+    ])
+    transactions = inventory.InventoryTransaction.__table__
+    add_column_if_missing(conn, "inventory_transactions", transactions.c.ledger_seq)
+
+    # Number each item's existing entries in date order
+    next_seq = {}
+    updates = []
+    for transaction_id, inventory_id in conn.execute(
+        select(transactions.c.id, transactions.c.inventory_id)
+        .where(transactions.c.ledger_seq.is_(None))
+        .order_by(transactions.c.inventory_id, transactions.c.transaction_date, transactions.c.created_at)
+    ):
+        next_seq[inventory_id] = next_seq.get(inventory_id, 0) + 1
+        updates.append({"row_id": transaction_id, "seq": next_seq[inventory_id]})
+    if updates:
+        conn.execute(
+            transactions.update()
+            .where(transactions.c.id == bindparam("row_id"))
+            .values(ledger_seq=bindparam("seq")),
+            updates
+        )
+
+    # Open each balance at the stock the item shows today, checkpointed at the
+    # end of its history (position 0 for items without any). Older history
+    # that disagrees with it shows up in a full verify.
+    existing = set(conn.execute(select(inventory.InventoryBalance.inventory_id)).scalars())
+    stock = list(conn.execute(select(inventory.RawMaterial.__table__.c.id, inventory.RawMaterial.__table__.c.quantity)))
+    stock += list(conn.execute(select(inventory.Equipment.__table__.c.id, inventory.Equipment.__table__.c.available_units)))
+    now = current_time()
+    balances, checkpoints = [], []
+    for inventory_id, level in stock:
+        if inventory_id in existing:
+            continue
+        seq = next_seq.get(inventory_id, 0)
+        balances.append({"inventory_id": inventory_id, "balance": level or 0, "ledger_seq": seq, "updated_at": now})
+        checkpoints.append({"inventory_id": inventory_id, "ledger_seq": seq, "balance": level or 0, "created_at": now})
+    if balances:
+        conn.execute(insert(inventory.InventoryBalance), balances)
+    if checkpoints:
+        conn.execute(insert(inventory.InventoryCheckpoint), checkpoints)
+
+
+@migration(7, "inventory ledger position index", transactional=False)
+def inventory_ledger_index(engine):
+    for index in inventory.InventoryTransaction.__table__.indexes:
+        create_index_online(engine, index)
+
+
+@migration(8, "non-negative inventory balances")
+def inventory_balance_check(conn):
+    balances = inventory.InventoryBalance.__table__
+    # Stock driven negative by lost updates before balances were moved
+    # atomically. Each is brought back to zero by a system RESTOCK, so the
+    # ledger still adds up to the balance.
+    negative = conn.execute(
+        select(balances.c.inventory_id, balances.c.balance, balances.c.ledger_seq).where(balances.c.balance < 0)
+    ).all()
+    if negative:
+        logger.warning(
+            "Restocking %s negative inventory balances to zero: %s",
+            len(negative), ", ".join(f"{row.inventory_id} ({row.balance})" for row in negative)
+        )
+        # The entry columns as of this migration
+        entries = Table(
+            "inventory_transactions", MetaData(),
+            Column("id", GUID()), Column("inventory_id", GUID()),
+            Column("transaction_type", Enum(inventory.TransactionType)), Column("quantity", Float),
+            Column("transaction_date", DateTime), Column("created_by_id", GUID()), Column("notes", Text),
+            Column("previous_quantity", Float), Column("resulting_quantity", Float),
+            Column("is_locked", Boolean), Column("is_system_generated", Boolean), Column("ledger_seq", Integer),
+            Column("created_at", DateTime), Column("updated_at", DateTime), Column("is_enabled", Boolean),
+        )
+        users = user.User.__table__
+        # Booked to whoever wrote the item's latest entry, or the first admin
+        fallback = conn.execute(
+            select(users.c.id).where(users.c.role == "admin").order_by(users.c.created_at).limit(1)
+        ).scalar()
+        now = current_time()
+        for row in negative:
+            author = conn.execute(
+                select(entries.c.created_by_id)
+                .where(entries.c.inventory_id == row.inventory_id)
+                .order_by(entries.c.ledger_seq.desc())
+                .limit(1)
+            ).scalar() or fallback
+            conn.execute(insert(entries).values(
+                id=uuid.uuid4(), inventory_id=row.inventory_id, transaction_type=inventory.TransactionType.RESTOCK,
+                quantity=-row.balance, transaction_date=now, created_by_id=author,
+                notes="Restocks a negative balance found when upgrading the inventory ledger",
+                previous_quantity=row.balance, resulting_quantity=0.0, is_locked=True, is_system_generated=True,
+                ledger_seq=row.ledger_seq + 1, created_at=now, updated_at=now, is_enabled=True,
+            ))
+            conn.execute(
+                balances.update().where(balances.c.inventory_id == row.inventory_id)
+                .values(balance=0, ledger_seq=row.ledger_seq + 1)
+            )
+    constraint = next(c for c in balances.constraints if c.name == "ck_inventory_balances_balance_non_negative")
+    add_check_constraint_if_missing(conn, balances, constraint)
+
+
+@migration(9, "inventory ledger counters")
+def inventory_ledger_counters(conn):
+    # The counters and the transaction type each totals, as they were when
+    # this migration shipped
+    counters = {
+        "ISSUE": "issued", "RETURN": "returned", "RESTOCK": "restocked",
+        "WRITE_OFF": "written_off", "DAMAGE": "damaged",
+    }
+    for counter in counters.values():
+        add_column_if_missing(conn, "inventory_balances", Column(counter, Float, nullable=False, server_default="0"))
+    conn.execute(text("UPDATE inventory_balances SET " + ", ".join(
+        f"{counter} = (SELECT coalesce(sum(t.quantity), 0) FROM inventory_transactions t "
+        f"WHERE t.inventory_id = inventory_balances.inventory_id AND t.transaction_type = '{transaction_type}')"
+        for transaction_type, counter in counters.items()
+    )))
+
+
+@migration(10, "stock count sessions")
+def stock_counts(conn):
+    Base.metadata.create_all(bind=conn, tables=[
+        inventory.StockCount.__table__,
+        inventory.StockCountLine.__table__,
+    ])
+
+
+@migration(11, "recipes and stock depletion queue")
+def recipes(conn):
+    Base.metadata.create_all(bind=conn, tables=[
+        product.RecipeItem.__table__,
+        sale.StockDepletion.__table__,
+    ])
+
+
+@migration(12, "product availability")
+def product_availability(conn):
+    Base.metadata.create_all(bind=conn, tables=[product.ProductAvailability.__table__])
+    # Only unavailable products are stored; no row means available
+    conn.execute(text(
+        "INSERT INTO product_availability (product_id, is_available, changed_at) "
+        "SELECT DISTINCT r.product_id, :unavailable, :now FROM recipe_items r "
+        "LEFT JOIN inventory_balances b ON b.inventory_id = r.inventory_id "
+        "WHERE coalesce(b.balance, 0) < r.quantity "
+        "AND NOT EXISTS (SELECT 1 FROM product_availability a WHERE a.product_id = r.product_id)"
+    ), {"unavailable": False, "now": current_time()})
+
+
+@migration(13, "recipe item lookup by raw material", transactional=False)
+def recipe_items_inventory_index(engine):
+    for index in product.RecipeItem.__table__.indexes:
+        create_index_online(engine, index)
+
+
+@migration(14, "search indexes", transactional=False)
+def search_indexes(engine):
+    # (table, entity type, title column, body columns) of each search source
+    sources = [
+        ("products", "products", "name", ["description"]),
+        ("inventories", "inventory", "name", ["description"]),
+        ("suppliers", "suppliers", "company_name", ["contact_person", "email"]),
+    ]
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            # INTEGER PRIMARY KEY: FTS rowids must survive VACUUM, which may renumber implicit rowids
+            conn.exec_driver_sql(
+                "CREATE TABLE IF NOT EXISTS search_documents ("
+                "doc_id INTEGER PRIMARY KEY, entity_type VARCHAR NOT NULL, entity_id CHAR(32) NOT NULL, "
+                "title TEXT, body TEXT, UNIQUE (entity_type, entity_id))"
+            )
+            for table, kind, title, body_columns in sources:
+                fts = f"{table}_search"
+                body = " || ' ' || ".join(f"coalesce(new.{column}, '')" for column in body_columns)
+                fts_insert = (
+                    f"INSERT INTO {fts}(rowid, title, body) SELECT doc_id, title, body FROM search_documents "
+                    f"WHERE entity_type = '{kind}' AND entity_id = new.id;"
+                )
+                fts_delete = (
+                    f"INSERT INTO {fts}({fts}, rowid, title, body) "
+                    f"SELECT 'delete', doc_id, title, body FROM search_documents "
+                    f"WHERE entity_type = '{kind}' AND entity_id = {{row}}.id;"
+                )
+                for statement in [
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"title, body, content='search_documents', content_rowid='doc_id', "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+                    # bm25 weights of the title and body columns
+                    f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO search_documents(entity_type, entity_id, title, body) "
+                    f"VALUES ('{kind}', new.id, new.{title}, {body}); {fts_insert} END",
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_search_update "
+                    f"AFTER UPDATE OF {', '.join([title, *body_columns])} ON {table} BEGIN "
+                    f"{fts_delete.format(row='new')} "
+                    f"UPDATE search_documents SET title = new.{title}, body = {body} "
+                    f"WHERE entity_type = '{kind}' AND entity_id = new.id; {fts_insert} END",
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+                    f"{fts_delete.format(row='old')} "
+                    f"DELETE FROM search_documents WHERE entity_type = '{kind}' AND entity_id = old.id; END",
+                    # Rows that existed before the triggers
+                    f"INSERT INTO search_documents(entity_type, entity_id, title, body) "
+                    f"SELECT '{kind}', id, {title}, {body.replace('new.', '')} FROM {table} WHERE true "
+                    f"ON CONFLICT (entity_type, entity_id) DO NOTHING",
+                    f"INSERT INTO {fts}(rowid, title, body) SELECT doc_id, title, body FROM search_documents "
+                    f"WHERE entity_type = '{kind}' AND doc_id NOT IN (SELECT rowid FROM {fts}_docsize)",
+                ]:
+                    conn.exec_driver_sql(statement)
+        return
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception:
+        logger.warning("pg_trgm is not available; search falls back to unindexed ILIKE", exc_info=True)
+        return
+    for table, _, title, body_columns in sources:
+        for column in [title, *body_columns]:
+            name = f"ix_{table}_{column}_trgm"
+            create_index_ddl_online(
+                engine, name, f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+@migration(15, "unique inventory ledger positions")
+def inventory_ledger_positions_unique(conn):
+    # Deleting an entry steps the balance's position back, which only holds
+    # while each position names one entry. Items whose ledger repeats
+    # positions are renumbered in ledger order and reopened at their current
+    # balance with a checkpoint at the end, as migration 6 opened them.
+    transactions = inventory.InventoryTransaction.__table__
+    balances = inventory.InventoryBalance.__table__
+    checkpoints = inventory.InventoryCheckpoint.__table__
+    repeated = sorted(set(conn.execute(
+        select(transactions.c.inventory_id)
+        .where(transactions.c.ledger_seq.is_not(None))
+        .group_by(transactions.c.inventory_id, transactions.c.ledger_seq)
+        .having(func.count() > 1)
+    ).scalars()))
+    if repeated:
+        logger.warning(
+            "Renumbering the ledgers of %s inventory items with repeated positions: %s",
+            len(repeated), ", ".join(str(inventory_id) for inventory_id in repeated)
+        )
+    now = current_time()
+    for inventory_id in repeated:
+        entry_ids = conn.execute(
+            select(transactions.c.id)
+            .where(transactions.c.inventory_id == inventory_id, transactions.c.ledger_seq.is_not(None))
+            .order_by(transactions.c.ledger_seq, transactions.c.transaction_date, transactions.c.created_at)
+        ).scalars().all()
+        conn.execute(
+            transactions.update()
+            .where(transactions.c.id == bindparam("row_id"))
+            .values(ledger_seq=bindparam("seq")),
+            [{"row_id": entry_id, "seq": seq} for seq, entry_id in enumerate(entry_ids, 1)]
+        )
+        conn.execute(checkpoints.delete().where(checkpoints.c.inventory_id == inventory_id))
+        balance = conn.execute(
+            balances.update()
+            .where(balances.c.inventory_id == inventory_id)
+            .values(ledger_seq=len(entry_ids), updated_at=now)
+            .returning(balances.c.balance)
+        ).scalar()
+        if balance is not None:
+            conn.execute(insert(checkpoints).values(
+                inventory_id=inventory_id, ledger_seq=len(entry_ids), balance=balance, created_at=now
+            ))
+
+    index = next(i for i in transactions.indexes if i.name == "ix_inventory_transactions_inventory_id_seq")
+    existing = {i["name"]: i for i in inspect(conn).get_indexes(transactions.name)}
+    if not existing.get(index.name, {}).get("unique"):
+        if index.name in existing:
+            index.drop(bind=conn)
+        index.create(bind=conn)
+
+
+@migration(16, "per-user access versions")
+def user_access_versions(conn):
+    # Cached logins are dropped per user when that user's table_versions row
+    # (keyed "user_access:<hex id>", as services.authCache names it) moves.
+    # Every user gets the row up front so a bump is a plain UPDATE; the single
+    # "user_access" row it replaces is dropped.
+    versions = tableVersion.TableVersion.__table__
+    users = user.User.__table__
+    conn.execute(versions.delete().where(versions.c.table_name == "user_access"))
+    existing = set(conn.execute(
+        select(versions.c.table_name).where(versions.c.table_name.like("user\\_access:%", escape="\\"))
+    ).scalars())
+    rows = [
+        {"table_name": f"user_access:{user_id.hex}", "version": 0}
+        for user_id in conn.execute(select(users.c.id)).scalars()
+        if f"user_access:{user_id.hex}" not in existing
+    ]
+    if rows:
+        conn.execute(insert(versions), rows)
+
+
+@migration(17, "change log settle marker")
+def change_log_settled_after(conn):
+    # Rows logged before this keep the grace-period rule
+    add_column_if_missing(conn, "change_log", Column("settled_after", BigInteger, nullable=True))
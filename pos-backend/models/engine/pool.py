@@ -0,0 +1,130 @@
+"""
+Connection pool instrumentation and liveness checking.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_LIVENESS_INTERVAL_SECONDS = float(os.getenv("POOL_LIVENESS_INTERVAL_SECONDS", "30"))
+
+
+class PoolStats:
+    """Counters shared by a pool and every pool it is recreated into."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.peak_checked_out = 0
+        self.liveness_failures = 0
+        self.last_liveness_check = None
+        self.last_liveness_ok = None
+
+    def record_checkout(self, wait_ms: float, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, wait_ms: float):
+        with self._lock:
+            self.timeouts += 1
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_liveness(self, ok: bool):
+        with self._lock:
+            self.last_liveness_check = time.time()
+            self.last_liveness_ok = ok
+            if not ok:
+                self.liveness_failures += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out."""
+
+    def __init__(self, *args, stats: PoolStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout((time.perf_counter() - started) * 1000)
+            raise
+        self.stats.record_checkout((time.perf_counter() - started) * 1000, self.checkedout())
+        return connection
+
+
+def pool_status(engine: Engine) -> dict:
+    """Current pool occupancy plus the accumulated counters."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update({
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "avg_wait_ms": round(stats.total_wait_ms / stats.checkouts, 3) if stats.checkouts else 0.0,
+            "max_wait_ms": round(stats.max_wait_ms, 3),
+            "peak_checked_out": stats.peak_checked_out,
+            "liveness_failures": stats.liveness_failures,
+            "last_liveness_check": stats.last_liveness_check,
+            "last_liveness_ok": stats.last_liveness_ok,
+        })
+    return status
+
+
+def check_liveness(engine: Engine) -> bool:
+    """
+    Run SELECT 1 on a pooled connection.
+
+    If the server dropped its connections the failure is a disconnect, and
+    SQLAlchemy then invalidates the whole pool so the next checkouts reconnect
+    instead of each request discovering a dead connection.
+    """
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        ok = True
+    except Exception as e:
+        logger.warning(f"Database liveness check failed: {e}")
+        ok = False
+    stats = getattr(engine.pool, "stats", None)
+    if stats is not None:
+        stats.record_liveness(ok)
+    return ok
+
+
+async def pool_liveness_loop(engine: Engine, interval: float = POOL_LIVENESS_INTERVAL_SECONDS):
+    """Replaces pool_pre_ping: one background ping per interval instead of one per checkout."""
+    while True:
+        await asyncio.to_thread(check_liveness, engine)
+        await asyncio.sleep(interval)
@@ -0,0 +1,129 @@
+"""
+Read-replica routing.
+
+Routers opt in per route group:
+
+    get_report_db = read_db_for("reports")
+
+    @router.get("/report")
+    async def report(db: Session = Depends(get_report_db)): ...
+
+A group reads from the replica when REPLICA_DATABASE_URL is set, the group is
+listed in READ_REPLICA_ROUTES, and the replica passed its last health check
+(reachable and, if REPLICA_MAX_LAG_SECONDS is set, not lagging further than
+that). Otherwise the request falls back to the primary.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models.engine.database import SessionLocal, ReplicaSessionLocal, replica_engine
+
+logger = logging.getLogger(__name__)
+
+READ_REPLICA_ROUTES = {
+    group.strip() for group in os.getenv("READ_REPLICA_ROUTES", "reports,exports,search").split(",")
+    if group.strip()
+}
+# 0 disables the lag guard
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "0"))
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "5"))
+
+# Zero when the replica has replayed everything it received, otherwise the age
+# of the last replayed transaction. 0 on a server that is not in recovery.
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """Chooses between the replica and the primary, caching the replica's health."""
+
+    def __init__(self, routes=READ_REPLICA_ROUTES, max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_HEALTH_CHECK_SECONDS):
+        self.routes = set(routes)
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        self.last_lag_seconds = None
+        self._healthy = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def replica_usable(self) -> bool:
+        if replica_engine is None:
+            return False
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return self._healthy
+            self._next_check = time.monotonic() + self.check_interval
+        healthy = self._check()
+        with self._lock:
+            self._healthy = healthy
+        return healthy
+
+    def _check(self) -> bool:
+        try:
+            with replica_engine.connect() as conn:
+                if replica_engine.dialect.name == "postgresql":
+                    lag = float(conn.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            logger.warning(f"Read replica unavailable, using primary: {e}")
+            return False
+        self.last_lag_seconds = lag
+        if self.max_lag_seconds and lag > self.max_lag_seconds:
+            logger.warning(f"Read replica is {lag:.1f}s behind (max {self.max_lag_seconds}s), using primary")
+            return False
+        return True
+
+    def session_for(self, group: str) -> Session:
+        if group in self.routes and self.replica_usable():
+            self.replica_reads += 1
+            return ReplicaSessionLocal()
+        if group in self.routes and replica_engine is not None:
+            self.primary_fallbacks += 1
+        return SessionLocal()
+
+    def status(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "routes": sorted(self.routes),
+            "healthy": self._healthy,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds or None,
+            "replica_reads": self.replica_reads,
+            "primary_fallbacks": self.primary_fallbacks,
+        }
+
+
+replica_router = ReplicaRouter()
+
+
+if ReplicaSessionLocal is not None:
+    @event.listens_for(ReplicaSessionLocal, "before_flush")
+    def _reject_replica_writes(session, flush_context, instances):
+        raise RuntimeError("Attempted to write through a read-replica session")
+
+
+def read_db_for(group: str):
+    """Build a get_db-style dependency for a route group."""
+    def get_read_db():
+        db = replica_router.session_for(group)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    get_read_db.__name__ = f"get_{group}_db"
+    return get_read_db
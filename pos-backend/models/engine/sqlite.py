@@ -0,0 +1,116 @@
+"""
+SQLite deployment profile (single-till installs without a PostgreSQL server).
+
+Every connection gets WAL journaling and the SQLITE_* pragmas below. Writes
+are serialised through a per-process writer lock: a connection takes it at the
+first write, savepoint or SELECT ... FOR UPDATE of a transaction and releases
+it when the transaction ends, and its transaction is restarted as BEGIN
+IMMEDIATE at that point. Upgrading a read transaction to a write in WAL mode fails straight away
+with "database is locked" if another writer committed in between, so writers
+queue on the lock instead. Restarting the transaction at the first write gives the same
+read-committed behaviour the code already relies on under PostgreSQL.
+"""
+import logging
+import os
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative values are KiB, positive values are pages
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Waited for on a worker thread: writing API routes and /ws RPCs run off the
+# event loop (server.routing, main.websocket_endpoint), so a queued writer
+# never stalls other requests or sockets
+SQLITE_WRITE_LOCK_TIMEOUT = float(os.getenv("SQLITE_WRITE_LOCK_TIMEOUT", "30"))
+
+_writer_lock = threading.Lock()
+
+
+def is_sqlite(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def configure_engine(engine: Engine, in_memory: bool = False):
+    """Apply the pragmas and take over transaction begin from pysqlite."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # pysqlite otherwise issues its own BEGIN lazily before DML; we emit
+        # BEGIN ourselves (below) so transactions can be restarted as IMMEDIATE.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def install_single_writer(engine: Engine, session_factory: sessionmaker):
+    """Queue writing transactions of this process on one writer lock."""
+
+    @event.listens_for(session_factory, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        _acquire_writer(session.connection())
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _on_execute(orm_execute_state):
+        if (
+            orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+            # SQLite has no row locks; a locking read reserves the database instead
+            or (orm_execute_state.is_select
+                and getattr(orm_execute_state.statement, "_for_update_arg", None) is not None)
+        ):
+            _acquire_writer(orm_execute_state.session.connection())
+
+    @event.listens_for(engine, "savepoint")
+    def _on_savepoint(conn, name):
+        # Savepoints are taken to write; restarting the transaction later
+        # would discard them, so reserve the database before the first one.
+        _acquire_writer(conn)
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn):
+        _release_writer(conn.info)
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn):
+        _release_writer(conn.info)
+
+    @event.listens_for(engine.pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        _release_writer(connection_record.info)
+
+
+def _acquire_writer(conn: Connection):
+    if conn.info.get("sqlite_writer"):
+        return
+    if not _writer_lock.acquire(timeout=SQLITE_WRITE_LOCK_TIMEOUT):
+        raise TimeoutError("Timed out waiting for the SQLite writer lock")
+    conn.info["sqlite_writer"] = True
+    try:
+        # Drop the (possibly stale) read snapshot and reserve the database
+        conn.exec_driver_sql("COMMIT")
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    except Exception:
+        _release_writer(conn.info)
+        raise
+
+
+def _release_writer(info: dict):
+    if info.pop("sqlite_writer", False):
+        _writer_lock.release()
@@ -0,0 +1,20 @@
+import uuid
+
+from sqlalchemy.types import TypeDecorator, Uuid
+
+
+class GUID(TypeDecorator):
+    """
+    Portable UUID column: native uuid on PostgreSQL, 32-character hex elsewhere.
+
+    Accepts UUID instances or their string form (e.g. session ids read from a
+    JWT) and always returns uuid.UUID.
+    """
+
+    impl = Uuid(as_uuid=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, String, Float, Text, ForeignKey, Enum, Date, Integer, DateTime, Boolean, Table
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Float, Text, ForeignKey, Enum, Date, Integer, DateTime, Boolean, Table, Index, UniqueConstraint, CheckConstraint, func
+from sqlalchemy.orm import relationship, object_session
+from .guid import GUID
 from .baseModel import BaseModel
+from .engine.database import Base
 from enum import Enum as PyEnum
 from datetime import timedelta
+from typing import Optional
 from utils.time_utils import current_time
 
 
@@ -33,6 +35,33 @@ class TransactionType(str, PyEnum):
     MAINTENANCE = "maintenance"
 
 
+class StockCountStatus(str, PyEnum):
+    OPEN = "open"
+    POSTED = "posted"
+    CANCELLED = "cancelled"
+
+
+# Signed effect of each transaction type on an item's stock balance
+LEDGER_EFFECT = {
+    TransactionType.RESTOCK: 1,
+    TransactionType.RETURN: 1,
+    TransactionType.ISSUE: -1,
+    TransactionType.WRITE_OFF: -1,
+    TransactionType.DAMAGE: -1,
+    TransactionType.MAINTENANCE: 0,
+}
+
+
+# InventoryBalance counter holding the running total of each transaction type
+LEDGER_COUNTER = {
+    TransactionType.ISSUE: "issued",
+    TransactionType.RETURN: "returned",
+    TransactionType.RESTOCK: "restocked",
+    TransactionType.WRITE_OFF: "written_off",
+    TransactionType.DAMAGE: "damaged",
+}
+
+
 class QuantityUnit(str, PyEnum):
     KG = "kg"
     GRAM = "gram"
@@ -52,8 +81,8 @@ class MaintenanceStatus(str, PyEnum):
 inventory_suppliers = Table(
     "inventory_suppliers",
     BaseModel.metadata,
-    Column("inventory_id", UUID(as_uuid=True), ForeignKey("inventories.id"), primary_key=True),
-    Column("supplier_id", UUID(as_uuid=True), ForeignKey("suppliers.id"), primary_key=True)
+    Column("inventory_id", GUID(), ForeignKey("inventories.id"), primary_key=True),
+    Column("supplier_id", GUID(), ForeignKey("suppliers.id"), primary_key=True)
 )
 
 
@@ -69,13 +98,39 @@ class Inventory(BaseModel):
     status = Column(Enum(InventoryStatus), default=InventoryStatus.IN_STOCK)
     
     # Foreign keys
-    supplier_id = Column(UUID(as_uuid=True), ForeignKey("suppliers.id"), nullable=True)
+    supplier_id = Column(GUID(), ForeignKey("suppliers.id"), nullable=True)
     
     # Relationships
     suppliers = relationship("Supplier", secondary=inventory_suppliers, back_populates="inventories")
 
     invoices = relationship("InventoryInvoice", back_populates="inventory")
     transactions = relationship("InventoryTransaction", back_populates="inventory")
+    stock_balance = relationship("InventoryBalance", uselist=False, viewonly=True)
+
+    def stock_level(self) -> float:
+        """The item's own stock column: quantity for raw materials, available units for equipment."""
+        return 0.0
+
+    def set_stock_level(self, level: float):
+        """Mirror a ledger balance into the item's stock column."""
+
+    def current_balance(self) -> float:
+        """Running ledger balance: one primary-key lookup, however long the history."""
+        if self.stock_balance is not None:
+            return self.stock_balance.balance
+        return self.stock_level()
+
+    def ledger_length(self) -> int:
+        return self.stock_balance.ledger_seq if self.stock_balance is not None else 0
+
+    def ledger_totals(self) -> dict:
+        """Quantity issued, returned, restocked, written off and damaged over the item's life."""
+        totals = {
+            counter: getattr(self.stock_balance, counter) if self.stock_balance is not None else 0.0
+            for counter in LEDGER_COUNTER.values()
+        }
+        totals["net_issued"] = totals["issued"] - totals["returned"]
+        return totals
 
 
 # RawMaterial class
@@ -83,7 +138,7 @@ class RawMaterial(Inventory):
     __tablename__ = "raw_materials"
     __mapper_args__ = {"polymorphic_identity": "raw_material"}
     
-    id = Column(UUID(as_uuid=True), ForeignKey("inventories.id"), primary_key=True)
+    id = Column(GUID(), ForeignKey("inventories.id"), primary_key=True)
     quantity = Column(Float, default=0)
     quantity_unit = Column(Enum(QuantityUnit), nullable=False)
     batch_number = Column(String, nullable=True)
@@ -91,42 +146,37 @@ class RawMaterial(Inventory):
     critical_threshold = Column(Float, nullable=True)  # Minimum quantity before considered critical
     is_perishable = Column(Boolean, default=False)
     
+    def stock_level(self) -> float:
+        return self.quantity or 0.0
+
+    def set_stock_level(self, level: float):
+        self.quantity = level
+
     def calculate_current_status(self) -> dict:
         """
-        Calculate the current status of the raw material.
+        Calculate the current status of the raw material from its ledger balance.
         """
-        total_issued = sum(
-            t.quantity for t in self.transactions 
-            if t.transaction_type == TransactionType.ISSUE
-        )
-        total_restocked = sum(
-            t.quantity for t in self.transactions 
-            if t.transaction_type == TransactionType.RESTOCK
-        )
-        total_returned = sum(
-            t.quantity for t in self.transactions 
-            if t.transaction_type == TransactionType.RETURN
-        )
-        
-        current_quantity = total_restocked - total_issued + total_returned
-        
+        current_quantity = self.current_balance()
+
         status = {
             "current_quantity": current_quantity,
             "is_depleted": current_quantity <= 0,
-            "is_critically_low": self.is_critically_low(),
-            "total_transactions": len(self.transactions)
+            "is_critically_low": self.is_critically_low(current_quantity),
+            "total_transactions": self.ledger_length(),
+            "totals": self.ledger_totals()
         }
-        
+
         return status
-    
-    def is_critically_low(self) -> bool:
+
+    def is_critically_low(self, current_quantity: Optional[float] = None) -> bool:
         """
         Check if the current quantity is below the critical threshold.
         """
-        current_status = self.calculate_current_status()
+        if current_quantity is None:
+            current_quantity = self.current_balance()
         return (
-            self.critical_threshold is not None and 
-            current_status['current_quantity'] <= self.critical_threshold
+            self.critical_threshold is not None and
+            current_quantity <= self.critical_threshold
         )
 
 
@@ -134,7 +184,7 @@ class Equipment(Inventory):
     __tablename__ = "equipment"
     __mapper_args__ = {"polymorphic_identity": "equipment"}
     
-    id = Column(UUID(as_uuid=True), ForeignKey("inventories.id"), primary_key=True)
+    id = Column(GUID(), ForeignKey("inventories.id"), primary_key=True)
     total_units = Column(Integer, default=1)
     available_units = Column(Integer, default=1)
     maintenance_schedule = Column(Date, nullable=True)
@@ -152,7 +202,7 @@ class Equipment(Inventory):
         """
         # Check maintenance history
         recent_maintenance = (
-            self.session.query(EquipmentMaintenance)
+            object_session(self).query(EquipmentMaintenance)
             .filter(
                 EquipmentMaintenance.equipment_id == self.id,
                 EquipmentMaintenance.status == MaintenanceStatus.COMPLETED
@@ -170,42 +220,40 @@ class Equipment(Inventory):
         return (current_time() - recent_maintenance.completed_date) > maintenance_interval
 
     
+    def stock_level(self) -> float:
+        return self.available_units or 0
+
+    def set_stock_level(self, level: float):
+        self.available_units = int(level)
+
     def calculate_current_status(self) -> dict:
         """
-        Calculate the current status of the equipment.
+        Calculate the current status of the equipment from its ledger balance.
         """
-        issued_units = sum(
-            t.quantity for t in self.transactions 
-            if t.transaction_type == TransactionType.ISSUE
-        )
-        returned_units = sum(
-            t.quantity for t in self.transactions 
-            if t.transaction_type == TransactionType.RETURN
-        )
-        maintenance_count = sum(
-            1 for t in self.transactions 
-            if t.transaction_type == TransactionType.MAINTENANCE
-        )
-        
-        current_available_units = self.total_units - issued_units + returned_units
-        
+        current_available_units = self.current_balance()
+        maintenance_count = object_session(self).query(func.count(InventoryTransaction.id)).filter(
+            InventoryTransaction.inventory_id == self.id,
+            InventoryTransaction.transaction_type == TransactionType.MAINTENANCE
+        ).scalar()
+
         status = {
             "total_units": self.total_units,
             "available_units": current_available_units,
             "is_all_deployed": current_available_units == 0,
             "maintenance_count": maintenance_count,
             "needs_maintenance": self.is_maintenance_needed(),
-            "total_transactions": len(self.transactions)
+            "total_transactions": self.ledger_length(),
+            "totals": self.ledger_totals()
         }
-        
+
         return status
-    
+
 
 class EquipmentMaintenance(BaseModel):
     """Model to track equipment maintenance history"""
     __tablename__ = "equipment_maintenance"
     
-    equipment_id = Column(UUID(as_uuid=True), ForeignKey("equipment.id"), nullable=False)
+    equipment_id = Column(GUID(), ForeignKey("equipment.id"), nullable=False)
     maintenance_type = Column(String, nullable=False)
     scheduled_date = Column(DateTime, nullable=False)
     completed_date = Column(DateTime, nullable=True)
@@ -219,13 +267,17 @@ class EquipmentMaintenance(BaseModel):
 
 class InventoryTransaction(BaseModel):
     __tablename__ = "inventory_transactions"
+    __table_args__ = (
+        Index("ix_inventory_transactions_inventory_id_date", "inventory_id", "transaction_date"),
+        Index("ix_inventory_transactions_inventory_id_seq", "inventory_id", "ledger_seq", unique=True),
+    )
     
-    inventory_id = Column(UUID(as_uuid=True), ForeignKey("inventories.id"), nullable=False)
+    inventory_id = Column(GUID(), ForeignKey("inventories.id"), nullable=False)
     transaction_type = Column(Enum(TransactionType), nullable=False)
     quantity = Column(Float, nullable=False)
     transaction_date = Column(DateTime, default=current_time, nullable=False)
-    created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    updated_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    created_by_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    updated_by_id = Column(GUID(), ForeignKey("users.id"), nullable=True)
     notes = Column(Text, nullable=True)
     
     # Additional metadata
@@ -234,9 +286,11 @@ class InventoryTransaction(BaseModel):
     resulting_quantity = Column(Float, nullable=True)
     is_locked = Column(Boolean, default=False, nullable=False)
     is_system_generated = Column(Boolean, default=False, nullable=False)
+    # Position in the item's ledger, 1-based; see InventoryBalance
+    ledger_seq = Column(Integer, nullable=True)
     
     # Add department_id foreign key
-    department_id = Column(UUID(as_uuid=True), ForeignKey("departments.id"), nullable=True)
+    department_id = Column(GUID(), ForeignKey("departments.id"), nullable=True)
     
     # Relationships
     inventory = relationship("Inventory", back_populates="transactions")
@@ -245,6 +299,74 @@ class InventoryTransaction(BaseModel):
     department = relationship("Department", back_populates="transactions")
 
 
+class InventoryBalance(Base):
+    """
+    Running stock balance of one item: the sum of its first `ledger_seq`
+    ledger entries, kept up to date as each entry is written, along with
+    the running total of each transaction type (LEDGER_COUNTER).
+    """
+    __tablename__ = "inventory_balances"
+    __table_args__ = (
+        CheckConstraint("balance >= 0", name="ck_inventory_balances_balance_non_negative"),
+    )
+
+    inventory_id = Column(GUID(), ForeignKey("inventories.id", ondelete="CASCADE"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0)
+    ledger_seq = Column(Integer, nullable=False, default=0)
+    issued = Column(Float, nullable=False, default=0, server_default="0")
+    returned = Column(Float, nullable=False, default=0, server_default="0")
+    restocked = Column(Float, nullable=False, default=0, server_default="0")
+    written_off = Column(Float, nullable=False, default=0, server_default="0")
+    damaged = Column(Float, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), default=current_time, onupdate=current_time)
+
+
+class InventoryCheckpoint(Base):
+    """An item's balance as of a ledger position, so verifying it only sums the entries after."""
+    __tablename__ = "inventory_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("inventory_id", "ledger_seq", name="uq_inventory_checkpoints_inventory_id_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    inventory_id = Column(GUID(), ForeignKey("inventories.id", ondelete="CASCADE"), nullable=False)
+    ledger_seq = Column(Integer, nullable=False)
+    balance = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=current_time, nullable=False)
+
+
+class StockCount(BaseModel):
+    """A cycle-count session: physical counts collected, then posted as adjustments."""
+    __tablename__ = "stock_counts"
+
+    name = Column(String, nullable=False)
+    notes = Column(Text, nullable=True)
+    status = Column(Enum(StockCountStatus), nullable=False, default=StockCountStatus.OPEN)
+    created_by_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    posted_by_id = Column(GUID(), ForeignKey("users.id"), nullable=True)
+    posted_at = Column(DateTime(timezone=True), nullable=True)
+
+    lines = relationship("StockCountLine", back_populates="stock_count", cascade="all, delete-orphan")
+
+
+class StockCountLine(Base):
+    """
+    One item's counted quantity in a count. system_quantity, variance and the
+    adjusting transaction are filled in when the count is posted.
+    """
+    __tablename__ = "stock_count_lines"
+
+    stock_count_id = Column(GUID(), ForeignKey("stock_counts.id", ondelete="CASCADE"), primary_key=True)
+    inventory_id = Column(GUID(), ForeignKey("inventories.id", ondelete="CASCADE"), primary_key=True)
+    counted_quantity = Column(Float, nullable=False)
+    counted_at = Column(DateTime(timezone=True), default=current_time, nullable=False)
+    system_quantity = Column(Float, nullable=True)
+    variance = Column(Float, nullable=True)
+    transaction_id = Column(GUID(), ForeignKey("inventory_transactions.id", ondelete="SET NULL"), nullable=True)
+
+    stock_count = relationship("StockCount", back_populates="lines")
+
+
 class Department(BaseModel):
     __tablename__ = "departments"
     
@@ -1,6 +1,6 @@
 from sqlalchemy import Column, String, Float, Text, ForeignKey, Date, Boolean, Enum
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from .guid import GUID
 from .baseModel import BaseModel
 from .inventory import QuantityUnit
 
@@ -17,7 +17,7 @@ class Invoice(BaseModel):
     notes = Column(Text, nullable=True)
     
     # Foreign keys
-    supplier_id = Column(UUID(as_uuid=True), ForeignKey("suppliers.id"), nullable=False)
+    supplier_id = Column(GUID(), ForeignKey("suppliers.id"), nullable=False)
     
     # Relationships
     supplier = relationship("Supplier", back_populates="invoices")
@@ -33,8 +33,8 @@ class InventoryInvoice(BaseModel):
     unit_price = Column(Float, nullable=False)
     
     # Foreign keys
-    inventory_id = Column(UUID(as_uuid=True), ForeignKey("inventories.id"), nullable=False)
-    invoice_id = Column(UUID(as_uuid=True), ForeignKey("invoices.id"), nullable=False)
+    inventory_id = Column(GUID(), ForeignKey("inventories.id"), nullable=False)
+    invoice_id = Column(GUID(), ForeignKey("invoices.id"), nullable=False)
     
     # Relationships
     inventory = relationship("Inventory", back_populates="invoices")
@@ -1,30 +1,133 @@
-# from sqlalchemy import Column, JSON, DateTime, Boolean, Enum
-# from sqlalchemy.dialects.postgresql import UUID
-# import enum
-# import uuid
-# from .baseModel import BaseModel
-# from utils.time_utils import current_time
-
-# class SyncStatus(enum.Enum):
-#     PENDING = "pending"
-#     SYNCED = "synced"
-#     CONFLICT = "conflict"
-#     ERROR = "error"
-
-# class EntityType(enum.Enum):
-#     SALE = "sale"
-#     INVENTORY = "inventory"
-#     PRODUCT = "product"
-
-# class OfflineSync(BaseModel):
-#     __tablename__ = "offline_syncs"
-    
-#     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-#     entity_type = Column(Enum(EntityType))
-#     entity_id = Column(UUID(as_uuid=True), nullable=True)
-#     raw_data = Column(JSON)
-#     status = Column(Enum(SyncStatus), default=SyncStatus.PENDING)
-#     client_timestamp = Column(DateTime)
-#     server_received_at = Column(DateTime, default=current_time)
-#     originated_from = Column(UUID(as_uuid=True))
-#     is_processed = Column(Boolean, default=False)
\ No newline at end of file
+from sqlalchemy import (
+    BigInteger, Column, JSON, DateTime, Boolean, Enum, Integer, String, Index, Text, cast, event, func, insert, select
+)
+from sqlalchemy.orm import Session
+import enum
+from .guid import GUID
+from .baseModel import BaseModel
+from .engine.database import Base
+from .product import Product
+from .category import Category
+from .settings import Settings
+from .sale import Sale
+from utils.time_utils import current_time
+
+
+class SyncStatus(enum.Enum):
+    PENDING = "pending"
+    SYNCED = "synced"
+    CONFLICT = "conflict"
+    ERROR = "error"
+
+
+class EntityType(str, enum.Enum):
+    SALE = "sale"
+    PRODUCT = "product"
+    CATEGORY = "category"
+    SETTINGS = "settings"
+
+
+class ChangeOperation(str, enum.Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class ChangeLog(Base):
+    """
+    One row per write to a synced table. `version` is the sync watermark:
+    terminals pull every change with a higher version than they have seen.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_entity", "entity_type", "entity_id"),
+        # Catalog version and catalog deltas filter on type and version range
+        Index("ix_change_log_entity_type_version", "entity_type", "version"),
+        {"sqlite_autoincrement": True},
+    )
+
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(Enum(EntityType), nullable=False)
+    # String so the integer settings id fits alongside the UUIDs
+    entity_id = Column(String(36), nullable=False)
+    operation = Column(Enum(ChangeOperation), nullable=False)
+    changed_at = Column(DateTime(timezone=True), default=current_time, nullable=False)
+    # PostgreSQL only: the first transaction id not yet assigned when the row
+    # was written. Once every transaction below it has ended, no version
+    # below this one can still commit (see SyncService.changes_since).
+    settled_after = Column(BigInteger, nullable=True)
+
+
+class OfflineSync(BaseModel):
+    """A record pushed by a terminal; client_id makes re-pushes idempotent."""
+    __tablename__ = "offline_syncs"
+
+    entity_type = Column(Enum(EntityType))
+    client_id = Column(GUID(), unique=True, nullable=False)
+    entity_id = Column(GUID(), nullable=True)
+    raw_data = Column(JSON)
+    status = Column(Enum(SyncStatus), default=SyncStatus.PENDING)
+    detail = Column(String, nullable=True)
+    client_timestamp = Column(DateTime)
+    server_received_at = Column(DateTime, default=current_time)
+    originated_from = Column(GUID())
+    is_processed = Column(Boolean, default=False)
+
+
+TRACKED_ENTITIES = {
+    Product: EntityType.PRODUCT,
+    Category: EntityType.CATEGORY,
+    Settings: EntityType.SETTINGS,
+    Sale: EntityType.SALE,
+}
+
+
+def _log_changes(session: Session, changes):
+    rows = [
+        {"entity_type": entity_type, "entity_id": str(entity_id), "operation": operation,
+         "changed_at": current_time()}
+        for entity_type, entity_id, operation in changes
+    ]
+    if rows:
+        conn = session.connection()
+        stmt = insert(ChangeLog)
+        if conn.dialect.name == "postgresql":
+            stmt = stmt.values(settled_after=cast(
+                cast(func.pg_snapshot_xmax(func.pg_current_snapshot()), Text), BigInteger
+            ))
+        conn.execute(stmt, rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        entity_type = TRACKED_ENTITIES.get(type(obj))
+        if entity_type:
+            changes.append((entity_type, obj.id, ChangeOperation.UPSERT))
+    for obj in session.dirty:
+        entity_type = TRACKED_ENTITIES.get(type(obj))
+        if entity_type and session.is_modified(obj, include_collections=False):
+            changes.append((entity_type, obj.id, ChangeOperation.UPSERT))
+    for obj in session.deleted:
+        entity_type = TRACKED_ENTITIES.get(type(obj))
+        if entity_type:
+            changes.append((entity_type, obj.id, ChangeOperation.DELETE))
+    _log_changes(session, changes)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_changes(orm_execute_state):
+    """Bulk query.update()/delete() skip the flush, so log the rows they match."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    entity_type = TRACKED_ENTITIES.get(mapper.class_) if mapper is not None else None
+    if not entity_type:
+        return
+    statement = orm_execute_state.statement
+    ids = orm_execute_state.session.execute(
+        select(mapper.class_.id).where(statement.whereclause)
+        if statement.whereclause is not None else select(mapper.class_.id)
+    ).scalars().all()
+    operation = ChangeOperation.DELETE if orm_execute_state.is_delete else ChangeOperation.UPSERT
+    _log_changes(orm_execute_state.session, [(entity_type, entity_id, operation) for entity_id in ids])
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, Float, ForeignKey, Index, Numeric
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from .guid import GUID
 from .baseModel import BaseModel
+from .engine.database import Base
+from utils.time_utils import current_time
 
 class Product(BaseModel):
     __tablename__ = "products"
@@ -11,7 +13,42 @@ class Product(BaseModel):
     price = Column(Numeric(10, 2), nullable=False)
     image = Column(String, nullable=True)
 
-    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False)
+    category_id = Column(GUID(), ForeignKey("categories.id"), nullable=False)
 
     category = relationship("Category", back_populates="products")
-    sale_items = relationship("SaleItem", back_populates="product") 
+    sale_items = relationship("SaleItem", back_populates="product")
+    recipe_items = relationship("RecipeItem", back_populates="product", cascade="all, delete-orphan")
+    availability = relationship("ProductAvailability", uselist=False, cascade="all, delete-orphan")
+
+
+class RecipeItem(Base):
+    """
+    Raw material used to make one unit of a product, in the material's own
+    quantity unit. Sales deplete it through services.depletion.
+    """
+    __tablename__ = "recipe_items"
+    __table_args__ = (
+        # Stock changes look up the recipes that use the item
+        Index("ix_recipe_items_inventory_id", "inventory_id"),
+    )
+
+    product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    inventory_id = Column(GUID(), ForeignKey("raw_materials.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Float, nullable=False)
+
+    product = relationship("Product", back_populates="recipe_items")
+    raw_material = relationship("RawMaterial")
+
+
+
+class ProductAvailability(Base):
+    """
+    Whether a product's recipe has stock for one more unit, kept up to date
+    by services.availability as ledger balances change. Products without a
+    row are available.
+    """
+    __tablename__ = "product_availability"
+
+    product_id = Column(GUID(), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    is_available = Column(Boolean, nullable=False, default=True)
+    changed_at = Column(DateTime, default=current_time, nullable=False)
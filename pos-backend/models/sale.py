@@ -1,14 +1,20 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, Boolean
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, Boolean, Index, event, insert, inspect, select
+from sqlalchemy.orm import Session, relationship
+from .guid import GUID
 from .baseModel import BaseModel
+from .engine.database import Base
 from utils.time_utils import current_time
 
 class Sale(BaseModel):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Date-range reports and session reports filter on these
+        Index("ix_sales_timestamp", "timestamp"),
+        Index("ix_sales_session_id_timestamp", "session_id", "timestamp"),
+    )
 
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    session_id = Column(UUID(as_uuid=True), ForeignKey("user_sessions.id"))
+    user_id = Column(GUID(), ForeignKey("users.id"))
+    session_id = Column(GUID(), ForeignKey("user_sessions.id"))
     total_amount = Column(Numeric(10, 2))
     timestamp = Column(DateTime, default=current_time)
     receipt_number = Column(String, unique=True, index=True)
@@ -20,12 +26,79 @@ class Sale(BaseModel):
 
 class SaleItem(BaseModel):
     __tablename__ = "sale_items"
+    __table_args__ = (
+        Index("ix_sale_items_sale_id_product_id", "sale_id", "product_id"),
+        Index("ix_sale_items_product_id", "product_id"),
+    )
 
-    sale_id = Column(UUID(as_uuid=True), ForeignKey("sales.id"))
-    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"))
+    sale_id = Column(GUID(), ForeignKey("sales.id"))
+    product_id = Column(GUID(), ForeignKey("products.id"))
     quantity = Column(Integer)
     unit_price = Column(Numeric(10, 2))
     total_price = Column(Numeric(10, 2))
 
     sale = relationship("Sale", back_populates="items")
     product = relationship("Product", back_populates="sale_items")
+
+
+class StockDepletion(Base):
+    """
+    Units sold that still have to be taken off their recipes' raw materials:
+    one row per sale item added, changed or removed, written in the same
+    transaction as the sale and drained in batches by services.depletion.
+    `quantity` is the change in units sold and is negative for removals.
+    """
+    __tablename__ = "stock_depletions"
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # No foreign keys: a queued row outlives the sale or product it came from
+    sale_id = Column(GUID(), nullable=False)
+    user_id = Column(GUID(), nullable=False)
+    product_id = Column(GUID(), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    queued_at = Column(DateTime, default=current_time, nullable=False)
+
+
+def _sold_quantity_changes(session: Session):
+    """(sale item, change in units sold) for each sale item in this flush."""
+    for obj in session.new:
+        if isinstance(obj, SaleItem):
+            yield obj, obj.quantity or 0
+    for obj in session.dirty:
+        if isinstance(obj, SaleItem):
+            history = inspect(obj).attrs.quantity.history
+            if history.has_changes():
+                before = history.deleted[0] if history.deleted else 0
+                yield obj, (obj.quantity or 0) - (before or 0)
+    for obj in session.deleted:
+        if isinstance(obj, SaleItem):
+            yield obj, -(obj.quantity or 0)
+
+
+@event.listens_for(Session, "after_flush")
+def _queue_stock_depletion(session, flush_context):
+    changes = [(item, change) for item, change in _sold_quantity_changes(session)
+               if change and item.sale_id is not None]
+    if not changes:
+        return
+    # The sale is normally in the session already; look up any that are not
+    sellers = {}
+    for item, _ in changes:
+        sale = session.identity_map.get(Session.identity_key(Sale, item.sale_id))
+        if sale is not None:
+            sellers[item.sale_id] = sale.user_id
+    missing = {item.sale_id for item, _ in changes} - sellers.keys()
+    if missing:
+        sellers.update(session.connection().execute(
+            select(Sale.id, Sale.user_id).where(Sale.id.in_(missing))
+        ).all())
+    now = current_time()
+    rows = [
+        {"sale_id": item.sale_id, "user_id": sellers[item.sale_id], "product_id": item.product_id,
+         "quantity": change, "queued_at": now}
+        # Stock is issued in the seller's name, so a sale without one is not queued
+        for item, change in changes if sellers.get(item.sale_id) is not None
+    ]
+    if rows:
+        session.connection().execute(insert(StockDepletion), rows)
@@ -1,8 +1,15 @@
-from pydantic import BaseModel, UUID4, Field
+from pydantic import BaseModel, UUID4, Field, PlainSerializer
 from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Annotated
 import uuid
 from models.baseModel import current_time
 
+# Amounts go out as JSON numbers. Declared on the type, pydantic-core compiles
+# it into the model serializer instead of looking up json_encoders per value.
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
+
 class BaseSchema(BaseModel):
     id: UUID4 = Field(default_factory=uuid.uuid4)  # Use UUID4 instead of str
     created_at: datetime = Field(default_factory=current_time)
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Dict, Optional
+from datetime import datetime
+from uuid import UUID
+from .baseSchema import Money
+
+
+class CatalogCategory(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    image: Optional[str] = None
+    is_enabled: bool
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CatalogProduct(BaseModel):
+    """A product row; the category is referenced by id instead of embedded."""
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    price: Money
+    image: Optional[str] = None
+    category_id: UUID
+    is_enabled: bool
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CatalogResponse(BaseModel):
+    version: int
+    full: bool
+    categories: List[CatalogCategory] = []
+    products: List[CatalogProduct] = []
+    deleted: Dict[str, List[str]] = {}
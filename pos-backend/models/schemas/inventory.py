@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Union
 from datetime import datetime, date
 from .baseSchema import BaseSchema
@@ -8,7 +8,8 @@ from models.inventory import (
     InventoryType, 
     InventoryStatus, 
     TransactionType, 
-    MaintenanceStatus
+    MaintenanceStatus,
+    StockCountStatus
 )
 
 class InventoryBase(BaseModel):
@@ -177,6 +178,61 @@ class TransactionCreate(BaseModel):
             raise ValueError('Quantity must be positive')
         return v
 
+class BulkTransactionCreate(BaseModel):
+    # Applied in order; a line may depend on the ones before it
+    transactions: List[TransactionCreate] = Field(min_length=1, max_length=1000)
+
+class BulkTransactionResult(BaseModel):
+    index: int
+    inventory_id: UUID
+    status: str
+    transaction_id: Optional[UUID] = None
+    resulting_quantity: Optional[float] = None
+    detail: Optional[str] = None
+
+class BulkTransactionResponse(BaseModel):
+    applied: int
+    failed: int
+    results: List[BulkTransactionResult]
+
+class StockCountCreate(BaseModel):
+    name: str
+    notes: Optional[str] = None
+
+class StockCountEntry(BaseModel):
+    inventory_id: UUID
+    counted_quantity: float = Field(ge=0)
+
+class StockCountUpload(BaseModel):
+    # Counting an item again replaces its earlier count
+    counts: List[StockCountEntry] = Field(min_length=1, max_length=20000)
+
+class StockCountRejection(BaseModel):
+    inventory_id: UUID
+    detail: str
+
+class StockCountUploadResult(BaseModel):
+    recorded: int
+    rejected: List[StockCountRejection] = []
+
+class StockCountVariance(BaseModel):
+    inventory_id: UUID
+    inventory_name: str
+    counted_quantity: float
+    system_quantity: float
+    variance: float
+    transaction_id: Optional[UUID] = None
+
+class StockCountResponse(BaseSchema):
+    name: str
+    notes: Optional[str] = None
+    status: StockCountStatus
+    posted_at: Optional[datetime] = None
+    lines: int
+    adjustments: int
+    # Only the lines whose count differs from the system quantity
+    variances: List[StockCountVariance] = []
+
 class Transaction(BaseSchema):
     inventory_id: UUID
     transaction_type: TransactionType
@@ -1,9 +1,11 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
-from .baseSchema import BaseSchema
+from datetime import datetime
+from .baseSchema import BaseSchema, Money
 from models.schemas.category import CategoryResponse
+from models.inventory import QuantityUnit
 
 
 class ProductCreate(BaseModel):
@@ -26,16 +28,47 @@ class ProductUpdate(BaseModel):
 class ProductResponse(BaseSchema):
     name: str
     description: Optional[str] = None
-    price: Decimal
+    price: Money
     category: Optional[CategoryResponse]
     image: Optional[str] = None
 
     class Config:
         from_attributes = True
-        json_encoders = {Decimal: lambda v: float(v)}
 
 class ToggleResponse(BaseModel):
     is_enabled: bool
     
     class Config:
         from_attributes = True
+
+
+class RecipeItemCreate(BaseModel):
+    inventory_id: UUID
+    # Per unit of the product sold, in the raw material's quantity unit
+    quantity: float = Field(gt=0)
+
+
+class RecipeUpdate(BaseModel):
+    # Replaces the whole recipe; an empty list removes it
+    items: List[RecipeItemCreate] = Field(max_length=200)
+
+
+class RecipeItemResponse(BaseModel):
+    inventory_id: UUID
+    name: str
+    quantity: float
+    quantity_unit: QuantityUnit
+
+
+class RecipeResponse(BaseModel):
+    product_id: UUID
+    items: List[RecipeItemResponse]
+
+
+class ProductAvailabilityResponse(BaseModel):
+    product_id: UUID
+    is_available: bool
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
-from .baseSchema import BaseSchema
+from .baseSchema import BaseSchema, Money
 from decimal import Decimal
 from datetime import datetime
 from uuid import UUID
@@ -19,14 +19,13 @@ class SaleCreate(BaseModel):
 class SaleTableRow(BaseSchema):
     sale_id: UUID
     date_time: datetime
-    total: Decimal
+    total: Money
     receipt_number: str
     username: str
     total_items: int
 
     class Config:
         from_attributes = True
-        json_encoders = {Decimal: lambda v: float(v)}
 
 class SaleSummary(BaseModel):
     rows: List[SaleTableRow]
@@ -42,13 +41,12 @@ class SaleItemTableRow(BaseModel):
     product: str
     category: str
     quantity: int
-    unit_price: Decimal
-    total: Decimal
+    unit_price: Money
+    total: Money
     session_start: datetime
 
     class Config:
         from_attributes = True
-        json_encoders = {Decimal: lambda v: float(v)}
 
 class SaleItemsSummary(BaseModel):
     rows: List[SaleItemTableRow]
@@ -74,12 +72,9 @@ class SaleResponse(BaseModel):
     id: UUID
     user_id: UUID
     session_id: UUID
-    total_amount: Decimal
+    total_amount: Money
     timestamp: datetime
     receipt_number: str
     items: List[SaleItemResponse]
 
-    model_config = ConfigDict(
-        from_attributes=True,
-        json_encoders={Decimal: lambda v: float(v)}
-    )
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
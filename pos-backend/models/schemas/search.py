@@ -0,0 +1,21 @@
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class SearchHit(BaseModel):
+    id: UUID
+    title: str
+    # Title and body with the matched words wrapped in <mark></mark>, HTML-escaped
+    highlight: str
+    snippet: Optional[str] = None
+    # Higher is better; only comparable within one list
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    products: List[SearchHit] = []
+    inventory: List[SearchHit] = []
+    suppliers: List[SearchHit] = []
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+from decimal import Decimal
+from datetime import datetime
+from uuid import UUID
+
+
+class OfflineSaleItem(BaseModel):
+    product_id: UUID
+    quantity: int = Field(gt=0)
+    # Price charged at the till; defaults to the current server price
+    unit_price: Optional[Decimal] = Field(default=None, ge=0, decimal_places=2)
+
+
+class OfflineSaleCreate(BaseModel):
+    client_id: UUID
+    client_timestamp: datetime
+    items: List[OfflineSaleItem] = Field(min_length=1)
+
+
+class SyncPushRequest(BaseModel):
+    terminal_id: UUID
+    sales: List[OfflineSaleCreate] = Field(max_length=500)
+
+
+class SyncPushResult(BaseModel):
+    client_id: UUID
+    status: str
+    sale_id: Optional[UUID] = None
+    receipt_number: Optional[str] = None
+    detail: Optional[str] = None
+    warnings: List[str] = []
+
+
+class SyncPullResponse(BaseModel):
+    watermark: int
+    has_more: bool
+    products: List[Dict[str, Any]] = []
+    categories: List[Dict[str, Any]] = []
+    settings: List[Dict[str, Any]] = []
+    sales: List[Dict[str, Any]] = []
+    deleted: Dict[str, List[str]] = {}
@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, event, insert, update
+from sqlalchemy.orm import Session
+from .engine.database import Base
+
+
+# Reference-data tables whose list endpoints answer conditional GETs
+VERSIONED_TABLES = {"settings", "categories", "products", "suppliers"}
+
+
+class TableVersion(Base):
+    """Write counter per reference-data table, the source of the endpoints' ETags."""
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def bump_versions(session: Session, tables):
+    """Increment the counters once per table per transaction."""
+    bumped = session.info.setdefault("bumped_tables", set())
+    conn = session.connection()
+    for table in sorted(set(tables) - bumped):
+        updated = conn.execute(
+            update(TableVersion)
+            .where(TableVersion.table_name == table)
+            .values(version=TableVersion.version + 1)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(TableVersion).values(table_name=table, version=1))
+        bumped.add(table)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    tables = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if getattr(obj, "__table__", None) is not None and obj.__table__.name in VERSIONED_TABLES
+    }
+    if tables:
+        bump_versions(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_tables(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in VERSIONED_TABLES:
+        bump_versions(orm_execute_state.session, {mapper.local_table.name})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_versions(session):
+    session.info.pop("bumped_tables", None)
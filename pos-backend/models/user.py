@@ -1,12 +1,27 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from passlib.context import CryptContext
 from .baseModel import BaseModel
+from .engine.database import Base
 from utils.time_utils import current_time
-from sqlalchemy.dialects.postgresql import UUID
+from .guid import GUID
+from dotenv import load_dotenv
+import os
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+load_dotenv()
+
+# Hashes made with a different cost are flagged by verify_and_update and
+# replaced on the user's next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 
 class User(BaseModel):
@@ -36,6 +51,10 @@ class User(BaseModel):
 
     def verify_password(self, pwd: str):
         return pwd_context.verify(pwd, self.password)
+
+    def verify_and_update_password(self, pwd: str):
+        """Return (is_valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+        return pwd_context.verify_and_update(pwd, self.password)
     
     @classmethod
     def hash_password(cls, password: str):
@@ -43,20 +62,41 @@ class User(BaseModel):
     
 
 class TokenBlacklist(BaseModel):
+    """Legacy revocation list keyed on the full token text (tokens without a jti)."""
     __tablename__ = "token_blacklist"
 
     token = Column(String, unique=True, index=True)
     blacklisted_on = Column(DateTime, default=current_time)
 
 
+class RevokedToken(Base):
+    """Revoked token IDs; rows can be purged once the token itself has expired."""
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, default=current_time, index=True)
+
+
 class UserSession(BaseModel):
     __tablename__ = "user_sessions"
 
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     expires = Column(Boolean, default=False, nullable=False)
     login_time = Column(DateTime(timezone=True), nullable=False, default=current_time)
     logout_time = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="sessions")
     sales = relationship("Sale", back_populates="session")
+
+
+# Partial index matching SessionManager.get_active_session, which runs on every
+# authenticated request that misses the auth cache
+_active_session = (UserSession.expires == False) & (UserSession.logout_time == None)
+Index(
+    "ix_user_sessions_active_user_id",
+    UserSession.user_id,
+    postgresql_where=_active_session,
+    sqlite_where=_active_session,
+)
     
\ No newline at end of file
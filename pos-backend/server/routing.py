@@ -0,0 +1,52 @@
+"""
+Route class for the API routers.
+
+The endpoints are `async def` but talk to the database synchronously. A write
+may wait for the SQLite writer lock (up to SQLITE_WRITE_LOCK_TIMEOUT) or a
+PostgreSQL row lock held by a threadpool route or the depletion batch, and on
+the event loop that wait would freeze every other request and socket. Writing
+endpoints therefore run on a threadpool thread, each on that thread's own
+event loop, so they can still await (password hashing, uploads) while the
+lock waits happen off the main loop. Reads stay on the loop.
+"""
+import asyncio
+import inspect
+import threading
+from typing import Callable
+
+from fastapi.routing import APIRoute
+
+WRITING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+_thread_loops = threading.local()
+
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_thread_loops, "loop", None)
+    if loop is None:
+        loop = _thread_loops.loop = asyncio.new_event_loop()
+    return loop
+
+
+def run_off_loop(endpoint: Callable) -> Callable:
+    """A sync wrapper of an async endpoint, which FastAPI then calls in its threadpool."""
+    def run(*args, **kwargs):
+        return _thread_loop().run_until_complete(endpoint(*args, **kwargs))
+
+    # Not functools.wraps: FastAPI follows __wrapped__ and would await the wrapper
+    run.__name__ = endpoint.__name__
+    run.__qualname__ = endpoint.__qualname__
+    run.__doc__ = endpoint.__doc__
+    run.__module__ = endpoint.__module__
+    run.__signature__ = inspect.signature(endpoint)
+    return run
+
+
+class WriteOffLoopRoute(APIRoute):
+    """APIRoute that runs async endpoints of writing methods with run_off_loop()."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        methods = {method.upper() for method in kwargs.get("methods") or ()}
+        if methods & WRITING_METHODS and inspect.iscoroutinefunction(endpoint):
+            endpoint = run_off_loop(endpoint)
+        super().__init__(path, endpoint, **kwargs)
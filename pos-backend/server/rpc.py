@@ -0,0 +1,216 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import ObjectDeletedError
+
+from models.category import Category
+from models.schemas.category import CategoryResponse
+from models.schemas.product import ProductResponse
+from models.schemas.sale import SaleCreate
+from models.user import User
+from services.auth import is_token_revoked
+from services.authCache import access_version_key, auth_cache
+from services.permission import has_access, has_permission
+from services.sales import Sales
+from services.catalog import CatalogService
+
+
+logger = logging.getLogger(__name__)
+
+
+class RpcError(Exception):
+    """Error returned to the caller of an RPC method."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class RpcMethod:
+    def __init__(self, handler: Callable, allowed_roles: List[str], resource: str, action: str):
+        self.handler = handler
+        self.allowed_roles = allowed_roles
+        self.resource = resource
+        self.action = action
+
+
+class RpcStats:
+    """Per-method call counters used to compare RPC latency with the HTTP path."""
+
+    def __init__(self):
+        self.methods: Dict[str, Dict[str, float]] = {}
+
+    def record(self, method: str, elapsed_ms: float, failed: bool):
+        stats = self.methods.setdefault(
+            method, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        stats["calls"] += 1
+        stats["errors"] += 1 if failed else 0
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            method: {
+                **stats,
+                "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0,
+            }
+            for method, stats in self.methods.items()
+        }
+
+
+class RpcDispatcher:
+    """
+    Request/response protocol carried over the authenticated /ws connection.
+
+    Requests look like {"type": "rpc", "id": "<correlation id>", "method": "...", "params": {...}}
+    and are answered with {"type": "rpc_result", "id": ..., "result": ...} or
+    {"type": "rpc_error", "id": ..., "error": {"code": ..., "message": ...}}.
+    """
+
+    def __init__(self):
+        self.methods: Dict[str, RpcMethod] = {}
+        self.stats = RpcStats()
+
+    def method(self, name: str, allowed_roles: List[str], resource: str, action: str):
+        """Register a handler, guarded the same way as role_required on HTTP routes."""
+        def decorator(func):
+            self.methods[name] = RpcMethod(func, allowed_roles, resource, action)
+            return func
+        return decorator
+
+    def _check_principal(self, user: User, db: Session):
+        """
+        The socket authenticated once at connect, so each request re-checks
+        what may have changed since: token expiry and revocation, the user's
+        access version (role change or session termination in any worker),
+        and is_enabled, which the previous request's rollback made reload.
+        A 401 here ends the connection.
+        """
+        try:
+            is_enabled = user.is_enabled
+        except ObjectDeletedError:
+            raise RpcError(status.HTTP_401_UNAUTHORIZED, "User not found")
+        if user.current_token_claims["exp"] <= time.time():
+            raise RpcError(status.HTTP_401_UNAUTHORIZED, "Token has expired")
+        if is_token_revoked(db, user.current_token, user.current_token_claims):
+            raise RpcError(status.HTTP_401_UNAUTHORIZED, "Token has been revoked")
+        if auth_cache.access_versions().get(access_version_key(user.id), 0) != user.current_access_version:
+            raise RpcError(status.HTTP_401_UNAUTHORIZED, "Session or access changed, reconnect")
+        if not is_enabled:
+            raise RpcError(status.HTTP_401_UNAUTHORIZED, "User account is disabled")
+
+    @staticmethod
+    def ends_connection(reply: Dict[str, Any]) -> bool:
+        """Whether the socket's login no longer holds and it must be closed."""
+        return reply.get("error", {}).get("code") == status.HTTP_401_UNAUTHORIZED
+
+    def _check_permission(self, rpc_method: RpcMethod, user: User):
+        if not has_access(user.role, rpc_method.allowed_roles):
+            raise RpcError(status.HTTP_403_FORBIDDEN, "You do not have permission to access this method")
+        if not has_permission(user.role, rpc_method.resource, rpc_method.action):
+            raise RpcError(status.HTTP_403_FORBIDDEN, "You do not have permission to perform this action")
+
+    def dispatch(self, message: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+        """
+        Run a single RPC request and build the reply frame. `db` lives as
+        long as the socket, so the transaction is ended after every request:
+        otherwise the connection's snapshot and identity map would stay
+        pinned and later requests would not see other sessions' commits.
+        Handlers that write commit themselves.
+        """
+        request_id = message.get("id")
+        method_name = message.get("method")
+        started = time.perf_counter()
+        failed = True
+
+        try:
+            self._check_principal(user, db)
+
+            if request_id is None:
+                raise RpcError(status.HTTP_400_BAD_REQUEST, "Missing request id")
+
+            rpc_method = self.methods.get(method_name)
+            if not rpc_method:
+                raise RpcError(status.HTTP_404_NOT_FOUND, f"Unknown method: {method_name}")
+
+            self._check_permission(rpc_method, user)
+
+            params = message.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(status.HTTP_400_BAD_REQUEST, "params must be an object")
+
+            result = rpc_method.handler(db, user, **params)
+            failed = False
+            reply = {"type": "rpc_result", "id": request_id, "result": result}
+
+        except RpcError as e:
+            reply = self._error(request_id, e.code, e.message)
+        except HTTPException as e:
+            reply = self._error(request_id, e.status_code, str(e.detail))
+        except (ValidationError, TypeError, ValueError) as e:
+            reply = self._error(request_id, status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
+        except Exception as e:
+            logger.exception("RPC method %s failed", method_name)
+            reply = self._error(request_id, status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+        finally:
+            db.rollback()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(method_name or "<invalid>", elapsed_ms, failed)
+        reply["elapsed_ms"] = round(elapsed_ms, 3)
+        return reply
+
+    @staticmethod
+    def _error(request_id: Optional[str], code: int, message: str) -> Dict[str, Any]:
+        return {"type": "rpc_error", "id": request_id, "error": {"code": code, "message": message}}
+
+
+rpc = RpcDispatcher()
+
+
+@rpc.method("sales.create", ["cashier"], "sales", "create")
+def create_sale(db: Session, user: User, **params):
+    """Same as POST /api/v1/sales/create."""
+    sale_data = SaleCreate(**params)
+    sale = Sales(db).create_sale(user.id, UUID(user.current_session_id), sale_data)
+    return jsonable_encoder(sale)
+
+
+@rpc.method("catalog.categories", ["cashier"], "categories", "read")
+def get_enabled_categories(db: Session, user: User):
+    """Same as GET /api/v1/category/enabled."""
+    categories = db.query(Category).filter(Category.is_enabled == True).all()
+    return [CategoryResponse.model_validate(c).model_dump(mode="json") for c in categories]
+
+
+@rpc.method("catalog.products", ["cashier"], "products", "read")
+def get_enabled_products(db: Session, user: User, category_id: Optional[str] = None):
+    """Enabled products, optionally limited to one category."""
+    products = CatalogService(db).list_products(
+        category_id=UUID(category_id) if category_id else None, enabled_only=True
+    )
+    return [ProductResponse.model_validate(p).model_dump(mode="json") for p in products]
+
+
+@rpc.method("catalog.product", ["cashier"], "products", "read")
+def get_product(db: Session, user: User, product_id: str):
+    """Same as GET /api/v1/product/{product_id}."""
+    product = CatalogService(db).get_product(UUID(product_id))
+    if not product:
+        raise RpcError(status.HTTP_404_NOT_FOUND, "Product not found")
+    return ProductResponse.model_validate(product).model_dump(mode="json")
+
+
+@rpc.method("rpc.stats", ["supervisor"], "sales", "read")
+def get_stats(db: Session, user: User):
+    """Per-method latency counters for comparison with the HTTP endpoints."""
+    return rpc.stats.snapshot()
+
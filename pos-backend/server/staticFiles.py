@@ -0,0 +1,46 @@
+import os
+import re
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+load_dotenv()
+
+UPLOAD_MAX_AGE_SECONDS = int(os.getenv("UPLOAD_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+
+# Content-hash names, plus the random uuid4 hex names of older uploads. Neither
+# is ever rewritten with different content, so both can be cached forever.
+IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{32}(-[a-z]+)?\.(png|webp)$")
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    Serves /uploads. Write-once files get a year-long immutable Cache-Control,
+    so terminals stop revalidating thumbnails on every catalog render, and a
+    .png request is answered with its .webp variant when the client accepts
+    WebP. Range requests are handled by FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        headers = {"Cache-Control": "no-cache"}
+
+        if IMMUTABLE_NAME.match(name):
+            headers["Cache-Control"] = f"public, max-age={UPLOAD_MAX_AGE_SECONDS}, immutable"
+            if name.endswith(".png"):
+                headers["Vary"] = "Accept"
+                if "image/webp" in request_headers.get("accept", ""):
+                    webp_path = str(full_path)[:-len(".png")] + ".webp"
+                    try:
+                        full_path, stat_result = webp_path, os.stat(webp_path)
+                    except FileNotFoundError:
+                        # Still rendering, or an upload from before WebP variants existed
+                        pass
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
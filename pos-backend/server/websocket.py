@@ -2,8 +2,9 @@ from fastapi import WebSocket
 from sqlalchemy.orm import Session
 from typing import Dict
 from starlette.websockets import WebSocketState
-from models.user import User, TokenBlacklist
-from services.auth import verify_access_token
+from models.user import User
+from services.auth import verify_access_token, is_token_revoked
+from services.authCache import access_version_key, auth_cache
 from services.sessionManager import SessionManager
 
 
@@ -31,7 +32,8 @@ class ConnectionManager:
 
     async def broadcast(self, message: str):
         """Broadcasts a message to all connected clients."""
-        for websocket in self.active_connections.values():
+        # Connections may come and go while a send is awaited
+        for websocket in list(self.active_connections.values()):
             if websocket.client_state == WebSocketState.CONNECTED:
                 await websocket.send_text(message)
 
@@ -42,6 +44,9 @@ class ConnectionManager:
             if not access_token:
                 raise Exception("Authentication token missing")
 
+            # Read first, as get_current_user does for the HTTP cache
+            access_versions = auth_cache.access_versions()
+
             # Verify access token
             payload = verify_access_token(access_token)
             username: str = payload.get("sub")
@@ -50,15 +55,16 @@ class ConnectionManager:
             if not username or not session_id:
                 raise Exception("Invalid token payload")
 
-            # Check if token is blacklisted
-            blacklisted = db.query(TokenBlacklist).filter(TokenBlacklist.token == access_token).first()
-            if blacklisted:
+            # Check if token has been revoked
+            if is_token_revoked(db, access_token, payload):
                 raise Exception("Token is blacklisted")
 
             # Fetch the user from the database
             user = db.query(User).filter(User.username == username).first()
             if not user:
                 raise Exception("User not found")
+            if not user.is_enabled:
+                raise Exception("User account is disabled")
 
             # Validate active session
             session_manager = SessionManager(db)
@@ -67,8 +73,12 @@ class ConnectionManager:
             if not active_session or str(active_session.id) != session_id:
                 raise Exception("No active session found")
 
-            # Attach session ID dynamically
+            # Attach session ID dynamically, and what the RPC dispatcher
+            # re-checks before each request on this connection
             user.current_session_id = session_id
+            user.current_token = access_token
+            user.current_token_claims = payload
+            user.current_access_version = access_versions.get(access_version_key(user.id), 0)
 
             return user
 
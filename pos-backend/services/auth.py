@@ -6,9 +6,16 @@ from sqlalchemy.orm import Session
 from models.engine.database import get_db
 from models.user import User, TokenBlacklist
 from services.sessionManager import SessionManager
+from services.authCache import auth_cache
+from services.tokenRevocation import revocation_store
+from services.passwordHashing import verify_password
+from models.engine.database import SessionLocal
 from typing import Type, Optional
 from dotenv import load_dotenv
 from utils.time_utils import current_time
+from uuid import uuid4
+import asyncio
+import logging
 import pytz
 import os
 
@@ -20,6 +27,9 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES"))
+REVOCATION_PURGE_INTERVAL_SECONDS = int(os.getenv("REVOCATION_PURGE_INTERVAL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 # security = HTTPBearer(auto_error=False)
@@ -33,7 +43,7 @@ credentials_exception = HTTPException(
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = current_time() + timedelta(hours=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_access_token(access_token):
@@ -65,7 +75,7 @@ def verify_access_token(access_token):
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = current_time() + timedelta(days=REFRESH_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_refresh_token(refresh_token):
@@ -97,11 +107,62 @@ def verify_refresh_token(refresh_token):
 def is_token_blacklisted(db: Session, token: str) -> bool:
     return db.query(TokenBlacklist).filter(TokenBlacklist.token == token).first() is not None
 
-def authenticate_user(db: Session, username: str, password: str):
+
+def is_token_revoked(db: Session, token: str, payload: dict) -> bool:
+    """Check revocation by jti; tokens issued before jti existed use the legacy table."""
+    jti = payload.get("jti")
+    if jti:
+        return revocation_store.is_revoked(db, jti)
+    return is_token_blacklisted(db, token)
+
+
+def revoke_token(db: Session, token: str):
+    """Revoke a token that has already been verified by get_current_user."""
+    payload = jwt.get_unverified_claims(token)
+    if payload.get("jti"):
+        revocation_store.revoke(db, payload["jti"], payload["exp"])
+    else:
+        db.add(TokenBlacklist(token=token))
+        db.commit()
+    auth_cache.invalidate_token(token)
+
+
+def purge_revoked_tokens(db: Session) -> int:
+    """Remove revocation rows for tokens that can no longer be used."""
+    legacy_cutoff = current_time() - timedelta(hours=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return revocation_store.purge(db, legacy_cutoff)
+
+
+async def revocation_purge_loop(interval: int = REVOCATION_PURGE_INTERVAL_SECONDS):
+    """Background task started from the app lifespan."""
+    while True:
+        db = SessionLocal()
+        try:
+            purged = await asyncio.to_thread(purge_revoked_tokens, db)
+            if purged:
+                logger.info("Purged %s expired token revocations", purged)
+        except Exception:
+            db.rollback()
+            logger.exception("Token revocation purge failed")
+        finally:
+            db.close()
+        await asyncio.sleep(interval)
+
+async def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
-    if user and user.verify_password(password):
-        return user
-    return None
+    if not user:
+        return None
+
+    # bcrypt runs on the hashing pool so the event loop keeps serving checkouts
+    is_valid, new_hash = await verify_password(user, password)
+    if not is_valid:
+        return None
+
+    # Transparently upgrade hashes made with outdated cost parameters
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+    return user
 
 
 # def get_optional_token(
@@ -151,6 +212,16 @@ async def get_current_user(
         if not access_token:
             raise credentials_exception
 
+        # Tokens verified earlier skip the JWT decode and the three lookups below
+        cached = auth_cache.get(access_token)
+        if cached:
+            if cached.jti and revocation_store.is_revoked(db, cached.jti):
+                auth_cache.invalidate_token(access_token)
+                raise credentials_exception
+            return cached.attach(db)
+
+        # Read first: a change committed while verifying makes the entry stale
+        access_versions = auth_cache.access_versions()
         payload = verify_access_token(access_token)
         username: str = payload.get("sub")
         session_id: str = payload.get("session_id")
@@ -158,14 +229,11 @@ async def get_current_user(
         if not username or not session_id:
             raise credentials_exception
 
-        blacklisted = db.query(TokenBlacklist).filter(
-            TokenBlacklist.token == access_token
-        ).first()
-        if blacklisted:
+        if is_token_revoked(db, access_token, payload):
             raise credentials_exception
 
         user = db.query(User).filter(User.username == username).first()
-        if not user:
+        if not user or not user.is_enabled:
             raise credentials_exception
 
         session_manager = SessionManager(db)
@@ -177,6 +245,8 @@ async def get_current_user(
         # Augment the User object with the current_session_id
         user.current_session_id = session_id  # Add the attribute dynamically
 
+        auth_cache.put(access_token, user, session_id, payload["exp"], payload.get("jti"), access_versions)
+
         return user
 
     except Exception as e:
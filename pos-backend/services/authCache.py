@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from dotenv import load_dotenv
+from models.tableVersion import TableVersion, bump_versions
+from models.user import User
+from services.tableVersions import table_versions
+
+load_dotenv()
+
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+# Upper bound on how long a verified token is trusted without touching the
+# database. Entries never outlive the token's own exp claim. A role, enable or
+# username change reaches the other workers' caches through the user's access
+# version within ETAG_REFRESH_SECONDS, not this TTL. Logout needs no version:
+# cache hits still check the token's jti against the revocation store.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+# The User columns whose change must end the user's cached access
+ACCESS_COLUMNS = ("role", "is_enabled", "username")
+
+
+def access_version_key(user_id: UUID) -> str:
+    """
+    The table_versions row counting a user's access changes. Created with the
+    user (and by migration 16 for existing users), so a bump is always an
+    UPDATE and concurrent first bumps cannot race on the insert.
+    """
+    return f"user_access:{user_id.hex}"
+
+
+class CachedPrincipal:
+    """Verified user columns and session id for one access token."""
+
+    __slots__ = ("user_id", "session_id", "jti", "user_values", "expires_at", "access_version")
+
+    def __init__(self, user: User, session_id: str, expires_at: float, jti: Optional[str] = None,
+                 access_version: int = 0):
+        self.user_id = user.id
+        self.session_id = session_id
+        self.jti = jti
+        self.user_values = {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        }
+        self.expires_at = expires_at
+        self.access_version = access_version
+
+    def attach(self, db: Session) -> User:
+        """Rebuild the User in the request's session without a SELECT."""
+        user = User(**self.user_values)
+        make_transient_to_detached(user)
+        user = db.merge(user, load=False)
+        user.current_session_id = self.session_id
+        return user
+
+
+class AuthCache:
+    """
+    In-process cache of verified access tokens, keyed by a hash of the token.
+
+    Entries are dropped when they expire. Logout, session termination, user
+    disable and role change invalidate them explicitly in the worker that made
+    the change; role, enable and username changes also bump the user's access
+    version, which drops that user's entries in every other worker.
+    """
+
+    def __init__(self, ttl_seconds: int = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.enabled = AUTH_CACHE_ENABLED
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._by_user: Dict[UUID, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def access_versions() -> Dict[str, int]:
+        """Read before verifying a token from the database, and passed to put()."""
+        return table_versions.versions()
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        if not self.enabled:
+            return None
+        key = self.token_key(token)
+        versions = self.access_versions()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if (entry.expires_at <= time.time()
+                    or entry.access_version != versions.get(access_version_key(entry.user_id), 0)):
+                self._remove(key)
+                return None
+            return entry
+
+    def put(self, token: str, user: User, session_id: str, token_exp: float, jti: Optional[str] = None,
+            access_versions: Optional[Dict[str, int]] = None):
+        if not self.enabled:
+            return
+        key = self.token_key(token)
+        entry = CachedPrincipal(
+            user, session_id, min(token_exp, time.time() + self.ttl_seconds), jti,
+            (access_versions or {}).get(access_version_key(user.id), 0)
+        )
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_user.setdefault(entry.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._remove(self.token_key(token))
+
+    def invalidate_user(self, user_id: UUID):
+        """Drop every cached token of a user (session end, disable, role change)."""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry.user_id]
+
+
+auth_cache = AuthCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_access_versions(session, flush_context):
+    created = [obj.id for obj in session.new if isinstance(obj, User)]
+    if created:
+        session.connection().execute(
+            insert(TableVersion), [{"table_name": access_version_key(user_id), "version": 0} for user_id in created]
+        )
+    changed = {obj.id for obj in session.deleted if isinstance(obj, User)} | {
+        obj.id for obj in session.dirty if isinstance(obj, User)
+        and any(inspect(obj).attrs[column].history.has_changes() for column in ACCESS_COLUMNS)
+    }
+    if changed:
+        bump_versions(session, {access_version_key(user_id) for user_id in changed})
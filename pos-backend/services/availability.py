@@ -0,0 +1,166 @@
+"""
+Product availability derived from stock: a product with a recipe is
+available while every raw material in it has stock for one more unit.
+
+The projection (ProductAvailability) is maintained incrementally. The ledger
+reports each balance it moves with note_balance_change(); at commit, only
+the products whose recipe needs an amount the balance moved across are
+recomputed, in the committing transaction, and the changes are pushed to
+terminals connected on /ws once the commit has succeeded.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from models.inventory import InventoryBalance
+from models.product import ProductAvailability, RecipeItem
+from utils.time_utils import current_time
+
+# Session.info keys: balances moved in the open transaction, and
+# availability changes waiting for it to commit
+STOCK_CHANGES = "availability_stock_changes"
+PENDING_CHANGES = "availability_pending_changes"
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityFeed:
+    """
+    Hands committed availability changes to the event loop serving /ws.
+    Commits happen on the loop thread and in worker threads alike, so the
+    broadcast is always scheduled thread-safely.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._broadcast: Optional[Callable[[str], Awaitable]] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop, broadcast: Callable[[str], Awaitable]):
+        self._loop = loop
+        self._broadcast = broadcast
+
+    def publish(self, changes: List[Tuple[UUID, bool]]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        message = json.dumps({
+            "type": "product_availability",
+            "changed_at": current_time().isoformat(),
+            "products": [
+                {"product_id": str(product_id), "is_available": is_available}
+                for product_id, is_available in changes
+            ],
+        })
+        loop.call_soon_threadsafe(loop.create_task, self._send(message))
+
+    async def _send(self, message: str):
+        try:
+            await self._broadcast(message)
+        except Exception:
+            logger.exception("Failed to push product availability")
+
+
+availability_feed = AvailabilityFeed()
+
+
+def note_balance_change(db: Session, inventory_id: UUID, before: float, after: float):
+    """Record a balance move in the open transaction; see _refresh_on_commit."""
+    changes = db.info.setdefault(STOCK_CHANGES, {})
+    first = changes.get(inventory_id)
+    changes[inventory_id] = (first[0] if first else before, after)
+
+
+def crossed_products(db: Session, changes: Dict[UUID, Tuple[float, float]]) -> Set[UUID]:
+    """
+    Products whose recipe needs an amount of one of the moved items that
+    lies between its balance before and after: only these can have become
+    available or unavailable.
+    """
+    rows = db.execute(
+        select(RecipeItem.product_id, RecipeItem.inventory_id, RecipeItem.quantity)
+        .where(RecipeItem.inventory_id.in_(changes))
+    )
+    return {
+        product_id for product_id, inventory_id, quantity in rows
+        if (changes[inventory_id][0] >= quantity) != (changes[inventory_id][1] >= quantity)
+    }
+
+
+def refresh_availability(conn, product_ids: Optional[Iterable[UUID]] = None) -> List[Tuple[UUID, bool]]:
+    """
+    Recompute the availability of `product_ids` (every product with a recipe
+    or a stored row when None), finding the short ones with a single join of
+    recipes to balances, and write the rows that changed. `conn` is a
+    Session or Connection. Returns the changes.
+    """
+    recipes = select(RecipeItem.product_id).distinct()
+    short = (
+        select(RecipeItem.product_id).distinct()
+        .outerjoin(InventoryBalance, InventoryBalance.inventory_id == RecipeItem.inventory_id)
+        .where(func.coalesce(InventoryBalance.balance, 0.0) < RecipeItem.quantity)
+    )
+    stored = select(ProductAvailability.product_id, ProductAvailability.is_available)
+    if product_ids is not None:
+        ids = set(product_ids)
+        if not ids:
+            return []
+        short = short.where(RecipeItem.product_id.in_(ids))
+        stored = stored.where(ProductAvailability.product_id.in_(ids))
+    unavailable = set(conn.execute(short).scalars())
+    current = dict(conn.execute(stored).all())
+    if product_ids is None:
+        ids = set(conn.execute(recipes).scalars()) | current.keys()
+
+    now = current_time()
+    inserts, updates = [], []
+    for product_id in ids:
+        is_available = product_id not in unavailable
+        if product_id not in current:
+            if not is_available:
+                inserts.append({"product_id": product_id, "is_available": False, "changed_at": now})
+        elif current[product_id] != is_available:
+            updates.append({"row_id": product_id, "is_available": is_available, "changed_at": now})
+    if inserts:
+        conn.execute(insert(ProductAvailability), inserts)
+    if updates:
+        table = ProductAvailability.__table__
+        conn.execute(table.update().where(table.c.product_id == bindparam("row_id")), updates)
+    return [(row["product_id"], False) for row in inserts] + [
+        (row["row_id"], row["is_available"]) for row in updates
+    ]
+
+
+def refresh_products(db: Session, product_ids: Iterable[UUID]):
+    """Recompute `product_ids` now, e.g. after a recipe change, and push the changes on commit."""
+    db.flush()
+    db.info.setdefault(PENDING_CHANGES, []).extend(refresh_availability(db, product_ids))
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_on_commit(session):
+    changes = session.info.pop(STOCK_CHANGES, None)
+    if not changes:
+        return
+    # Balances moved through the ORM are only written by this flush
+    session.flush()
+    products = crossed_products(session, changes)
+    if products:
+        session.info.setdefault(PENDING_CHANGES, []).extend(refresh_availability(session, products))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_on_commit(session):
+    changes = session.info.pop(PENDING_CHANGES, None)
+    if changes:
+        availability_feed.publish(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(STOCK_CHANGES, None)
+    session.info.pop(PENDING_CHANGES, None)
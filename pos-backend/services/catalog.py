@@ -0,0 +1,307 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from models.engine.database import get_db
+from models.offlineSync import ChangeLog, ChangeOperation, EntityType
+from models.product import Product, ProductAvailability, RecipeItem
+from models.inventory import RawMaterial
+from models.category import Category
+from models.schemas.catalog import CatalogCategory, CatalogProduct, CatalogResponse
+from models.schemas.product import ProductAvailabilityResponse, RecipeItemCreate, RecipeItemResponse, RecipeResponse
+from services.availability import refresh_products
+from services.sync import SyncService
+from utils.imageUpload import image_variants
+
+load_dotenv()
+
+# Above this many changed rows a delta costs more than the cached snapshot
+CATALOG_DELTA_MAX_CHANGES = int(os.getenv("CATALOG_DELTA_MAX_CHANGES", "500"))
+CATALOG_ENTITIES = (EntityType.CATEGORY, EntityType.PRODUCT)
+# Memory for thumbnail files kept to rebuild bundles without rereading them
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class CatalogSnapshotCache:
+    """Serialized and gzipped full catalog for the latest catalog version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Tuple[int, bytes, bytes]] = None
+
+    def get(self, version: int) -> Optional[Tuple[int, bytes, bytes]]:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot
+        return None
+
+    def put(self, version: int, raw: bytes) -> Tuple[int, bytes, bytes]:
+        snapshot = (version, raw, gzip.compress(raw, compresslevel=6))
+        with self._lock:
+            if self._snapshot is None or self._snapshot[0] <= version:
+                self._snapshot = snapshot
+        return snapshot
+
+
+snapshot_cache = CatalogSnapshotCache()
+
+
+class ThumbnailBundleCache:
+    """
+    Thumbnail bundles for the latest catalog version, plus an LRU of the
+    thumbnail files they were built from. A new catalog version rebuilds the
+    bundles, but only thumbnails not seen before are read from disk: upload
+    paths are content hashes, so a cached file never goes stale.
+    """
+
+    def __init__(self, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._bundles: Dict[tuple, bytes] = {}
+        self._files: "OrderedDict[str, bytes]" = OrderedDict()
+        self._file_bytes = 0
+
+    def get_bundle(self, version: int, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            return self._bundles.get(key) if self._version == version else None
+
+    def put_bundle(self, version: int, key: tuple, body: bytes) -> bytes:
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._bundles = {}
+            if version == self._version:
+                self._bundles[key] = body
+        return body
+
+    def read_file(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._files.get(path)
+            if data is not None:
+                self._files.move_to_end(path)
+                return data
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        with self._lock:
+            if path not in self._files:
+                self._files[path] = data
+                self._file_bytes += len(data)
+            while self._file_bytes > self.max_bytes and len(self._files) > 1:
+                _, evicted = self._files.popitem(last=False)
+                self._file_bytes -= len(evicted)
+        return data
+
+
+thumbnail_cache = ThumbnailBundleCache()
+
+
+class CatalogService:
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def current_version(self) -> int:
+        """
+        Version of the last committed product/category change.
+
+        Only changes below the sync watermark count, so a client that has seen
+        this version cannot later miss a change with a lower one.
+        """
+        watermark = SyncService(self.db).current_watermark()
+        return self.db.query(func.max(ChangeLog.version)).filter(
+            ChangeLog.entity_type.in_(CATALOG_ENTITIES),
+            ChangeLog.version <= watermark
+        ).scalar() or 0
+
+    def get_delta(self, since_version: int, version: int) -> Optional[CatalogResponse]:
+        """Rows changed after since_version, or None when a full snapshot should be sent."""
+        if since_version == version:
+            return CatalogResponse(version=version, full=False)
+        if since_version == 0 or since_version > version:
+            return None
+
+        rows = (
+            self.db.query(ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.operation)
+            .filter(
+                ChangeLog.entity_type.in_(CATALOG_ENTITIES),
+                ChangeLog.version > since_version,
+                ChangeLog.version <= version
+            )
+            .order_by(ChangeLog.version)
+            .limit(CATALOG_DELTA_MAX_CHANGES + 1)
+            .all()
+        )
+        if len(rows) > CATALOG_DELTA_MAX_CHANGES:
+            return None
+
+        latest = {}
+        for entity_type, entity_id, operation in rows:
+            latest.pop((entity_type, entity_id), None)
+            latest[(entity_type, entity_id)] = operation
+
+        changed = {entity_type: [] for entity_type in CATALOG_ENTITIES}
+        deleted = {}
+        for (entity_type, entity_id), operation in latest.items():
+            if operation == ChangeOperation.DELETE:
+                deleted.setdefault(entity_type.value, []).append(entity_id)
+            else:
+                changed[entity_type].append(UUID(entity_id))
+
+        categories = self.db.query(Category).filter(
+            Category.id.in_(changed[EntityType.CATEGORY])
+        ).all() if changed[EntityType.CATEGORY] else []
+        products = self.db.query(Product).filter(
+            Product.id.in_(changed[EntityType.PRODUCT])
+        ).all() if changed[EntityType.PRODUCT] else []
+
+        return CatalogResponse(
+            version=version,
+            full=False,
+            categories=[CatalogCategory.model_validate(c) for c in categories],
+            products=[CatalogProduct.model_validate(p) for p in products],
+            deleted=deleted,
+        )
+
+    def list_products(self, category_id: Optional[UUID] = None, enabled_only: bool = False) -> List[Product]:
+        """
+        Products with their category loaded in the same query, so serializing
+        ProductResponse.category does not lazy-load one category per product.
+        """
+        query = self.db.query(Product).options(joinedload(Product.category, innerjoin=True))
+        if category_id is not None:
+            query = query.filter(Product.category_id == category_id)
+        if enabled_only:
+            query = query.filter(Product.is_enabled == True)
+        return query.all()
+
+    def get_product(self, product_id: UUID) -> Optional[Product]:
+        return (
+            self.db.query(Product)
+            .options(joinedload(Product.category, innerjoin=True))
+            .filter(Product.id == product_id)
+            .first()
+        )
+
+    def get_recipe(self, product_id: UUID) -> RecipeResponse:
+        if self.db.get(Product, product_id) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        rows = (
+            self.db.query(RecipeItem.inventory_id, RawMaterial.name, RecipeItem.quantity, RawMaterial.quantity_unit)
+            .join(RawMaterial, RawMaterial.id == RecipeItem.inventory_id)
+            .filter(RecipeItem.product_id == product_id)
+            .order_by(RawMaterial.name)
+            .all()
+        )
+        return RecipeResponse(product_id=product_id, items=[
+            RecipeItemResponse(inventory_id=inventory_id, name=name, quantity=quantity, quantity_unit=unit)
+            for inventory_id, name, quantity, unit in rows
+        ])
+
+    def set_recipe(self, product_id: UUID, items: List[RecipeItemCreate]) -> RecipeResponse:
+        """
+        Replace the raw materials one unit of the product uses. Sales already
+        queued for depletion are depleted by the recipe in force when the
+        queue is drained.
+        """
+        product = self.db.get(Product, product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        quantities: Dict[UUID, float] = {}
+        for item in items:
+            quantities[item.inventory_id] = quantities.get(item.inventory_id, 0.0) + item.quantity
+        known = {
+            inventory_id for (inventory_id,) in
+            self.db.query(RawMaterial.id).filter(RawMaterial.id.in_(quantities))
+        } if quantities else set()
+        unknown = set(quantities) - known
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not raw materials: {', '.join(sorted(str(inventory_id) for inventory_id in unknown))}"
+            )
+        product.recipe_items = [
+            RecipeItem(inventory_id=inventory_id, quantity=quantity)
+            for inventory_id, quantity in quantities.items()
+        ]
+        refresh_products(self.db, [product_id])
+        self.db.commit()
+        return self.get_recipe(product_id)
+
+    def list_availability(self) -> List[ProductAvailabilityResponse]:
+        """
+        Stored availability of products with recipes, for a terminal to load
+        once on connecting; later changes are pushed over /ws.
+        """
+        return [
+            ProductAvailabilityResponse.model_validate(row)
+            for row in self.db.query(ProductAvailability).order_by(ProductAvailability.product_id)
+        ]
+
+    def get_thumbnail_bundle(self, version: int, category_id: Optional[UUID] = None, webp: bool = False) -> bytes:
+        """
+        Thumbnails of the enabled products (of one category, or of every enabled
+        category) packed into one body: a one-line JSON index, a newline, then
+        the image bytes back to back. The index maps product id to
+        [offset, length, media type], offsets counted from the end of the index line.
+        """
+        key = (category_id, webp)
+        body = thumbnail_cache.get_bundle(version, key)
+        if body is not None:
+            return body
+
+        query = (
+            self.db.query(Product.id, Product.image)
+            .join(Category, Category.id == Product.category_id)
+            .filter(Product.is_enabled == True, Category.is_enabled == True, Product.image.isnot(None))
+        )
+        if category_id is not None:
+            query = query.filter(Product.category_id == category_id)
+
+        items, chunks, offset = {}, [], 0
+        for product_id, image in query.order_by(Product.name).all():
+            data, media_type = None, "image/png"
+            if webp:
+                # Older uploads, and ones still rendering, only have the PNG
+                data = thumbnail_cache.read_file(image_variants(image)["thumb.webp"])
+                media_type = "image/webp"
+            if data is None:
+                data, media_type = thumbnail_cache.read_file(image), "image/png"
+            if data is None:
+                continue
+            items[str(product_id)] = [offset, len(data), media_type]
+            chunks.append(data)
+            offset += len(data)
+
+        index = json.dumps({"version": version, "items": items}, separators=(",", ":")).encode()
+        return thumbnail_cache.put_bundle(version, key, index + b"\n" + b"".join(chunks))
+
+    def get_snapshot(self, version: int) -> Tuple[int, bytes, bytes]:
+        """(version, json, gzipped json) of the whole catalog, built once per version."""
+        snapshot = snapshot_cache.get(version)
+        if snapshot is not None:
+            return snapshot
+        response = CatalogResponse(
+            version=version,
+            full=True,
+            categories=[
+                CatalogCategory.model_validate(c)
+                for c in self.db.query(Category).order_by(Category.name).all()
+            ],
+            products=[
+                CatalogProduct.model_validate(p)
+                for p in self.db.query(Product).order_by(Product.name).all()
+            ],
+        )
+        return snapshot_cache.put(version, response.model_dump_json().encode())
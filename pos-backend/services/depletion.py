@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from typing import Dict
+from uuid import UUID
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from models.engine.database import SessionLocal
+from models.product import RecipeItem
+from models.sale import StockDepletion
+from services.inventory import InventoryService
+
+load_dotenv()
+
+DEPLETION_INTERVAL_SECONDS = int(os.getenv("DEPLETION_INTERVAL_SECONDS", "30"))
+# Queued sale items taken per batch; each batch is one database transaction
+DEPLETION_BATCH_SIZE = int(os.getenv("DEPLETION_BATCH_SIZE", "5000"))
+
+logger = logging.getLogger(__name__)
+
+
+def deplete_batch(db: Session, batch_size: int = DEPLETION_BATCH_SIZE) -> Dict:
+    """
+    Take up to `batch_size` queued sale items off their recipes' raw
+    materials: consumption is summed per seller and item over the whole batch
+    and posted as one ISSUE (or RETURN) each, and the queue rows are deleted
+    in the same transaction. Returns counts for the batch.
+    """
+    queued = db.execute(
+        select(StockDepletion.id, StockDepletion.user_id, StockDepletion.product_id, StockDepletion.quantity)
+        .order_by(StockDepletion.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not queued:
+        db.rollback()
+        return {"sale_items": 0, "applied": 0, "failed": 0, "shortfall": {}}
+
+    recipes: Dict[UUID, list] = {}
+    for product_id, inventory_id, quantity in db.execute(
+        select(RecipeItem.product_id, RecipeItem.inventory_id, RecipeItem.quantity)
+        .where(RecipeItem.product_id.in_({row.product_id for row in queued}))
+    ):
+        recipes.setdefault(product_id, []).append((inventory_id, quantity))
+
+    consumption: Dict[UUID, Dict[UUID, float]] = {}
+    for row in queued:
+        used = consumption.setdefault(row.user_id, {})
+        for inventory_id, quantity in recipes.get(row.product_id, ()):
+            used[inventory_id] = used.get(inventory_id, 0.0) + row.quantity * quantity
+
+    try:
+        result = InventoryService(db).deplete_stock(
+            consumption, notes=f"Recipe depletion for {len(queued)} sold items"
+        )
+        db.execute(delete(StockDepletion).where(StockDepletion.id.in_([row.id for row in queued])))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"sale_items": len(queued), **result}
+
+
+def drain_depletion_queue(db: Session, batch_size: int = DEPLETION_BATCH_SIZE) -> Dict:
+    """Run batches until the queue is empty. Returns the totals."""
+    totals = {"sale_items": 0, "applied": 0, "failed": 0, "shortfall": {}}
+    while True:
+        result = deplete_batch(db, batch_size)
+        for key in ("sale_items", "applied", "failed"):
+            totals[key] += result[key]
+        for inventory_id, quantity in result["shortfall"].items():
+            totals["shortfall"][inventory_id] = totals["shortfall"].get(inventory_id, 0.0) + quantity
+        if result["sale_items"] < batch_size:
+            return totals
+
+
+async def depletion_loop(interval: int = DEPLETION_INTERVAL_SECONDS):
+    """Background task started from the app lifespan."""
+    while True:
+        db = SessionLocal()
+        try:
+            result = await asyncio.to_thread(drain_depletion_queue, db)
+            if result["sale_items"]:
+                logger.info(
+                    "Depleted stock for %s sold items: %s transactions posted, %s failed",
+                    result["sale_items"], result["applied"], result["failed"]
+                )
+            if result["shortfall"]:
+                logger.warning(
+                    "Sales used more stock than recorded for %s raw materials: %s",
+                    len(result["shortfall"]),
+                    {str(inventory_id): round(quantity, 6) for inventory_id, quantity in result["shortfall"].items()}
+                )
+        except Exception:
+            logger.exception("Stock depletion failed")
+        finally:
+            db.close()
+        await asyncio.sleep(interval)
@@ -1,8 +1,8 @@
-from typing import Optional, List, Dict, Tuple, Union
-from uuid import UUID
+from typing import Optional, List, Dict, Iterable, Tuple, Union
+from uuid import UUID, uuid4
 from datetime import date, datetime
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, aliased, with_polymorphic
+from sqlalchemy import and_, bindparam, func, select
 from utils.time_utils import current_time
 
 from models.inventory import (
@@ -14,7 +14,11 @@ from models.inventory import (
     Equipment, 
     InventoryTransaction, 
     TransactionType,
-    Department
+    Department,
+    InventoryBalance,
+    StockCount,
+    StockCountLine,
+    StockCountStatus
 )
 from models.supplier import Supplier
 from models.user import User
@@ -23,13 +27,24 @@ from models.schemas.inventory import (
     EquipmentCreate, 
     RawMaterialUpdate, 
     EquipmentUpdate,
-    TransactionCreate
+    TransactionCreate,
+    BulkTransactionResult,
+    BulkTransactionResponse,
+    StockCountCreate,
+    StockCountEntry,
+    StockCountRejection,
+    StockCountUploadResult,
+    StockCountVariance,
+    StockCountResponse
 )
+from services.inventoryLedger import InventoryLedger, ledger_delta
+from services.search import SearchService
 from fastapi import HTTPException, status
 
 class InventoryService:
     def __init__(self, db: Session):
         self.db = db
+        self.ledger = InventoryLedger(db)
 
     def _validate_supplier(self, supplier_id: Optional[UUID]) -> None:
         """Validate if the supplier exists"""
@@ -75,10 +90,11 @@ class InventoryService:
             created_at=datetime.now(), 
             updated_at=datetime.now()
         )
+        if isinstance(inventory, EquipmentCreate) and inventory.available_units is None:
+            db_inventory.available_units = inventory.total_units
         
         self.db.add(db_inventory)
-        self.db.commit()
-        self.db.refresh(db_inventory)
+        self.db.flush()
         
         # Create automatic restock transaction
         initial_quantity = (
@@ -87,6 +103,8 @@ class InventoryService:
             else 0
         )
         
+        # The item's ledger starts empty; the initial stock is its first entry
+        self.ledger.balance_row(db_inventory.id)
         if initial_quantity > 0:
             # Create restock transaction
             transaction = InventoryTransaction(
@@ -94,13 +112,15 @@ class InventoryService:
                 transaction_type=TransactionType.RESTOCK,
                 quantity=initial_quantity,
                 created_by_id=current_user.id,
-                created_by=f'{current_user.first_name} {current_user.last_name}',
                 notes="Initial inventory creation",
                 is_system_generated=True
             )
             
             self.db.add(transaction)
-            self.db.commit()
+            self.ledger.post(transaction)
+
+        self.db.commit()
+        self.db.refresh(db_inventory)
         
         return db_inventory
         
@@ -126,8 +146,8 @@ class InventoryService:
         if 'name' in update_data:
             self._check_unique_inventory_name(update_data['name'], inventory_id)
         
-        # Track old quantity for transaction
-        old_quantity = db_inventory.quantity
+        # A new quantity goes through the ledger as a transaction
+        new_quantity = update_data.pop('quantity', None)
         
         # Update inventory
         for key, value in update_data.items():
@@ -136,18 +156,11 @@ class InventoryService:
         db_inventory.updated_at = datetime.now()
         
         self.db.add(db_inventory)
+        if new_quantity is not None:
+            self._create_quantity_transaction(db_inventory, new_quantity, current_user)
         self.db.commit()
         self.db.refresh(db_inventory)
         
-        # Create transaction if quantity changed
-        if 'quantity' in update_data and update_data['quantity'] != old_quantity:
-            self._create_quantity_transaction(
-                db_inventory, 
-                old_quantity, 
-                update_data['quantity'], 
-                current_user
-            )
-        
         return db_inventory
 
     def update_equipment(self, equipment_id: UUID, equipment_update: EquipmentUpdate, current_user: User) -> Equipment:
@@ -166,8 +179,8 @@ class InventoryService:
         if 'name' in update_data:
             self._check_unique_inventory_name(update_data['name'], equipment_id)
         
-        # Track old available units for transaction
-        old_available_units = db_equipment.available_units
+        # New available units go through the ledger as a transaction
+        new_available_units = update_data.pop('available_units', None)
         
         # Update equipment
         for key, value in update_data.items():
@@ -176,23 +189,22 @@ class InventoryService:
         db_equipment.updated_at = datetime.now()
         
         self.db.add(db_equipment)
+        if new_available_units is not None:
+            self._create_quantity_transaction(db_equipment, new_available_units, current_user)
         self.db.commit()
         self.db.refresh(db_equipment)
         
-        # Create transaction if available units changed
-        if 'available_units' in update_data and update_data['available_units'] != old_available_units:
-            self._create_quantity_transaction(
-                db_equipment, 
-                old_available_units, 
-                update_data['available_units'], 
-                current_user
-            )
-        
         return db_equipment
 
-    def _create_quantity_transaction(self, inventory, old_quantity, new_quantity, current_user):
-        """Create a transaction when quantity is updated"""
+    def _create_quantity_transaction(self, inventory, new_quantity, current_user):
+        """Record a directly set stock level as the transaction that gets there"""
+        # A zero move locks the balance and reads it, so the change is
+        # computed from the stock as it is now, not as it was when loaded
+        old_quantity, _ = self.ledger.move(inventory.id, 0)
         quantity_change = new_quantity - old_quantity
+        inventory.set_stock_level(new_quantity)
+        if quantity_change == 0:
+            return
         transaction_type = (
             TransactionType.RESTOCK if quantity_change > 0 
             else TransactionType.ISSUE
@@ -202,11 +214,14 @@ class InventoryService:
             inventory_id=inventory.id,
             transaction_type=transaction_type,
             quantity=abs(quantity_change),
-            upated_by_id=current_user.id,
+            previous_quantity=old_quantity,
+            resulting_quantity=new_quantity,
+            created_by_id=current_user.id,
+            updated_by_id=current_user.id,
             notes=f"Quantity updated from {old_quantity} to {new_quantity}"
         )
         self.db.add(transaction)
-        self.db.commit()
+        self.ledger.post(transaction)
 
     def get_raw_materials(
         self, 
@@ -226,7 +241,7 @@ class InventoryService:
         
         filters = []
         if name:
-            filters.append(RawMaterial.name.ilike(f"%{name}%"))
+            filters.append(RawMaterial.id.in_(SearchService(self.db).matching_ids("inventory", name, title_only=True)))
         if status:
             filters.append(RawMaterial.status == status)
         if quantity_unit:
@@ -264,7 +279,7 @@ class InventoryService:
         
         filters = []
         if name:
-            filters.append(Equipment.name.ilike(f"%{name}%"))
+            filters.append(Equipment.id.in_(SearchService(self.db).matching_ids("inventory", name, title_only=True)))
         if status:
             filters.append(Equipment.status == status)
         if supplier_id:
@@ -330,63 +345,215 @@ class InventoryService:
         if transaction.quantity <= 0:
             raise HTTPException(status_code=400, detail="Transaction quantity must be positive")
         
-        # Store previous status and quantity
-        previous_status = inventory.status
-        previous_quantity = inventory.quantity
-        
-        # Process transaction based on type
-        try:
-            if transaction.transaction_type == TransactionType.ISSUE:
-                self._process_issue_transaction(inventory, transaction)
-                resulting_quantity = previous_quantity - transaction.quantity
-            elif transaction.transaction_type == TransactionType.RESTOCK:
-                self._process_restock_transaction(inventory, transaction)
-                resulting_quantity = previous_quantity + transaction.quantity
-            elif transaction.transaction_type == TransactionType.RETURN:
-                self._process_return_transaction(inventory, transaction)
-                resulting_quantity = previous_quantity + transaction.quantity
-            elif transaction.transaction_type == TransactionType.WRITE_OFF:
-                self._process_write_off_transaction(inventory, transaction)
-                resulting_quantity = previous_quantity - transaction.quantity
-            elif transaction.transaction_type == TransactionType.DAMAGE:
-                self._process_damage_transaction(inventory, transaction)
-                resulting_quantity = previous_quantity - transaction.quantity
-            else:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Unsupported transaction type: {transaction.transaction_type}"
-                )
-        except HTTPException as e:
-            raise e
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        handlers = self._transaction_handlers()
+        if transaction.transaction_type not in handlers:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Unsupported transaction type: {transaction.transaction_type}"
+            )
         
-        # Create transaction record with missing values
         db_transaction = InventoryTransaction(
             inventory_id=transaction.inventory_id,
             transaction_type=transaction.transaction_type,
             quantity=transaction.quantity,
-            previous_status=previous_status,
-            previous_quantity=previous_quantity,
-            resulting_quantity=resulting_quantity,
             updated_by_id=current_user.id,
             created_by_id=current_user.id, 
             notes=transaction.notes,
             department_id=transaction.department_id,
         )
         
-        # Update and commit
         try:
-            self.db.add(inventory)
+            # Moving the balance locks it until commit, so the item is re-read
+            # only after: every other writer to it is now queued behind us.
             self.db.add(db_transaction)
+            resulting_quantity, _ = self.ledger.post(db_transaction)
+            self.db.refresh(inventory)
+
+            previous_status = inventory.status
+            handlers[transaction.transaction_type](inventory, transaction)
+            inventory.set_stock_level(resulting_quantity)
+
+            db_transaction.previous_status = previous_status
+            db_transaction.previous_quantity = (
+                resulting_quantity - ledger_delta(transaction.transaction_type, transaction.quantity)
+            )
+            db_transaction.resulting_quantity = resulting_quantity
             self.db.commit()
             self.db.refresh(db_transaction)
+        except HTTPException:
+            self.db.rollback()
+            raise
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"Failed to process transaction {str(e)}")
         
         return db_transaction
 
+    def process_bulk_transactions(
+        self,
+        transactions: List[TransactionCreate],
+        current_user: User
+    ) -> BulkTransactionResponse:
+        """
+        Apply many transactions in order within one database transaction, e.g.
+        a stock-take or a large delivery. A line that fails validation is
+        reported and skipped; the others are committed together.
+
+        The balances of all target items are locked and loaded up front and
+        the items read in one query, so each line costs no queries of its
+        own; the ledger entries are then written with one multi-row INSERT.
+        """
+        entries, results = self._apply_transactions(transactions, current_user.id)
+        try:
+            self.ledger.append(entries)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=500, detail=f"Failed to process transactions {str(e)}")
+
+        return BulkTransactionResponse(
+            applied=len(entries), failed=len(results) - len(entries), results=results
+        )
+
+    def _apply_transactions(
+        self,
+        transactions: List[TransactionCreate],
+        created_by_id: UUID,
+        is_system_generated: bool = False,
+        locked: Optional[Tuple[Dict, Dict]] = None
+    ) -> Tuple[List[Dict], List[BulkTransactionResult]]:
+        """
+        The work of process_bulk_transactions short of writing the ledger
+        entries: returns them, for ledger.append(), and a result per line.
+        `locked` is the (balances, items) of _lock_items() when the caller
+        applies several batches in one transaction; they must be reused, as
+        locking again reloads the rows over the earlier batches' changes.
+        """
+        handlers = self._transaction_handlers()
+        balances, items = locked or self._lock_items(line.inventory_id for line in transactions)
+        department_ids = {line.department_id for line in transactions if line.department_id}
+        departments = {
+            department_id for (department_id,) in
+            self.db.query(Department.id).filter(Department.id.in_(department_ids))
+        } if department_ids else set()
+
+        entries, results = [], []
+        for index, line in enumerate(transactions):
+            item = items.get(line.inventory_id)
+            try:
+                if item is None:
+                    raise HTTPException(status_code=404, detail="Inventory not found")
+                if line.transaction_type not in handlers:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Unsupported transaction type: {line.transaction_type}"
+                    )
+                if line.department_id and line.department_id not in departments:
+                    raise HTTPException(status_code=404, detail="Department not found")
+                balance = balances.get(item.id)
+                if balance is None:
+                    balance = balances[item.id] = self.ledger.balance_row(item.id)
+                self.ledger.check(balance, line.transaction_type, line.quantity)
+                previous_status = item.status
+                handlers[line.transaction_type](item, line)
+            except HTTPException as e:
+                results.append(BulkTransactionResult(
+                    index=index, inventory_id=line.inventory_id, status="error", detail=e.detail
+                ))
+                continue
+
+            resulting_quantity, ledger_seq = self.ledger.apply(balance, line.transaction_type, line.quantity)
+            item.set_stock_level(resulting_quantity)
+            entry = {
+                "id": uuid4(),
+                "inventory_id": item.id,
+                "transaction_type": line.transaction_type,
+                "quantity": line.quantity,
+                "previous_status": previous_status,
+                "previous_quantity": resulting_quantity - ledger_delta(line.transaction_type, line.quantity),
+                "resulting_quantity": resulting_quantity,
+                "ledger_seq": ledger_seq,
+                "created_by_id": created_by_id,
+                "updated_by_id": created_by_id,
+                "notes": line.notes,
+                "department_id": line.department_id,
+                "is_system_generated": is_system_generated,
+            }
+            entries.append(entry)
+            results.append(BulkTransactionResult(
+                index=index, inventory_id=item.id, status="applied",
+                transaction_id=entry["id"], resulting_quantity=resulting_quantity
+            ))
+
+        return entries, results
+
+    def _lock_items(self, inventory_ids: Iterable[UUID]) -> Tuple[Dict[UUID, InventoryBalance], Dict[UUID, Inventory]]:
+        """Lock the balances of `inventory_ids` and load the items, fresh from the database."""
+        inventory_ids = set(inventory_ids)
+        balances = self.ledger.lock(inventory_ids)
+        items = {
+            item.id: item for item in
+            self.db.query(with_polymorphic(Inventory, "*"))
+            .filter(Inventory.id.in_(inventory_ids))
+            .populate_existing()
+        }
+        return balances, items
+
+    def deplete_stock(self, consumption: Dict[UUID, Dict[UUID, float]], notes: str) -> Dict:
+        """
+        Issue the raw materials consumed by sales, `consumption` being the
+        quantity of each item used by each seller (negative where sales were
+        reduced, which is booked as a RETURN). Quantities are capped at what
+        the ledger can cover: stock sold beyond the balance is reported as a
+        shortfall rather than refused. Does not commit.
+        """
+        # Locked and loaded once: every seller's entries move the same rows
+        locked = self._lock_items(inventory_id for used in consumption.values() for inventory_id in used)
+        balances = locked[0]
+        available = {inventory_id: row.balance for inventory_id, row in balances.items()}
+        returnable = {inventory_id: row.issued - row.returned for inventory_id, row in balances.items()}
+        shortfall: Dict[UUID, float] = {}
+        entries, failed = [], 0
+        for created_by_id, used in consumption.items():
+            lines = []
+            # Returns before issues, so stock given back can cover them
+            for inventory_id, quantity in sorted(used.items(), key=lambda item: item[1]):
+                if quantity < 0:
+                    quantity = min(-quantity, returnable.get(inventory_id, 0.0))
+                    transaction_type = TransactionType.RETURN
+                    available[inventory_id] = available.get(inventory_id, 0.0) + quantity
+                    returnable[inventory_id] = returnable.get(inventory_id, 0.0) - quantity
+                else:
+                    covered = min(quantity, available.get(inventory_id, 0.0))
+                    if quantity - covered > 1e-9:
+                        shortfall[inventory_id] = shortfall.get(inventory_id, 0.0) + quantity - covered
+                    quantity, transaction_type = covered, TransactionType.ISSUE
+                    available[inventory_id] = available.get(inventory_id, 0.0) - quantity
+                    returnable[inventory_id] = returnable.get(inventory_id, 0.0) + quantity
+                if quantity > 1e-9:
+                    lines.append(TransactionCreate(
+                        inventory_id=inventory_id, transaction_type=transaction_type,
+                        quantity=quantity, notes=notes
+                    ))
+            if not lines:
+                continue
+            written, results = self._apply_transactions(
+                lines, created_by_id, is_system_generated=True, locked=locked
+            )
+            entries += written
+            failed += len(results) - len(written)
+        self.ledger.append(entries)
+        return {"applied": len(entries), "failed": failed, "shortfall": shortfall}
+
+    def _transaction_handlers(self) -> Dict:
+        return {
+            TransactionType.ISSUE: self._process_issue_transaction,
+            TransactionType.RESTOCK: self._process_restock_transaction,
+            TransactionType.RETURN: self._process_return_transaction,
+            TransactionType.WRITE_OFF: self._process_write_off_transaction,
+            TransactionType.DAMAGE: self._process_damage_transaction,
+        }
+
     def _process_issue_transaction(self, inventory, transaction):
         """Process an issue transaction"""
         if isinstance(inventory, RawMaterial):
@@ -398,7 +565,7 @@ class InventoryService:
             inventory.quantity -= transaction.quantity
             if inventory.quantity <= 0:
                 inventory.status = InventoryStatus.DEPLETED
-            elif inventory.quantity <= inventory.critical_threshold:
+            elif inventory.is_critically_low(inventory.quantity):
                 inventory.status = InventoryStatus.LOW_STOCK
         
         elif isinstance(inventory, Equipment):
@@ -421,7 +588,7 @@ class InventoryService:
             inventory.status = InventoryStatus.IN_STOCK
             
             # Optionally, check if the quantity is now above low stock threshold
-            if inventory.quantity > inventory.critical_threshold:
+            if not inventory.is_critically_low(inventory.quantity):
                 inventory.status = InventoryStatus.IN_STOCK
         
         elif isinstance(inventory, Equipment):
@@ -435,19 +602,10 @@ class InventoryService:
 
     def _process_return_transaction(self, inventory, transaction):
         """
-        Process a return transaction for both raw materials and equipment
-        Ensures returns do not exceed issued quantities
+        Process a return transaction for both raw materials and equipment.
+        That returns do not exceed issued quantities is enforced by the
+        ledger, against the item's issued and returned counters.
         """
-        # Calculate total issued and returned quantities
-        issued_quantity = self._get_net_issued_quantity(inventory)
-        
-        # Validate return quantity
-        if transaction.quantity > issued_quantity:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Cannot return more than what was issued. Maximum returnable quantity is {issued_quantity}."
-            )
-        
         if isinstance(inventory, RawMaterial):
             # For raw materials, simply add back to quantity
             inventory.quantity += transaction.quantity
@@ -521,26 +679,260 @@ class InventoryService:
             inventory.available_units -= int(transaction.quantity)
             inventory.status = InventoryStatus.DAMAGED
 
-    def _get_net_issued_quantity(self, inventory):
+    def get_balance(self, inventory_id: UUID, verify: bool = False, full: bool = False) -> Dict:
         """
-        Calculate the net issued quantity for an inventory item
-        
-        Calculates total issued quantity minus total returned quantity
+        Current stock of an item from its running ledger balance. With `verify`,
+        the balance is also checked against the ledger from the latest
+        checkpoint on, or against the whole ledger with `full`.
         """
-        # Query issued transactions
-        issued_quantity = self.db.query(func.sum(InventoryTransaction.quantity)).filter(
-            InventoryTransaction.inventory_id == inventory.id,
-            InventoryTransaction.transaction_type == TransactionType.ISSUE
-        ).scalar() or 0
-        
-        # Query returned transactions
-        returned_quantity = self.db.query(func.sum(InventoryTransaction.quantity)).filter(
-            InventoryTransaction.inventory_id == inventory.id,
-            InventoryTransaction.transaction_type == TransactionType.RETURN
-        ).scalar() or 0
-        
-        # Calculate net issued quantity
-        return issued_quantity - returned_quantity
+        inventory = self.db.query(Inventory).get(inventory_id)
+        if not inventory:
+            raise HTTPException(status_code=404, detail="Inventory not found")
+        result = {
+            "inventory_id": inventory.id,
+            "balance": inventory.current_balance(),
+            "ledger_seq": inventory.ledger_length(),
+            "totals": inventory.ledger_totals(),
+            "status": inventory.status,
+        }
+        if verify or full:
+            result["verification"] = self.ledger.verify(inventory_id, full=full)
+        return result
+
+    def create_stock_count(self, stock_count: StockCountCreate, current_user: User) -> StockCountResponse:
+        """Open a cycle-count session to upload physical counts into"""
+        db_count = StockCount(name=stock_count.name, notes=stock_count.notes, created_by_id=current_user.id)
+        self.db.add(db_count)
+        self.db.commit()
+        self.db.refresh(db_count)
+        return self._stock_count_response(db_count, [])
+
+    def record_stock_counts(self, count_id: UUID, entries: List[StockCountEntry]) -> StockCountUploadResult:
+        """
+        Store counted quantities in an open count. Counting an item again
+        replaces its earlier count; the last entry for an item in one upload wins.
+        """
+        self._get_open_stock_count(count_id)
+        counted = {entry.inventory_id: entry.counted_quantity for entry in entries}
+        inventory_types = dict(
+            self.db.query(Inventory.id, Inventory.inventory_type).filter(Inventory.id.in_(counted))
+        )
+
+        rows, rejected = [], []
+        now = current_time()
+        for inventory_id, quantity in counted.items():
+            inventory_type = inventory_types.get(inventory_id)
+            if inventory_type is None:
+                rejected.append(StockCountRejection(inventory_id=inventory_id, detail="Inventory not found"))
+            elif inventory_type == InventoryType.EQUIPMENT and not float(quantity).is_integer():
+                rejected.append(StockCountRejection(inventory_id=inventory_id, detail="Equipment is counted in whole units"))
+            else:
+                rows.append({
+                    "stock_count_id": count_id,
+                    "inventory_id": inventory_id,
+                    "counted_quantity": quantity,
+                    "counted_at": now,
+                })
+
+        if rows:
+            self.db.query(StockCountLine).filter(
+                StockCountLine.stock_count_id == count_id,
+                StockCountLine.inventory_id.in_([row["inventory_id"] for row in rows])
+            ).delete(synchronize_session=False)
+            self.db.execute(StockCountLine.__table__.insert(), rows)
+        self.db.commit()
+        return StockCountUploadResult(recorded=len(rows), rejected=rejected)
+
+    def get_stock_count(self, count_id: UUID) -> StockCountResponse:
+        """
+        A count with its variances: against the current ledger balances while
+        it is open, as booked once it has been posted.
+        """
+        db_count = self.db.query(StockCount).get(count_id)
+        if not db_count:
+            raise HTTPException(status_code=404, detail="Stock count not found")
+        if db_count.status == StockCountStatus.POSTED:
+            rows = self.db.execute(
+                select(
+                    StockCountLine.inventory_id,
+                    Inventory.name,
+                    StockCountLine.counted_quantity,
+                    StockCountLine.system_quantity.label("balance"),
+                    StockCountLine.transaction_id,
+                )
+                .join(Inventory, Inventory.id == StockCountLine.inventory_id)
+                .where(StockCountLine.stock_count_id == count_id)
+            ).all()
+        else:
+            rows = self.db.execute(self._stock_count_query(count_id)).all()
+        return self._stock_count_response(db_count, rows)
+
+    def post_stock_count(self, count_id: UUID, current_user: User) -> StockCountResponse:
+        """
+        Book an open count. The counted lines are compared with their ledger
+        balances in one query, under lock, and every difference is posted as
+        a RESTOCK or WRITE_OFF in one batch; items, balances and count lines
+        are then updated with one statement per table.
+        """
+        db_count = self._get_open_stock_count(count_id, lock=True)
+        rows = self.db.execute(
+            self._stock_count_query(count_id).with_for_update(of=InventoryBalance)
+        ).all()
+
+        try:
+            entries = self.ledger.adjust_to(rows, current_user.id, f"Stock count: {db_count.name}")
+
+            raw_materials, equipment, statuses, lines = [], [], [], []
+            for row in rows:
+                entry = entries.get(row.inventory_id)
+                lines.append({
+                    "row_id": row.inventory_id,
+                    "system_quantity": row.balance,
+                    "variance": row.target - row.balance,
+                    "transaction_id": entry["id"] if entry else None,
+                })
+                if entry is None:
+                    continue
+                if row.inventory_type == InventoryType.EQUIPMENT:
+                    equipment.append({
+                        "row_id": row.inventory_id,
+                        "level": int(row.target),
+                        "added": int(max(row.target - row.balance, 0)),
+                    })
+                else:
+                    raw_materials.append({"row_id": row.inventory_id, "level": row.target})
+                new_status = self._counted_status(row)
+                if new_status != row.status:
+                    statuses.append({"row_id": row.inventory_id, "status": new_status})
+
+            raw_table, equipment_table = RawMaterial.__table__, Equipment.__table__
+            inventory_table = Inventory.__table__
+            if raw_materials:
+                self.db.execute(
+                    raw_table.update()
+                    .where(raw_table.c.id == bindparam("row_id"))
+                    .values(quantity=bindparam("level")),
+                    raw_materials
+                )
+            if equipment:
+                self.db.execute(
+                    equipment_table.update()
+                    .where(equipment_table.c.id == bindparam("row_id"))
+                    .values(
+                        available_units=bindparam("level"),
+                        total_units=equipment_table.c.total_units + bindparam("added"),
+                    ),
+                    equipment
+                )
+            if statuses:
+                self.db.execute(
+                    inventory_table.update()
+                    .where(inventory_table.c.id == bindparam("row_id"))
+                    .values(status=bindparam("status"), updated_at=current_time()),
+                    statuses
+                )
+            if lines:
+                line_table = StockCountLine.__table__
+                self.db.execute(
+                    line_table.update().where(
+                        line_table.c.stock_count_id == count_id,
+                        line_table.c.inventory_id == bindparam("row_id"),
+                    ),
+                    lines
+                )
+
+            db_count.status = StockCountStatus.POSTED
+            db_count.posted_at = current_time()
+            db_count.posted_by_id = current_user.id
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=500, detail=f"Failed to post stock count {str(e)}")
+
+        return self.get_stock_count(count_id)
+
+    def cancel_stock_count(self, count_id: UUID) -> StockCountResponse:
+        db_count = self._get_open_stock_count(count_id, lock=True)
+        db_count.status = StockCountStatus.CANCELLED
+        self.db.commit()
+        return self.get_stock_count(count_id)
+
+    def _get_open_stock_count(self, count_id: UUID, lock: bool = False) -> StockCount:
+        query = self.db.query(StockCount).filter(StockCount.id == count_id)
+        if lock:
+            # Two posts of one count queue here; the second finds it posted
+            query = query.with_for_update()
+        db_count = query.first()
+        if not db_count:
+            raise HTTPException(status_code=404, detail="Stock count not found")
+        if db_count.status != StockCountStatus.OPEN:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock count is already {db_count.status.value}"
+            )
+        return db_count
+
+    def _stock_count_query(self, count_id: UUID):
+        """Every counted line of a count next to its item's ledger balance, in one query"""
+        raw_table = RawMaterial.__table__
+        return (
+            select(
+                StockCountLine.inventory_id,
+                Inventory.name,
+                Inventory.inventory_type,
+                Inventory.status,
+                raw_table.c.critical_threshold,
+                StockCountLine.counted_quantity,
+                StockCountLine.counted_quantity.label("target"),
+                InventoryBalance.balance,
+                InventoryBalance.ledger_seq,
+                InventoryBalance.restocked,
+                InventoryBalance.written_off,
+            )
+            .select_from(StockCountLine)
+            .join(InventoryBalance, InventoryBalance.inventory_id == StockCountLine.inventory_id)
+            .join(Inventory, Inventory.id == StockCountLine.inventory_id)
+            .outerjoin(raw_table, raw_table.c.id == StockCountLine.inventory_id)
+            .where(StockCountLine.stock_count_id == count_id)
+        )
+
+    @staticmethod
+    def _counted_status(row) -> InventoryStatus:
+        """An item's status after its stock was set to the counted quantity"""
+        if row.target <= 0:
+            return InventoryStatus.DEPLETED
+        if row.inventory_type == InventoryType.EQUIPMENT:
+            # Maintenance, issued etc. are not a matter of quantity
+            return InventoryStatus.IN_STOCK if row.status == InventoryStatus.DEPLETED else row.status
+        if row.critical_threshold is not None and row.target <= row.critical_threshold:
+            return InventoryStatus.LOW_STOCK
+        return InventoryStatus.IN_STOCK
+
+    def _stock_count_response(self, db_count: StockCount, rows) -> StockCountResponse:
+        variances = [
+            StockCountVariance(
+                inventory_id=row.inventory_id,
+                inventory_name=row.name,
+                counted_quantity=row.counted_quantity,
+                system_quantity=row.balance,
+                variance=row.counted_quantity - row.balance,
+                transaction_id=getattr(row, "transaction_id", None),
+            )
+            for row in rows if row.balance is not None and row.counted_quantity != row.balance
+        ]
+        return StockCountResponse(
+            id=db_count.id,
+            created_at=db_count.created_at,
+            updated_at=db_count.updated_at,
+            is_enabled=db_count.is_enabled,
+            name=db_count.name,
+            notes=db_count.notes,
+            status=db_count.status,
+            posted_at=db_count.posted_at,
+            lines=len(rows),
+            adjustments=len(variances),
+            variances=variances,
+        )
 
     def get_transactions(
         self, 
@@ -735,19 +1127,15 @@ class InventoryService:
         # Base query for joining inventory types
         query = self.db.query(
             Inventory, 
-            Supplier.name.label('supplier_name')
+            Supplier.company_name.label('supplier_name')
         ).outerjoin(Supplier, Inventory.supplier_id == Supplier.id)
 
         # Filters
         filters = []
 
-        # Fuzzy search across name and description
+        # Indexed word search across name and description
         if search_term:
-            search_filter = or_(
-                Inventory.name.ilike(f"%{search_term}%"),
-                Inventory.description.ilike(f"%{search_term}%")
-            )
-            filters.append(search_filter)
+            filters.append(Inventory.id.in_(SearchService(self.db).matching_ids("inventory", search_term)))
 
         # Inventory type filter
         if inventory_type:
@@ -975,13 +1363,15 @@ class InventoryService:
                 detail="Transactions older than 30 days cannot be modified or deleted."
             )
         
-        # Check if there are newer transactions for the same inventory
-        newer_transactions = self.db.query(InventoryTransaction).filter(
-            InventoryTransaction.inventory_id == transaction.inventory_id,
-            InventoryTransaction.transaction_date > transaction.transaction_date
-        ).all()
-        
-        if newer_transactions:
+        # Only the item's latest entry may change: the ledger steps its
+        # position back on delete. Compared by position, as entries posted
+        # together share a transaction date. This read is unlocked; amend()
+        # and unpost() repeat the check in the same UPDATE that moves the
+        # balance, so a post committed in between fails with 409.
+        ledger_seq = self.db.query(InventoryBalance.ledger_seq).filter(
+            InventoryBalance.inventory_id == transaction.inventory_id
+        ).scalar()
+        if transaction.ledger_seq is None or transaction.ledger_seq != ledger_seq:
             raise HTTPException(
                 status_code=400,
                 detail="This transaction is locked because newer transactions exist. Delete newer transactions first."
@@ -1113,12 +1503,23 @@ class InventoryService:
                 raise e
             
         # Update the transaction with new values
+        old_type, old_quantity = db_transaction.transaction_type, db_transaction.quantity
         for field, value in update_data.items():
             setattr(db_transaction, field, value)
+        try:
+            resulting_quantity, _ = self.ledger.amend(db_transaction, old_type, old_quantity)
+        except HTTPException:
+            self.db.rollback()
+            raise
+        # The stored quantities predate any entry posted since; the ledger's are current
+        inventory.set_stock_level(resulting_quantity)
         
         # Update transaction metadata
         db_transaction.updated_at = current_time()
         db_transaction.updated_by_id = current_user.id
+        db_transaction.previous_quantity = (
+            resulting_quantity - ledger_delta(db_transaction.transaction_type, db_transaction.quantity)
+        )
         db_transaction.resulting_quantity = resulting_quantity
         
         # Commit changes
@@ -1214,9 +1615,14 @@ class InventoryService:
         
         # Delete the transaction
         try:
+            balance, _ = self.ledger.unpost(db_transaction)
+            inventory.set_stock_level(balance)
             self.db.delete(db_transaction)
             self.db.add(inventory)
             self.db.commit()
+        except HTTPException:
+            self.db.rollback()
+            raise
         except Exception as e:
             self.db.rollback()
             raise HTTPException(
@@ -0,0 +1,387 @@
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from models.inventory import (
+    LEDGER_COUNTER,
+    LEDGER_EFFECT,
+    InventoryBalance,
+    InventoryCheckpoint,
+    InventoryTransaction,
+    TransactionType,
+)
+from services.availability import note_balance_change
+from utils.time_utils import current_time
+
+load_dotenv()
+
+# A checkpoint every this many ledger entries bounds the work of verifying a balance
+INVENTORY_CHECKPOINT_INTERVAL = int(os.getenv("INVENTORY_CHECKPOINT_INTERVAL", "100"))
+
+# InventoryTransaction.quantity signed by its effect on the balance
+signed_quantity = case(
+    *[
+        (InventoryTransaction.transaction_type == transaction_type, InventoryTransaction.quantity * effect)
+        for transaction_type, effect in LEDGER_EFFECT.items() if effect
+    ],
+    else_=0.0,
+)
+
+
+def ledger_delta(transaction_type: TransactionType, quantity: float) -> float:
+    return LEDGER_EFFECT[transaction_type] * quantity
+
+
+def ledger_counts(transaction_type: TransactionType, quantity: float, sign: int = 1) -> Dict[str, float]:
+    """The counter moves of one entry, e.g. {"issued": 5.0} for an issue of 5."""
+    counter = LEDGER_COUNTER.get(transaction_type)
+    return {counter: sign * quantity} if counter else {}
+
+
+def _not_enough_stock(on_hand: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Not enough stock available ({on_hand} on hand)"
+    )
+
+
+def _ledger_moved_on() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Newer transactions were posted to this item meanwhile. Reload and try again."
+    )
+
+
+def _returning_too_much(returnable: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Cannot return more than what was issued. Maximum returnable quantity is {returnable}."
+    )
+
+
+def rebuild_ledger_counters(conn, inventory_id: Optional[UUID] = None) -> int:
+    """
+    Recompute the InventoryBalance counters from the ledger, for all items or
+    one. Works on a Session or a Connection; the caller commits. Returns the
+    number of balances rewritten.
+    """
+    totals = {
+        counter: select(func.coalesce(func.sum(InventoryTransaction.quantity), 0.0))
+        .where(
+            InventoryTransaction.inventory_id == InventoryBalance.inventory_id,
+            InventoryTransaction.transaction_type == transaction_type,
+        )
+        .scalar_subquery()
+        for transaction_type, counter in LEDGER_COUNTER.items()
+    }
+    stmt = update(InventoryBalance).values(**totals)
+    if inventory_id is not None:
+        stmt = stmt.where(InventoryBalance.inventory_id == inventory_id)
+    return conn.execute(stmt).rowcount
+
+
+class InventoryLedger:
+    """
+    Keeps each item's InventoryBalance in step with its ledger of
+    InventoryTransaction rows. Every method works inside the caller's
+    transaction and leaves committing to it.
+
+    Balances are only ever moved by a single conditional
+    `UPDATE ... SET balance = balance + :delta ... RETURNING`, never by
+    writing back a value read earlier. The UPDATE locks the balance row until
+    the caller commits, so concurrent postings to one item queue on it and
+    each sees the balance the previous one left. A move that would take the
+    balance below zero matches no row and is refused (the
+    ck_inventory_balances_balance_non_negative constraint backs this up).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def balance_row(self, inventory_id: UUID, opening_balance: float = 0.0) -> InventoryBalance:
+        row = self.db.get(InventoryBalance, inventory_id)
+        if row is None:
+            row = InventoryBalance(inventory_id=inventory_id, balance=opening_balance, ledger_seq=0)
+            self.db.add(row)
+            # Into the identity map, so the next get() finds it
+            self.db.flush([row])
+        return row
+
+    def move(self, inventory_id: UUID, delta: float, seq_step: int = 0,
+             counts: Optional[Dict[str, float]] = None,
+             expected_seq: Optional[int] = None) -> Tuple[float, int]:
+        """
+        Atomically add `delta` to the balance, `seq_step` to its ledger
+        position and `counts` to the named counters, returning the new
+        (balance, ledger_seq). A zero move locks the row and reads the current
+        balance. Raises 400 if the balance would go negative or more would
+        have been returned than issued, and 409 if `expected_seq` is given and
+        the ledger is no longer at that position.
+        """
+        counts = {counter: amount for counter, amount in (counts or {}).items() if amount}
+        values = {
+            "balance": InventoryBalance.balance + delta,
+            "ledger_seq": InventoryBalance.ledger_seq + seq_step,
+            "updated_at": current_time(),
+        }
+        for counter, amount in counts.items():
+            values[counter] = getattr(InventoryBalance, counter) + amount
+        stmt = (
+            update(InventoryBalance)
+            .where(InventoryBalance.inventory_id == inventory_id)
+            .values(**values)
+            .returning(InventoryBalance.balance, InventoryBalance.ledger_seq)
+            .execution_options(synchronize_session="fetch")
+        )
+        if expected_seq is not None:
+            stmt = stmt.where(InventoryBalance.ledger_seq == expected_seq)
+        if delta < 0:
+            stmt = stmt.where(InventoryBalance.balance + delta >= 0)
+        net_issued_change = counts.get("issued", 0.0) - counts.get("returned", 0.0)
+        if net_issued_change < 0:
+            stmt = stmt.where(InventoryBalance.issued - InventoryBalance.returned + net_issued_change >= 0)
+        moved = self.db.execute(stmt).first()
+        if moved is not None:
+            if delta:
+                note_balance_change(self.db, inventory_id, moved.balance - delta, moved.balance)
+            return moved.balance, moved.ledger_seq
+
+        current = self.db.execute(
+            select(InventoryBalance.balance, InventoryBalance.ledger_seq,
+                   InventoryBalance.issued, InventoryBalance.returned)
+            .where(InventoryBalance.inventory_id == inventory_id)
+        ).first()
+        if current is None:
+            self.balance_row(inventory_id)
+            return self.move(inventory_id, delta, seq_step, counts, expected_seq)
+        if expected_seq is not None and current.ledger_seq != expected_seq:
+            raise _ledger_moved_on()
+        if current.balance + delta < 0:
+            raise _not_enough_stock(current.balance)
+        raise _returning_too_much(current.issued - current.returned)
+
+    def lock(self, inventory_ids: Iterable[UUID]) -> Dict[UUID, InventoryBalance]:
+        """
+        Lock and load the balance rows of `inventory_ids` until commit, in id
+        order so two batches over the same items cannot deadlock. Rows held
+        this way are moved in Python with apply() instead of one UPDATE each.
+        """
+        ids = set(inventory_ids)
+        if not ids:
+            return {}
+        return {
+            row.inventory_id: row for row in
+            self.db.query(InventoryBalance)
+            .filter(InventoryBalance.inventory_id.in_(ids))
+            .order_by(InventoryBalance.inventory_id)
+            .with_for_update()
+            .populate_existing()
+        }
+
+    def check(self, row: InventoryBalance, transaction_type: TransactionType, quantity: float):
+        """Raise the 400 move() would for posting this entry to a locked row."""
+        delta = ledger_delta(transaction_type, quantity)
+        if delta < 0 and row.balance + delta < 0:
+            raise _not_enough_stock(row.balance)
+        if transaction_type == TransactionType.RETURN and row.issued - row.returned < quantity:
+            raise _returning_too_much(row.issued - row.returned)
+
+    def apply(self, row: InventoryBalance, transaction_type: TransactionType, quantity: float) -> Tuple[float, int]:
+        """post() for a row held by lock(): the entry itself is written later by append()."""
+        self.check(row, transaction_type, quantity)
+        delta = ledger_delta(transaction_type, quantity)
+        note_balance_change(self.db, row.inventory_id, row.balance, row.balance + delta)
+        row.balance += delta
+        row.ledger_seq += 1
+        for counter, amount in ledger_counts(transaction_type, quantity).items():
+            setattr(row, counter, getattr(row, counter) + amount)
+        row.updated_at = current_time()
+        return row.balance, row.ledger_seq
+
+    def adjust_to(self, targets: List, created_by_id: UUID, notes: str) -> Dict[UUID, Dict]:
+        """
+        Book the difference between each locked balance and its target level
+        as a RESTOCK (more than the ledger says) or WRITE_OFF (less). Each of
+        `targets` has inventory_id, balance, ledger_seq, restocked,
+        written_off, status and target, as read under lock. All entries go in
+        one multi-row INSERT and all balances in one executemany UPDATE.
+        Returns the entries written, by inventory id.
+        """
+        now = current_time()
+        entries, balances = {}, []
+        for row in targets:
+            difference = row.target - row.balance
+            if math.isclose(difference, 0.0, abs_tol=1e-9):
+                continue
+            transaction_type = TransactionType.RESTOCK if difference > 0 else TransactionType.WRITE_OFF
+            entries[row.inventory_id] = {
+                "id": uuid4(),
+                "inventory_id": row.inventory_id,
+                "transaction_type": transaction_type,
+                "quantity": abs(difference),
+                "previous_status": row.status,
+                "previous_quantity": row.balance,
+                "resulting_quantity": row.target,
+                "ledger_seq": row.ledger_seq + 1,
+                "created_by_id": created_by_id,
+                "updated_by_id": created_by_id,
+                "notes": notes,
+                "is_system_generated": True,
+            }
+            note_balance_change(self.db, row.inventory_id, row.balance, row.target)
+            balances.append({
+                "row_id": row.inventory_id,
+                "balance": row.target,
+                "ledger_seq": row.ledger_seq + 1,
+                "restocked": row.restocked + max(difference, 0.0),
+                "written_off": row.written_off + max(-difference, 0.0),
+                "updated_at": now,
+            })
+        if balances:
+            self.append(list(entries.values()))
+            table = InventoryBalance.__table__
+            self.db.execute(table.update().where(table.c.inventory_id == bindparam("row_id")), balances)
+        return entries
+
+    def append(self, entries: List[Dict]):
+        """
+        Write ledger entries already applied to their balances, as
+        InventoryTransaction column dicts, in one multi-row INSERT, along
+        with the checkpoints they reach.
+        """
+        if not entries:
+            return
+        # Core rather than ORM bulk inserts: no per-row unit-of-work bookkeeping
+        self.db.execute(InventoryTransaction.__table__.insert(), entries)
+        checkpoints = [
+            {"inventory_id": entry["inventory_id"], "ledger_seq": entry["ledger_seq"],
+             "balance": entry["resulting_quantity"]}
+            for entry in entries if entry["ledger_seq"] % INVENTORY_CHECKPOINT_INTERVAL == 0
+        ]
+        if checkpoints:
+            self.db.execute(InventoryCheckpoint.__table__.insert(), checkpoints)
+
+    def post(self, transaction: InventoryTransaction) -> Tuple[float, int]:
+        """Append `transaction` to its item's ledger and move the balance."""
+        balance, ledger_seq = self.move(
+            transaction.inventory_id,
+            ledger_delta(transaction.transaction_type, transaction.quantity),
+            1,
+            ledger_counts(transaction.transaction_type, transaction.quantity),
+        )
+        transaction.ledger_seq = ledger_seq
+        if ledger_seq % INVENTORY_CHECKPOINT_INTERVAL == 0:
+            self.db.add(InventoryCheckpoint(
+                inventory_id=transaction.inventory_id, ledger_seq=ledger_seq, balance=balance
+            ))
+        return balance, ledger_seq
+
+    def amend(self, transaction: InventoryTransaction, old_type: TransactionType, old_quantity: float) -> Tuple[float, int]:
+        """
+        Apply an edit of the item's latest entry; checkpoints taken after it no
+        longer hold. Raises 409 if another entry was posted since it was read.
+        """
+        counts = ledger_counts(old_type, old_quantity, sign=-1)
+        for counter, amount in ledger_counts(transaction.transaction_type, transaction.quantity).items():
+            counts[counter] = counts.get(counter, 0.0) + amount
+        moved = self.move(
+            transaction.inventory_id,
+            ledger_delta(transaction.transaction_type, transaction.quantity) - ledger_delta(old_type, old_quantity),
+            0,
+            counts,
+            expected_seq=transaction.ledger_seq,
+        )
+        self._drop_checkpoints_from(transaction)
+        return moved
+
+    def unpost(self, transaction: InventoryTransaction) -> Tuple[float, int]:
+        """
+        Remove the item's latest entry (only the latest may be deleted). The
+        position is stepped back only if it is still this entry's, so a post
+        committed since the entry was read raises 409 instead of being reused.
+        """
+        moved = self.move(
+            transaction.inventory_id,
+            -ledger_delta(transaction.transaction_type, transaction.quantity),
+            -1,
+            ledger_counts(transaction.transaction_type, transaction.quantity, sign=-1),
+            expected_seq=transaction.ledger_seq,
+        )
+        self._drop_checkpoints_from(transaction)
+        return moved
+
+    def _drop_checkpoints_from(self, transaction: InventoryTransaction):
+        if transaction.ledger_seq is None:
+            return
+        self.db.query(InventoryCheckpoint).filter(
+            InventoryCheckpoint.inventory_id == transaction.inventory_id,
+            InventoryCheckpoint.ledger_seq >= transaction.ledger_seq
+        ).delete(synchronize_session=False)
+
+    def verify(self, inventory_id: UUID, full: bool = False) -> Dict:
+        """
+        Check the running balance against the ledger. By default only the entries
+        after the latest checkpoint are summed; `full` also sums the whole history
+        and checks the per-type counters.
+        """
+        row = self.db.get(InventoryBalance, inventory_id)
+        balance = row.balance if row is not None else 0.0
+        ledger_seq = row.ledger_seq if row is not None else 0
+
+        checkpoint: Optional[InventoryCheckpoint] = (
+            self.db.query(InventoryCheckpoint)
+            .filter(InventoryCheckpoint.inventory_id == inventory_id,
+                    InventoryCheckpoint.ledger_seq <= ledger_seq)
+            .order_by(InventoryCheckpoint.ledger_seq.desc())
+            .first()
+        )
+        checkpoint_seq = checkpoint.ledger_seq if checkpoint else 0
+        since_checkpoint, entries_since = self.db.query(
+            func.coalesce(func.sum(signed_quantity), 0.0), func.count(InventoryTransaction.id)
+        ).filter(
+            InventoryTransaction.inventory_id == inventory_id,
+            InventoryTransaction.ledger_seq > checkpoint_seq
+        ).one()
+        from_checkpoint = (checkpoint.balance if checkpoint else 0.0) + since_checkpoint
+
+        result = {
+            "inventory_id": inventory_id,
+            "balance": balance,
+            "ledger_seq": ledger_seq,
+            "checkpoint_seq": checkpoint_seq,
+            "from_checkpoint": from_checkpoint,
+            "consistent": (
+                math.isclose(from_checkpoint, balance, abs_tol=1e-6)
+                and checkpoint_seq + entries_since == ledger_seq
+            ),
+        }
+        if full:
+            from_ledger, entries = self.db.query(
+                func.coalesce(func.sum(signed_quantity), 0.0), func.count(InventoryTransaction.id)
+            ).filter(InventoryTransaction.inventory_id == inventory_id).one()
+            by_type = dict(
+                self.db.query(InventoryTransaction.transaction_type, func.sum(InventoryTransaction.quantity))
+                .filter(InventoryTransaction.inventory_id == inventory_id)
+                .group_by(InventoryTransaction.transaction_type)
+            )
+            counters_consistent = all(
+                math.isclose(by_type.get(transaction_type) or 0.0,
+                             getattr(row, counter) if row is not None else 0.0, abs_tol=1e-6)
+                for transaction_type, counter in LEDGER_COUNTER.items()
+            )
+            result["from_ledger"] = from_ledger
+            result["ledger_entries"] = entries
+            result["counters_consistent"] = counters_consistent
+            result["consistent"] = (
+                result["consistent"]
+                and math.isclose(from_ledger, balance, abs_tol=1e-6)
+                and entries == ledger_seq
+                and counters_consistent
+            )
+        return result
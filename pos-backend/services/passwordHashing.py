@@ -0,0 +1,36 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from models.user import User
+
+load_dotenv()
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop. The pool size is the number of hashes computed at the same time; the
+# rest wait in the queue instead of stalling checkout requests.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="password-hash",
+)
+
+
+async def hash_password(password: str) -> str:
+    """User.hash_password on the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, User.hash_password, password)
+
+
+async def verify_password(user: User, password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the hashing pool.
+
+    Returns (is_valid, new_hash). new_hash is only set for a valid password whose
+    stored hash was made with outdated cost parameters.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, user.verify_and_update_password, password)
@@ -12,7 +12,7 @@ from models.schemas.sale import(
     SaleItemResponse,
     SaleResponse
     )
-from uuid import UUID
+from uuid import UUID, uuid4
 from models.sale import Sale, SaleItem
 from models.product import Product
 from models.category import Category
@@ -113,6 +113,40 @@ class Sales:
         # Convert to dictionary for FastAPI serialization
         return response.model_dump()
 
+    def record_offline_sale(self, user_id: UUID, session_id: UUID, timestamp: datetime,
+                            items: List[tuple]) -> Sale:
+        """
+        Record a sale made while a terminal was offline.
+
+        `items` are (product, quantity, unit_price) tuples with the price charged
+        at the till. Flushes but does not commit, so a sync batch commits once.
+        """
+        sale = Sale(
+            user_id=user_id,
+            session_id=session_id,
+            total_amount=Decimal(0),
+            receipt_number=self._generate_receipt_number(),
+            timestamp=timestamp
+        )
+        self.db.add(sale)
+        self.db.flush()
+
+        total_amount = Decimal(0)
+        for product, quantity, unit_price in items:
+            item_total = unit_price * quantity
+            self.db.add(SaleItem(
+                sale_id=sale.id,
+                product_id=product.id,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=item_total
+            ))
+            total_amount += item_total
+
+        sale.total_amount = total_amount
+        self.db.flush()
+        return sale
+
     def update_sale(self, sale_id: UUID, sale_data: SaleCreate) -> Sale:
         """
         Update an existing sale with modified item quantities.
@@ -333,9 +367,14 @@ class Sales:
         if pagination:
             query = self.apply_pagination(query, pagination)
 
-        # Get the results and convert to response format
+        # Get the results and convert to response format. Report rows are not
+        # stored, so stamp them once instead of running the timestamp default
+        # factories for every row.
+        generated_at = current_time()
         rows = [
             SaleTableRow(
+                created_at=generated_at,
+                updated_at=generated_at,
                 sale_id=row.id,
                 date_time=row.timestamp,
                 total=row.total_amount,
@@ -343,7 +382,7 @@ class Sales:
                 username=row.username,
                 total_items=row.total_items,
                 session_start=row.login_time,
-                session_end=row.logout_time or current_time()
+                session_end=row.logout_time or generated_at
             )
             for row in query.all()
         ]
@@ -511,8 +550,10 @@ class Sales:
         return user_sales
     
     def _generate_receipt_number(self) -> str:
+        # Timestamp alone collides when a till (or the /ws RPC channel) completes
+        # more than one sale per second, so add a short random suffix
         timestamp = current_time().strftime('%Y%m%d%H%M%S')
-        return f"RCPT-{timestamp}"
+        return f"RCPT-{timestamp}-{uuid4().hex[:6].upper()}"
     
     def generate_receipt(self, sale_id: UUID) -> Dict[str, Any]:
         """
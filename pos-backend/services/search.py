@@ -0,0 +1,211 @@
+"""
+Typeahead search over products, inventory items and suppliers.
+
+On the embedded SQLite profile every searchable row is copied by triggers
+into search_documents and indexed by one FTS5 table per source; words match
+as prefixes and the newest hits are ranked with bm25, title matches weighing
+ten times body matches.
+Elsewhere each word is an ILIKE substring match over the source columns,
+which PostgreSQL serves from pg_trgm GIN indexes; with pg_trgm installed,
+titles within trigram distance of the query match too (typos), ranked by
+word similarity. Migration 14 builds either index.
+"""
+import html
+import re
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Table, and_, case, column, false, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from models.guid import GUID
+from models.inventory import Inventory
+from models.product import Product
+from models.schemas.search import SearchHit, SearchResponse
+from models.supplier import Supplier
+from models.user import User
+from services.permission import has_access, has_permission
+
+SEARCH_MAX_WORDS = 8
+SEARCH_SNIPPET_CHARS = 160
+# On SQLite only the newest matches are ranked: a one-letter prefix can match
+# most of the catalogue, and scoring all of it takes longer than a keystroke.
+# Each further character narrows the matches, and once they fit in the window
+# the ranking is exact.
+SEARCH_RANK_WINDOW = 200
+
+WORD = re.compile(r"\w+")
+
+# Whether pg_trgm is installed, per database URL
+_trigram_installed = {}
+
+
+class SearchSource:
+    """A searchable table: the column shown as the title and those searched with it."""
+
+    def __init__(self, name: str, table: Table, title: str, body: List[str],
+                 allowed_roles: List[str], resource: str):
+        self.name = name
+        self.table = table
+        self.title = table.c[title]
+        self.body = [table.c[body_column] for body_column in body]
+        self.allowed_roles = allowed_roles
+        self.resource = resource
+
+    @property
+    def fts_table(self) -> str:
+        # As created by migration 14
+        return f"{self.table.name}_search"
+
+    def readable_by(self, user: User) -> bool:
+        return has_access(user.role, self.allowed_roles) and has_permission(user.role, self.resource, "read")
+
+
+# Keyed by the SearchResponse field each fills
+SEARCH_SOURCES = {
+    "products": SearchSource("products", Product.__table__, "name", ["description"], ["cashier"], "products"),
+    "inventory": SearchSource("inventory", Inventory.__table__, "name", ["description"], ["supervisor"], "inventories"),
+    "suppliers": SearchSource("suppliers", Supplier.__table__, "company_name", ["contact_person", "email"],
+                              ["supervisor"], "suppliers"),
+}
+
+
+def search_words(term: str) -> List[str]:
+    return [word.lower() for word in WORD.findall(term or "")][:SEARCH_MAX_WORDS]
+
+
+def _like_pattern(word: str) -> str:
+    return "%" + word.replace("\\", "\\\\").replace("_", "\\_") + "%"
+
+
+def _fts_query(words: List[str], title_only: bool) -> str:
+    """Every word as a prefix, e.g. `"choc"* "cak"*`; words are \\w+ so need no escaping."""
+    query = " ".join(f'"{word}"*' for word in words)
+    return f"title : ({query})" if title_only else query
+
+
+def highlight(value: Optional[str], words: List[str]) -> Optional[str]:
+    """HTML-escape `value` and wrap the words starting with a query word in <mark>."""
+    if not value:
+        return value
+    escaped = html.escape(value)
+    if not words:
+        return escaped
+    pattern = re.compile(r"\b(" + "|".join(re.escape(word) for word in words) + r")", re.IGNORECASE)
+    return pattern.sub(r"<mark>\1</mark>", escaped)
+
+
+def snippet(value: Optional[str], words: List[str]) -> Optional[str]:
+    """Up to SEARCH_SNIPPET_CHARS of `value` around its first match, highlighted."""
+    if not value:
+        return None
+    if len(value) > SEARCH_SNIPPET_CHARS:
+        match = re.search(r"\b(" + "|".join(re.escape(word) for word in words) + r")", value, re.IGNORECASE) \
+            if words else None
+        start = max(0, match.start() - SEARCH_SNIPPET_CHARS // 4) if match else 0
+        value = ("…" if start else "") + value[start:start + SEARCH_SNIPPET_CHARS] + "…"
+    return highlight(value, words)
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    def search(self, term: str, current_user: User, sources: Optional[List[str]] = None,
+               limit: int = 10) -> SearchResponse:
+        """The best `limit` hits of each source the user may read."""
+        unknown = set(sources or ()) - SEARCH_SOURCES.keys()
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+        words = search_words(term)
+        response = SearchResponse(query=term)
+        if not words:
+            return response
+        for name, source in SEARCH_SOURCES.items():
+            if (sources and name not in sources) or not source.readable_by(current_user):
+                continue
+            rows = self._fts_hits(source, words, limit) if self.dialect == "sqlite" \
+                else self._like_hits(source, words, limit)
+            setattr(response, name, [
+                SearchHit(
+                    id=row.entity_id,
+                    title=row.title,
+                    highlight=highlight(row.title, words),
+                    snippet=snippet(row.body, words),
+                    score=row.score,
+                )
+                for row in rows
+            ])
+        return response
+
+    def matching_ids(self, source_name: str, term: str, title_only: bool = False):
+        """
+        Ids of the rows of a source matching `term`, as a subquery for
+        `Model.id.in_(...)`, so list filters use the search index instead
+        of scanning with ILIKE '%term%'.
+        """
+        source = SEARCH_SOURCES[source_name]
+        words = search_words(term)
+        if not words:
+            return select(source.table.c.id).where(false())
+        if self.dialect == "sqlite":
+            return text(
+                f"SELECT d.entity_id FROM {source.fts_table} "
+                f"JOIN search_documents d ON d.doc_id = {source.fts_table}.rowid "
+                f"WHERE {source.fts_table} MATCH :search_match"
+            ).bindparams(search_match=_fts_query(words, title_only)).columns(column("entity_id", GUID()))
+        return select(source.table.c.id).where(self._like_match(source, words, title_only))
+
+    def _fts_hits(self, source: SearchSource, words: List[str], limit: int):
+        # The newest matches come straight off the index in rowid order, so
+        # only those are scored instead of every row sharing a short prefix
+        return self.db.execute(
+            text(
+                f"SELECT d.entity_id, d.title, d.body, -hits.rank AS score FROM ("
+                f"SELECT rowid, rank FROM {source.fts_table} WHERE {source.fts_table} MATCH :search_match "
+                f"ORDER BY rowid DESC LIMIT :window) AS hits "
+                f"JOIN search_documents d ON d.doc_id = hits.rowid ORDER BY hits.rank LIMIT :limit"
+            ).columns(column("entity_id", GUID()), column("title"), column("body"), column("score")),
+            {"search_match": _fts_query(words, False), "window": SEARCH_RANK_WINDOW, "limit": limit}
+        ).all()
+
+    def _like_hits(self, source: SearchSource, words: List[str], limit: int):
+        match = self._like_match(source, words, title_only=False)
+        if self._has_trigram():
+            query = " ".join(words)
+            # title %> query: the query is within trigram distance of a run of the title
+            match = or_(match, source.title.op("%>")(query))
+            score = func.word_similarity(query, source.title)
+        else:
+            score = case((source.title.ilike(_like_pattern(words[0])[1:], escape="\\"), 1.0), else_=0.5)
+        body = func.concat_ws(" ", *source.body) if len(source.body) > 1 else source.body[0]
+        return self.db.execute(
+            select(
+                source.table.c.id.label("entity_id"),
+                source.title.label("title"),
+                body.label("body"),
+                score.label("score"),
+            )
+            .where(match)
+            .order_by(score.desc(), source.title)
+            .limit(limit)
+        ).all()
+
+    def _like_match(self, source: SearchSource, words: List[str], title_only: bool):
+        columns = [source.title] if title_only else [source.title, *source.body]
+        return and_(*[
+            or_(*[searched.ilike(_like_pattern(word), escape="\\") for searched in columns])
+            for word in words
+        ])
+
+    def _has_trigram(self) -> bool:
+        if self.dialect != "postgresql":
+            return False
+        url = str(self.db.get_bind().url)
+        if url not in _trigram_installed:
+            _trigram_installed[url] = self.db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+        return _trigram_installed[url]
+
@@ -3,6 +3,8 @@ from models.user import UserSession
 from typing import Optional
 from uuid import UUID
 from utils.time_utils import current_time
+from models.tableVersion import bump_versions
+from services.authCache import access_version_key, auth_cache
 
 class SessionManager:
     def __init__(self, db: Session):
@@ -41,6 +43,10 @@ class SessionManager:
         if active_session:
             active_session.expires = True
             active_session.logout_time = current_time()
+            # Logout also revokes the token; a supervisor's termination does
+            # not, so other workers learn of it from the user's access version
+            bump_versions(self.db, {access_version_key(user_id)})
             self.db.commit()
+            auth_cache.invalidate_user(user_id)
             return True
         return False
\ No newline at end of file
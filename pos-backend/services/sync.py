@@ -0,0 +1,284 @@
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import pytz
+from dotenv import load_dotenv
+from fastapi import Depends
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.orm import Session, joinedload
+
+from models.engine.database import get_db
+from models.offlineSync import ChangeLog, ChangeOperation, EntityType, OfflineSync, SyncStatus
+from models.product import Product
+from models.category import Category
+from models.settings import Settings
+from models.sale import Sale, SaleItem
+from models.schemas.product import ProductResponse
+from models.schemas.category import CategoryResponse
+from models.schemas.settings import SettingsUpdate
+from models.schemas.sale import SaleResponse
+from models.schemas.sync import OfflineSaleCreate, SyncPushResult
+from services.sales import Sales
+from utils.time_utils import current_time
+
+load_dotenv()
+
+# A version missing from the change log is normally a transaction that has
+# taken its number but not committed yet. Changes after such a gap are held
+# back until it is settled, so a terminal's watermark never moves past a change
+# it has not received. On PostgreSQL a gap is settled once every transaction
+# running when the next row was written has ended (ChangeLog.settled_after),
+# however long it takes; this grace only covers the instant between a writer
+# taking its number and being assigned a transaction id. Elsewhere writers
+# commit one at a time, and a gap this old is assumed to be a rollback.
+SYNC_GAP_GRACE_SECONDS = float(os.getenv("SYNC_GAP_GRACE_SECONDS", "5"))
+SYNC_PULL_LIMIT = int(os.getenv("SYNC_PULL_LIMIT", "1000"))
+
+
+class SyncService:
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    def pull(self, since: int, limit: int = SYNC_PULL_LIMIT,
+             entity_types: Optional[List[EntityType]] = None) -> dict:
+        """Changes with a version above `since`, collapsed to the latest state of each row."""
+        latest, watermark, has_more = self.changes_since(since, limit, entity_types)
+
+        upserts: Dict[EntityType, List[str]] = {}
+        deleted: Dict[str, List[str]] = {}
+        for (entity_type, entity_id), operation in latest.items():
+            if operation == ChangeOperation.DELETE:
+                deleted.setdefault(entity_type.value, []).append(entity_id)
+            else:
+                upserts.setdefault(entity_type, []).append(entity_id)
+
+        return {
+            "watermark": watermark,
+            "has_more": has_more,
+            "products": self._products(upserts.get(EntityType.PRODUCT, [])),
+            "categories": self._categories(upserts.get(EntityType.CATEGORY, [])),
+            "settings": self._settings(upserts.get(EntityType.SETTINGS, [])),
+            "sales": self._sales(upserts.get(EntityType.SALE, [])),
+            "deleted": deleted,
+        }
+
+    def changes_since(self, since: int, limit: int = SYNC_PULL_LIMIT,
+                      entity_types: Optional[List[EntityType]] = None
+                      ) -> Tuple[Dict[Tuple[EntityType, str], ChangeOperation], int, bool]:
+        """
+        Latest operation per changed row, the new watermark and whether more
+        changes remain. The watermark stops before a gap that is not settled.
+        """
+        # Read before the rows: transactions that ended by now have their rows visible below
+        oldest_running = self._oldest_running_transaction()
+        rows = (
+            self.db.query(ChangeLog)
+            .filter(ChangeLog.version > since)
+            .order_by(ChangeLog.version)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        watermark, accepted = since, []
+        grace_cutoff = current_time() - timedelta(seconds=SYNC_GAP_GRACE_SECONDS)
+        for row in rows:
+            if row.version != watermark + 1 and not self._gap_settled(row, oldest_running, grace_cutoff):
+                has_more = True
+                break
+            accepted.append(row)
+            watermark = row.version
+
+        latest: Dict[Tuple[EntityType, str], ChangeOperation] = {}
+        for row in accepted:
+            if entity_types and row.entity_type not in entity_types:
+                continue
+            latest.pop((row.entity_type, row.entity_id), None)
+            latest[(row.entity_type, row.entity_id)] = row.operation
+        return latest, watermark, has_more
+
+    def current_watermark(self, window: int = 200) -> int:
+        """The highest version below which no change can still be committed."""
+        oldest_running = self._oldest_running_transaction()
+        rows = (
+            self.db.query(ChangeLog.version, ChangeLog.changed_at, ChangeLog.settled_after)
+            .order_by(ChangeLog.version.desc())
+            .limit(window)
+            .all()
+        )
+        if not rows:
+            return 0
+        rows.reverse()
+        grace_cutoff = current_time() - timedelta(seconds=SYNC_GAP_GRACE_SECONDS)
+        watermark = rows[0].version
+        for row in rows[1:]:
+            if row.version != watermark + 1 and not self._gap_settled(row, oldest_running, grace_cutoff):
+                break
+            watermark = row.version
+        return watermark
+
+    def _oldest_running_transaction(self) -> Optional[int]:
+        """On PostgreSQL, the oldest transaction id still running; every one below it has ended."""
+        if self.db.get_bind().dialect.name != "postgresql":
+            return None
+        return self.db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar()
+
+    def _gap_settled(self, row, oldest_running: Optional[int], grace_cutoff) -> bool:
+        """Whether the versions missing just before `row` can no longer commit."""
+        if self._aware(row.changed_at) > grace_cutoff:
+            return False
+        if row.settled_after is None:
+            # Not PostgreSQL, or logged before the column existed
+            return True
+        return oldest_running is not None and oldest_running >= row.settled_after
+
+    def push_sales(self, user_id: UUID, session_id: UUID, terminal_id: UUID,
+                   sales: List[OfflineSaleCreate]) -> List[SyncPushResult]:
+        """
+        Apply a batch of offline sales.
+
+        Each sale is applied in its own savepoint and the batch is committed once.
+        Re-pushed sales (same client_id) return their earlier result. A sale
+        referencing a product the server does not know is kept as a conflict
+        for review instead of being applied.
+        """
+        client_ids = [sale.client_id for sale in sales]
+        processed = {
+            record.client_id: record for record in
+            self.db.query(OfflineSync).filter(OfflineSync.client_id.in_(client_ids)).all()
+        }
+        product_ids = {item.product_id for sale in sales for item in sale.items}
+        products = {
+            product.id: product for product in
+            self.db.query(Product).filter(Product.id.in_(product_ids)).all()
+        } if product_ids else {}
+        sales_service = Sales(self.db)
+        receipts = {}
+
+        results = []
+        for sale_data in sales:
+            record = processed.get(sale_data.client_id)
+            if record is not None:
+                results.append(self._result(record, receipts, duplicate=True))
+                continue
+
+            record = OfflineSync(
+                entity_type=EntityType.SALE,
+                client_id=sale_data.client_id,
+                raw_data=jsonable_encoder(sale_data),
+                client_timestamp=self._local(sale_data.client_timestamp),
+                originated_from=terminal_id,
+            )
+            missing = [str(item.product_id) for item in sale_data.items if item.product_id not in products]
+            warnings = []
+            if missing:
+                record.status = SyncStatus.CONFLICT
+                record.detail = f"Unknown products: {', '.join(missing)}"
+            else:
+                items = []
+                for item in sale_data.items:
+                    product = products[item.product_id]
+                    unit_price = item.unit_price if item.unit_price is not None else product.price
+                    if unit_price != product.price:
+                        warnings.append(
+                            f"{product.name}: sold at {unit_price}, current price {product.price}"
+                        )
+                    items.append((product, item.quantity, unit_price))
+                try:
+                    with self.db.begin_nested():
+                        sale = sales_service.record_offline_sale(
+                            user_id, session_id, self._local(sale_data.client_timestamp), items
+                        )
+                    record.entity_id = sale.id
+                    record.status = SyncStatus.SYNCED
+                    record.is_processed = True
+                    receipts[sale.id] = sale.receipt_number
+                except Exception as e:
+                    record.status = SyncStatus.ERROR
+                    record.detail = str(e)
+
+            self.db.add(record)
+            processed[sale_data.client_id] = record
+            results.append(self._result(record, receipts, warnings=warnings))
+
+        self.db.commit()
+        return results
+
+    def get_conflicts(self, skip: int = 0, limit: int = 100) -> List[OfflineSync]:
+        return (
+            self.db.query(OfflineSync)
+            .filter(OfflineSync.status.in_([SyncStatus.CONFLICT, SyncStatus.ERROR]))
+            .order_by(OfflineSync.server_received_at)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def _result(self, record: OfflineSync, receipts: Dict[UUID, str], duplicate: bool = False,
+                warnings: List[str] = None) -> SyncPushResult:
+        if record.entity_id is not None and record.entity_id not in receipts:
+            sale = self.db.query(Sale).get(record.entity_id)
+            receipts[record.entity_id] = sale.receipt_number if sale else None
+        return SyncPushResult(
+            client_id=record.client_id,
+            status="duplicate" if duplicate else record.status.value,
+            sale_id=record.entity_id,
+            receipt_number=receipts.get(record.entity_id),
+            detail=record.detail,
+            warnings=warnings or [],
+        )
+
+    def _products(self, ids: List[str]) -> List[dict]:
+        if not ids:
+            return []
+        products = (
+            self.db.query(Product)
+            .options(joinedload(Product.category))
+            .filter(Product.id.in_([UUID(i) for i in ids]))
+            .all()
+        )
+        return [jsonable_encoder(ProductResponse.model_validate(p)) for p in products]
+
+    def _categories(self, ids: List[str]) -> List[dict]:
+        if not ids:
+            return []
+        categories = self.db.query(Category).filter(Category.id.in_([UUID(i) for i in ids])).all()
+        return [jsonable_encoder(CategoryResponse.model_validate(c)) for c in categories]
+
+    def _settings(self, ids: List[str]) -> List[dict]:
+        if not ids:
+            return []
+        settings = self.db.query(Settings).filter(Settings.id.in_([int(i) for i in ids])).all()
+        return [
+            {"id": s.id, **jsonable_encoder(SettingsUpdate.model_validate(s, from_attributes=True))}
+            for s in settings
+        ]
+
+    def _sales(self, ids: List[str]) -> List[dict]:
+        if not ids:
+            return []
+        sales = (
+            self.db.query(Sale)
+            .options(joinedload(Sale.items).joinedload(SaleItem.product))
+            .filter(Sale.id.in_([UUID(i) for i in ids]))
+            .all()
+        )
+        return [jsonable_encoder(SaleResponse.model_validate(s, from_attributes=True)) for s in sales]
+
+    @staticmethod
+    def _aware(value):
+        # SQLite hands timezone-aware columns back naive
+        if value.tzinfo is None:
+            return pytz.timezone('Africa/Lagos').localize(value)
+        return value
+
+    @staticmethod
+    def _local(value):
+        """Client timestamps in the server's timezone, as the sales table stores them."""
+        if value.tzinfo is None:
+            return pytz.timezone('Africa/Lagos').localize(value)
+        return value.astimezone(pytz.timezone('Africa/Lagos'))
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.engine.database import SessionLocal
+from models.tableVersion import TableVersion
+
+load_dotenv()
+
+# How long a worker trusts its copy of the counters. Writes made by this
+# worker are seen immediately; writes made by other workers within this window.
+ETAG_REFRESH_SECONDS = float(os.getenv("ETAG_REFRESH_SECONDS", "2"))
+
+
+class TableVersionStore:
+    """Per-worker copy of table_versions, so a conditional GET costs a dict lookup."""
+
+    def __init__(self, refresh_seconds: float = ETAG_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[str, int] = {}
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._next_refresh = 0.0
+
+    def versions(self) -> Dict[str, int]:
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return self._versions
+
+    def refresh(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(TableVersion.table_name, TableVersion.version).all()
+        finally:
+            db.close()
+        with self._lock:
+            self._versions = dict(rows)
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+
+    def etag(self, *tables: str) -> str:
+        versions = self.versions()
+        return '"' + "-".join(f"{table}.{versions.get(table, 0)}" for table in tables) + '"'
+
+
+table_versions = TableVersionStore()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("bumped_tables", None):
+        table_versions.invalidate()
+
+
+def conditional_response(request: Request, response: Response, *tables: str,
+                         cache_control: str = "private, no-cache") -> Optional[Response]:
+    """
+    Set ETag and Cache-Control for a list of reference data. Returns a 304
+    response when the client already has this version, before any query runs.
+    """
+    etag = table_versions.etag(*tables)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
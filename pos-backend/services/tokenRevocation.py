@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pytz
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.user import RevokedToken, TokenBlacklist
+from utils.time_utils import current_time
+
+load_dotenv()
+
+# How often each worker pulls revocations made by other workers
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+# Rows are re-read with this much overlap so a slow commit is not skipped
+REVOCATION_REFRESH_OVERLAP = timedelta(seconds=30)
+
+
+class RevocationStore:
+    """
+    Per-worker view of the revoked_tokens table.
+
+    Revoked jtis are kept in memory together with their expiry. The table is
+    polled incrementally (rows revoked since the last watermark), so checking
+    a token costs a dict lookup and at most one small indexed query every
+    REVOCATION_REFRESH_SECONDS.
+    """
+
+    def __init__(self, refresh_seconds: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._revoked: Dict[str, float] = {}  # jti -> expiry (epoch seconds)
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        if time.monotonic() >= self._next_refresh:
+            self.refresh(db)
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def revoke(self, db: Session, jti: str, exp: float):
+        """Persist a revocation and apply it to this worker immediately."""
+        tz = pytz.timezone('Africa/Lagos')
+        db.add(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(exp, tz=tz)))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Already revoked (e.g. a double logout)
+            db.rollback()
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def refresh(self, db: Session):
+        """Load revocations recorded since the last refresh and drop expired ones."""
+        query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+        if self._watermark is not None:
+            query = query.filter(RevokedToken.revoked_at > self._watermark - REVOCATION_REFRESH_OVERLAP)
+        else:
+            query = query.filter(RevokedToken.expires_at > current_time())
+        rows = query.all()
+
+        now = time.time()
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._revoked[jti] = self._epoch(expires_at)
+                if self._watermark is None or self._aware(revoked_at) > self._watermark:
+                    self._watermark = self._aware(revoked_at)
+            if self._watermark is None:
+                self._watermark = current_time()
+            for jti in [j for j, expires in self._revoked.items() if expires <= now]:
+                del self._revoked[jti]
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+
+    def purge(self, db: Session, legacy_cutoff: datetime) -> int:
+        """Delete revocations of tokens that have expired anyway."""
+        purged = db.query(RevokedToken).filter(
+            RevokedToken.expires_at <= current_time()
+        ).delete(synchronize_session=False)
+        purged += db.query(TokenBlacklist).filter(
+            TokenBlacklist.blacklisted_on < legacy_cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return purged
+
+    @staticmethod
+    def _aware(value: datetime) -> datetime:
+        # SQLite hands timezone-aware columns back naive
+        if value.tzinfo is None:
+            return pytz.timezone('Africa/Lagos').localize(value)
+        return value
+
+    @classmethod
+    def _epoch(cls, value: datetime) -> float:
+        return cls._aware(value).timestamp()
+
+
+revocation_store = RevocationStore()
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from models.engine.database import SessionLocal
+from models.category import Category
+from models.product import Product
+from models.settings import Settings
+from utils.imageUpload import UPLOAD_FOLDER
+
+load_dotenv()
+
+UPLOAD_GC_INTERVAL_SECONDS = int(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", "21600"))
+# Files younger than this are kept even if unreferenced: the record that will
+# point at them may not have been committed yet.
+UPLOAD_GC_GRACE_SECONDS = int(os.getenv("UPLOAD_GC_GRACE_SECONDS", "3600"))
+
+# Upload folder -> the column that references files in it
+UPLOAD_REFERENCES = {
+    "products": Product.image,
+    "categories": Category.image,
+    "logo": Settings.image,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(filename: str) -> str:
+    """`<digest>-detail.webp` -> `<digest>`; every variant of an upload shares it."""
+    return filename.split(".", 1)[0].split("-", 1)[0]
+
+
+def referenced_digests(db: Session, column) -> set:
+    return {
+        _digest(os.path.basename(path))
+        for (path,) in db.query(column).filter(column.isnot(None)).distinct()
+    }
+
+
+def purge_orphaned_uploads(db: Session, grace_seconds: int = UPLOAD_GC_GRACE_SECONDS) -> int:
+    """
+    Delete upload files no record points at any more, e.g. the old image after
+    a product image or the logo is replaced. Returns the number of files removed.
+    """
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for folder, column in UPLOAD_REFERENCES.items():
+        directory = os.path.join(UPLOAD_FOLDER, folder)
+        if not os.path.isdir(directory):
+            continue
+        referenced = referenced_digests(db, column)
+        for entry in os.scandir(directory):
+            if not entry.is_file() or _digest(entry.name) in referenced:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def upload_gc_loop(interval: int = UPLOAD_GC_INTERVAL_SECONDS):
+    """Background task started from the app lifespan."""
+    while True:
+        db = SessionLocal()
+        try:
+            removed = await asyncio.to_thread(purge_orphaned_uploads, db)
+            if removed:
+                logger.info("Removed %s orphaned upload files", removed)
+        except Exception:
+            logger.exception("Upload garbage collection failed")
+        finally:
+            db.close()
+        await asyncio.sleep(interval)
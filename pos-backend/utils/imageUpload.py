@@ -1,27 +1,164 @@
-from PIL import Image
+"""
+Uploaded image processing.
+
+An upload is stored once per distinct content: files are named after a hash
+of the uploaded bytes, so uploading the same picture again reuses the files
+already rendered. Every upload is rendered into these variants:
+
+    uploads/<folder>/<hash>.png           list thumbnail (the path stored in the DB)
+    uploads/<folder>/<hash>.webp          list thumbnail, WebP
+    uploads/<folder>/<hash>-detail.png    detail view
+    uploads/<folder>/<hash>-detail.webp   detail view, WebP
+
+Decoding and encoding run in a process pool, off the event loop. The request
+waits only for the list thumbnail PNG, the file it returns. The other variants
+are rendered in the background after the response has gone out.
+"""
+from PIL import Image, UnidentifiedImageError
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile, status
+from typing import Dict, Optional
+import asyncio
+import hashlib
+import io
+import logging
 import os
-import uuid
+import tempfile
+import threading
+
+load_dotenv()
 
 UPLOAD_FOLDER = "uploads/"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
 
-def save_thumbnail(image_file, folder="products"):
-    """Save uploaded image as a thumbnail locally and return file path."""
-    if not os.path.exists(os.path.join(UPLOAD_FOLDER, folder)):
-        os.makedirs(os.path.join(UPLOAD_FOLDER, folder))
+# Bounding box per size; "thumb" is the size stored on the record
+IMAGE_SIZES = {"thumb": 200, "detail": 800}
+IMAGE_FORMATS = ("png", "webp")
+PRIMARY_VARIANT = ("thumb", "png")
+WEBP_QUALITY = 80
 
-    filename = f"{uuid.uuid4().hex}.png"  # Generate unique filename with .png extension
-    filepath = os.path.join(UPLOAD_FOLDER, folder, filename)
+logger = logging.getLogger(__name__)
 
-    # Open image and resize to 200x200
-    image = Image.open(image_file)
-    image.thumbnail((200, 200))
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
 
-    # Convert image to RGBA if it has an alpha channel, otherwise convert to RGB
-    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
-        image = image.convert("RGBA")
-    else:
-        image = image.convert("RGB")
 
-    image.save(filepath, "PNG")
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=False)
+            _pool = None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def variant_path(folder: str, digest: str, size: str = "thumb", fmt: str = "png") -> str:
+    suffix = "" if size == "thumb" else f"-{size}"
+    return os.path.join(UPLOAD_FOLDER, folder, f"{digest}{suffix}.{fmt}")
+
 
-    return filepath  # Return the image path for DB storage
\ No newline at end of file
+def image_variants(image_path: str) -> Dict[str, str]:
+    """All variant paths of a stored image, keyed "<size>.<format>"."""
+    folder = os.path.basename(os.path.dirname(image_path))
+    digest = os.path.splitext(os.path.basename(image_path))[0]
+    return {
+        f"{size}.{fmt}": variant_path(folder, digest, size, fmt)
+        for size in IMAGE_SIZES for fmt in IMAGE_FORMATS
+    }
+
+
+def _write_atomic(image: Image.Image, path: str, fmt: str):
+    """Write through a temp file so a reader never sees a half-written image."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            if fmt == "webp":
+                image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+            else:
+                image.save(tmp, "PNG", optimize=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def render_variants(data: bytes, targets) -> int:
+    """
+    Decode `data` once and write each (path, size, format) in `targets` that
+    does not exist yet. Runs in a pool worker. Returns the number written.
+    """
+    pending = [target for target in targets if not os.path.exists(target[0])]
+    if not pending:
+        return 0
+    with Image.open(io.BytesIO(data)) as source:
+        # Keep transparency if the image has an alpha channel, otherwise convert to RGB
+        if source.mode in ("RGBA", "LA") or (source.mode == "P" and "transparency" in source.info):
+            source = source.convert("RGBA")
+        else:
+            source = source.convert("RGB")
+        # Largest first, so each smaller size is resampled from a smaller image
+        for path, size, fmt in sorted(pending, key=lambda t: -IMAGE_SIZES[t[1]]):
+            bound = IMAGE_SIZES[size]
+            if source.width > bound or source.height > bound:
+                source.thumbnail((bound, bound))
+            _write_atomic(source, path, fmt)
+    return len(pending)
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Rendering image variants failed", exc_info=future.exception())
+
+
+async def save_image(upload: UploadFile, folder: str = "products") -> str:
+    """
+    Store an uploaded image and return the list thumbnail path for the DB.
+    Raises 400 if the upload is not an image.
+    """
+    data = await upload.read()
+    digest = content_hash(data)
+    os.makedirs(os.path.join(UPLOAD_FOLDER, folder), exist_ok=True)
+
+    primary = variant_path(folder, digest, *PRIMARY_VARIANT)
+    others = [
+        (variant_path(folder, digest, size, fmt), size, fmt)
+        for size in IMAGE_SIZES for fmt in IMAGE_FORMATS
+        if (size, fmt) != PRIMARY_VARIANT
+    ]
+
+    pool = get_pool()
+    if os.path.exists(primary):
+        # Reusing an existing upload: refresh it so the orphan collector's
+        # grace period covers the record about to reference it
+        for path in [primary] + [target[0] for target in others]:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+    else:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(pool, render_variants, data, [(primary, *PRIMARY_VARIANT)])
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is not a valid image"
+            )
+    # Also fills in whatever an earlier upload of the same content did not finish
+    missing = [target for target in others if not os.path.exists(target[0])]
+    if missing:
+        pool.submit(render_variants, data, missing).add_done_callback(_log_failure)
+    return primary